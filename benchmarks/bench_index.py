@@ -0,0 +1,158 @@
+"""
+Measure how the cost of the remembered URLs index grows with the number
+of remembered URLs.
+
+For each index size it measures one `remember_url` (what every cache miss
+pays with `remember_all_urls`), a `find_urls` pattern search, a purge of
+a handful of URLs and the size of the index as stored in the cache.
+
+Usage::
+
+    $ python benchmarks/bench_index.py
+    $ python benchmarks/bench_index.py --sizes 1000,10000 --output before.json
+    $ python benchmarks/bench_index.py --setting FANCY_COMPRESS_REMEMBERED_URLS=True
+"""
+import argparse
+import hashlib
+import pickle
+import time
+
+import common
+
+
+def url(i):
+    return "/page/%s?q=%s" % (i, i % 97)
+
+
+def cache_key(i):
+    # What Django's `learn_cache_key` makes
+    return "views.decorators.cache.cache_page..GET.%s.%s.en-us.UTC" % (
+        hashlib.md5(url(i).encode()).hexdigest(),
+        hashlib.md5(b"headers").hexdigest(),
+    )
+
+
+def populate(size):
+    """
+    Put an index of `size` URLs, and a cached page for each URL that's
+    going to be searched for, directly in the cache.
+    """
+    from django.core.cache import cache
+
+    from fancy_cache.constants import REMEMBERED_URLS_KEY
+    from fancy_cache.storage import get_storage
+
+    expiration_time = int(time.time()) + 3600
+    storage = get_storage(cache)
+    if storage is not None:
+        for i in range(size):
+            storage.remember(url(i), cache_key(i), expiration_time)
+    else:
+        remembered_urls = {}
+        for i in range(size):
+            remembered_urls[url(i)] = (cache_key(i), expiration_time)
+        cache.set(REMEMBERED_URLS_KEY, remembered_urls, 3600)
+    cache.set_many(
+        {
+            cache_key(i): "page"
+            for i in range(size)
+            if url(i).startswith("/page/42")
+        }
+    )
+
+
+def run(sizes, samples):
+    from django.core.cache import cache
+    from django.test.client import RequestFactory
+
+    from fancy_cache.constants import REMEMBERED_URLS_KEY
+    from fancy_cache.memory import find_urls
+    from fancy_cache.middleware import FancyCacheMiddleware
+    from fancy_cache.storage import get_storage
+
+    factory = RequestFactory()
+    middleware = FancyCacheMiddleware(
+        lambda request: None,
+        page_timeout=3600,
+        cache_alias=None,
+        key_prefix=None,
+        remember_all_urls=True,
+    )
+
+    results = {}
+    for size in sizes:
+        cache.clear()
+        populate(size)
+        # The first one converts the index to whatever format is configured
+        middleware.remember_url(factory.get("/warmup"), cache_key(-1), 3600)
+
+        timings = []
+        for i in range(samples):
+            request = factory.get("/new/%s" % i)
+            t0 = time.perf_counter_ns()
+            middleware.remember_url(request, cache_key(-i), 3600)
+            timings.append(time.perf_counter_ns() - t0)
+        results["remember_url_%s" % size] = common.summarize(timings)
+
+        timings = []
+        for i in range(samples):
+            t0 = time.perf_counter_ns()
+            found = list(find_urls(["/page/42*"]))
+            timings.append(time.perf_counter_ns() - t0)
+        results["find_urls_%s" % size] = common.summarize(timings)
+        results["find_urls_%s" % size]["found"] = len(found)
+
+        t0 = time.perf_counter_ns()
+        purged = list(find_urls(["/page/42*"], purge=True))
+        results["purge_%s" % size] = common.summarize(
+            [time.perf_counter_ns() - t0]
+        )
+        results["purge_%s" % size]["purged"] = len(purged)
+
+        if get_storage(cache) is None:
+            stored = cache.get(REMEMBERED_URLS_KEY)
+            results["index_bytes_%s" % size] = {
+                "bytes": len(pickle.dumps(stored, pickle.HIGHEST_PROTOCOL))
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    common.add_backend_arguments(parser)
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000,100000,1000000",
+        help="Comma separated numbers of remembered URLs",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=5,
+        help="Number of times to measure each operation per size",
+    )
+    args = parser.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    extra_settings = common.parse_settings(args.settings)
+    common.configure(args.backend, args.location, **extra_settings)
+    try:
+        results = {
+            "benchmark": "index",
+            "metadata": common.metadata(
+                args.backend,
+                settings=extra_settings,
+                sizes=sizes,
+                samples=args.samples,
+            ),
+            "results": run(sizes, args.samples),
+        }
+    finally:
+        common.cleanup()
+    common.write_results(results, args.output)
+    if args.compare:
+        common.compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
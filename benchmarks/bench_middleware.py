@@ -0,0 +1,122 @@
+"""
+Measure the latency and throughput that FancyCacheMiddleware adds to a
+request, for the different paths through it.
+
+The views are called directly with requests from RequestFactory, so the
+numbers are the cost of the decorator and the cache backend only.
+
+Usage::
+
+    $ python benchmarks/bench_middleware.py
+    $ python benchmarks/bench_middleware.py --backend file --output after.json
+    $ python benchmarks/bench_middleware.py --compare before.json
+"""
+import argparse
+import time
+
+import common
+
+
+def run(iterations, body_size):
+    from django.core.cache import cache
+    from django.http import HttpResponse
+    from django.test.client import RequestFactory
+
+    from fancy_cache import cache_page
+
+    body = b"x" * body_size
+    factory = RequestFactory()
+
+    def view(request):
+        return HttpResponse(body)
+
+    def post_processor(response, request):
+        response["X-Processed"] = "yes"
+        return response
+
+    views = {
+        "baseline": view,
+        "default": cache_page(60)(view),
+        "only_get_keys": cache_page(60, only_get_keys=["page"])(view),
+        "post_process_response_always": cache_page(
+            60, post_process_response_always=post_processor
+        )(view),
+        "stats": cache_page(
+            60, remember_all_urls=True, remember_stats_all_urls=True
+        )(view),
+    }
+
+    def measure(view, make_request):
+        timings = []
+        for i in range(iterations):
+            request = make_request(i)
+            t0 = time.perf_counter_ns()
+            view(request)
+            timings.append(time.perf_counter_ns() - t0)
+        return common.summarize(timings)
+
+    scenarios = [
+        # (name, view, request for iteration i)
+        ("baseline", "baseline", lambda i: factory.get("/page")),
+        ("miss", "default", lambda i: factory.get("/miss", {"i": i})),
+        ("hit", "default", lambda i: factory.get("/hit")),
+        ("head_hit", "default", lambda i: factory.head("/hit")),
+        (
+            "only_get_keys_hit",
+            "only_get_keys",
+            lambda i: factory.get("/only", {"page": "1", "junk": i}),
+        ),
+        (
+            "post_process_response_always_hit",
+            "post_process_response_always",
+            lambda i: factory.get("/always"),
+        ),
+        ("stats_miss", "stats", lambda i: factory.get("/stats-miss", {"i": i})),
+        ("stats_hit", "stats", lambda i: factory.get("/stats-hit")),
+    ]
+
+    cache.clear()
+    results = {}
+    for name, view_name, make_request in scenarios:
+        # Warm up, which also makes the "hit" scenarios hits
+        for i in range(10):
+            views[view_name](make_request(-i - 1))
+        results[name] = measure(views[view_name], make_request)
+
+    baseline = results["baseline"]["mean_us"]
+    for name, result in results.items():
+        result["added_us"] = result["mean_us"] - baseline
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    common.add_backend_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument(
+        "--body-size", type=int, default=10_000, help="Response size in bytes"
+    )
+    args = parser.parse_args()
+
+    extra_settings = common.parse_settings(args.settings)
+    common.configure(args.backend, args.location, **extra_settings)
+    try:
+        results = {
+            "benchmark": "middleware",
+            "metadata": common.metadata(
+                args.backend,
+                settings=extra_settings,
+                iterations=args.iterations,
+                body_size=args.body_size,
+            ),
+            "results": run(args.iterations, args.body_size),
+        }
+    finally:
+        common.cleanup()
+    common.write_results(results, args.output)
+    if args.compare:
+        common.compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
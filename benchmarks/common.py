@@ -0,0 +1,199 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+"""
+import ast
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+BACKENDS = ("locmem", "file", "memcached", "redis", "fakeredis")
+
+
+def add_backend_arguments(parser):
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="locmem",
+        help="Cache backend to benchmark against (default: locmem)",
+    )
+    parser.add_argument(
+        "--location",
+        default=None,
+        help="Cache LOCATION, e.g. 127.0.0.1:11211 or redis://127.0.0.1:6379",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write the results as JSON to this file",
+    )
+    parser.add_argument(
+        "--compare",
+        default=None,
+        help="Compare the results with an earlier JSON output file",
+    )
+    parser.add_argument(
+        "--setting",
+        dest="settings",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Extra Django setting, e.g. FANCY_COMPRESS_REMEMBERED_URLS=True",
+    )
+
+
+def parse_settings(settings):
+    """
+    Turn a list of "NAME=VALUE" strings into a dict. The values are
+    Python literals; anything else is kept as a string.
+    """
+    parsed = {}
+    for each in settings:
+        name, value = each.split("=", 1)
+        try:
+            parsed[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            parsed[name] = value
+    return parsed
+
+
+def get_cache_config(backend, location=None):
+    if backend == "locmem":
+        return {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": location or "benchmark",
+            "OPTIONS": {"MAX_ENTRIES": 10_000_000},
+        }
+    if backend == "file":
+        return {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": location or tempfile.mkdtemp(prefix="fancy-bench-"),
+            "OPTIONS": {"MAX_ENTRIES": 10_000_000},
+        }
+    if backend == "memcached":
+        return {
+            "BACKEND": "django.core.cache.backends.memcached.PyLibMCCache",
+            "LOCATION": location or "127.0.0.1:11211",
+            "OPTIONS": {"behaviors": {"cas": True}},
+        }
+    if backend == "redis":
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": location or "redis://127.0.0.1:6379",
+        }
+    if backend == "fakeredis":
+        # An in-process stand-in for a Redis server.
+        import fakeredis
+
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://fakeredis",
+            "OPTIONS": {"connection_class": fakeredis.FakeConnection},
+        }
+    raise ValueError(backend)
+
+
+def configure(backend, location=None, **extra_settings):
+    """
+    Configure Django with a single "default" cache using `backend`.
+    """
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="benchmark",
+        ALLOWED_HOSTS=["testserver"],
+        CACHES={"default": get_cache_config(backend, location)},
+        INSTALLED_APPS=[],
+        **extra_settings,
+    )
+    django.setup()
+
+
+def cleanup():
+    from django.conf import settings
+    from django.core.cache import cache
+
+    cache.clear()
+    location = settings.CACHES["default"]["LOCATION"]
+    if os.path.basename(location).startswith("fancy-bench-"):
+        shutil.rmtree(location, ignore_errors=True)
+
+
+def summarize(timings_ns):
+    """
+    Return latency percentiles, in microseconds, and throughput.
+    """
+    timings = sorted(timings_ns)
+    total_seconds = sum(timings) / 1e9
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))] / 1000
+
+    return {
+        "iterations": len(timings),
+        "mean_us": statistics.mean(timings) / 1000,
+        "median_us": percentile(0.5),
+        "p95_us": percentile(0.95),
+        "p99_us": percentile(0.99),
+        "throughput_per_second": len(timings) / total_seconds,
+    }
+
+
+def metadata(backend, **extra):
+    import django
+
+    import fancy_cache
+
+    return dict(
+        {
+            "date": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "django": django.get_version(),
+            "fancy_cache": fancy_cache.__version__,
+            "backend": backend,
+        },
+        **extra,
+    )
+
+
+def write_results(results, output=None):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def compare(results, previous_path, key="mean_us"):
+    """
+    Print the relative change of `key` for every benchmark that is in
+    both `results` and the earlier results in `previous_path`.
+    """
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print("%-36s %12s %12s %8s" % ("benchmark", "before", "after", "change"))
+    for name, result in sorted(results["results"].items()):
+        before = previous["results"].get(name)
+        if not before or key not in before or key not in result:
+            continue
+        if before[key]:
+            change = "%+7.1f%%" % (
+                100.0 * (result[key] - before[key]) / before[key]
+            )
+        else:
+            change = "n/a"
+        print(
+            "%-36s %12.1f %12.1f %8s" % (name, before[key], result[key], change)
+        )
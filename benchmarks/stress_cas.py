@@ -0,0 +1,145 @@
+"""
+Hammer `remember_url` from many processes at the same time to measure
+contention on the remembered URLs index.
+
+Every process remembers its own distinct URLs, so afterwards every one of
+them should be in the index. The ones that aren't are lost updates. With
+``FANCY_USE_MEMCACHED_CHECK_AND_SET`` (the default for the memcached
+backend here) it also counts how many check-and-set retries were needed.
+
+The cache has to be shared between processes, so the locmem and
+fakeredis backends can't be used.
+
+Usage::
+
+    $ python benchmarks/stress_cas.py --backend memcached --processes 8
+    $ python benchmarks/stress_cas.py --backend file --misses 200
+    $ python benchmarks/stress_cas.py --backend memcached \\
+        --setting FANCY_USE_MEMCACHED_CHECK_AND_SET=False
+"""
+import argparse
+import multiprocessing
+import time
+
+import common
+
+
+def init_worker(backend, location, extra_settings):
+    common.configure(backend, location, **extra_settings)
+
+
+def worker(args):
+    worker_id, misses, start_at = args
+    from django.test.client import RequestFactory
+
+    from fancy_cache import metrics
+    from fancy_cache.middleware import FancyCacheMiddleware
+
+    collector = metrics.InMemoryCollector()
+    metrics.collectors.append(collector)
+    factory = RequestFactory()
+    middleware = FancyCacheMiddleware(
+        lambda request: None,
+        page_timeout=3600,
+        cache_alias=None,
+        key_prefix=None,
+        remember_all_urls=True,
+    )
+    requests = [
+        factory.get("/stress/%s/%s" % (worker_id, i)) for i in range(misses)
+    ]
+    # Start all processes at the same time to maximize contention
+    time.sleep(max(0, start_at - time.time()))
+    t0 = time.perf_counter()
+    for i, request in enumerate(requests):
+        middleware.remember_url(request, "key-%s-%s" % (worker_id, i), 3600)
+    seconds = time.perf_counter() - t0
+    retries = sum(
+        value
+        for (name, _), value in collector.counters.items()
+        if name == "fancy_cache_cas_retries_total"
+    )
+    return seconds, retries
+
+
+def run(backend, location, extra_settings, processes, misses):
+    from django.core.cache import cache
+
+    from fancy_cache.memory import get_remembered_urls
+
+    cache.clear()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        processes,
+        initializer=init_worker,
+        initargs=(backend, location, extra_settings),
+    ) as pool:
+        start_at = time.time() + 2
+        outcomes = pool.map(
+            worker, [(i, misses, start_at) for i in range(processes)]
+        )
+
+    remembered = [
+        url for url in get_remembered_urls() if url.startswith("/stress/")
+    ]
+    expected = processes * misses
+    slowest = max(seconds for seconds, _ in outcomes)
+    return {
+        "contention": {
+            "processes": processes,
+            "misses_per_process": misses,
+            "expected": expected,
+            "remembered": len(remembered),
+            "lost_updates": expected - len(remembered),
+            "lost_ratio": (expected - len(remembered)) / expected,
+            "cas_retries": sum(retries for _, retries in outcomes),
+            "seconds": slowest,
+            "throughput_per_second": expected / slowest,
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    common.add_backend_arguments(parser)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument(
+        "--misses",
+        type=int,
+        default=100,
+        help="Number of URLs each process remembers",
+    )
+    args = parser.parse_args()
+    if args.backend in ("locmem", "fakeredis"):
+        parser.error(
+            "The %s cache isn't shared between processes" % args.backend
+        )
+    # Make sure all processes use the same (temporary) directory
+    location = common.get_cache_config(args.backend, args.location)["LOCATION"]
+
+    extra_settings = {}
+    if args.backend == "memcached":
+        extra_settings["FANCY_USE_MEMCACHED_CHECK_AND_SET"] = True
+    extra_settings.update(common.parse_settings(args.settings))
+    common.configure(args.backend, location, **extra_settings)
+    try:
+        results = {
+            "benchmark": "stress_cas",
+            "metadata": common.metadata(args.backend, settings=extra_settings),
+            "results": run(
+                args.backend,
+                location,
+                extra_settings,
+                args.processes,
+                args.misses,
+            ),
+        }
+    finally:
+        common.cleanup()
+    common.write_results(results, args.output)
+    if args.compare:
+        common.compare(results, args.compare, key="lost_ratio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Timeouts that adapt, per URL, to how often the page changes. Every time
+a page is made again its body is compared with the last time. If it's
+the same the timeout is doubled, if not it's halved.
+
+The state is kept for twice the longest timeout, so it lasts from one
+time the page is made to the next, and it's deleted when the URL is
+purged.
+"""
+import hashlib
+import typing
+
+from fancy_cache.utils import md5
+
+__all__ = ("adapt_timeout", "forget_timeouts")
+
+
+def _get_key(url: str) -> str:
+    return md5("%s__adaptive" % url)
+
+
+def adapt_timeout(
+    cache,
+    url: str,
+    content: bytes,
+    timeout: int,
+    min_timeout: int,
+    max_timeout: int,
+    hits: typing.Optional[int] = None,
+) -> int:
+    """
+    Return the timeout to cache `content` of `url` for, between
+    `min_timeout` and `max_timeout`. `timeout` is the first one.
+
+    If `hits` (the number of cache hits the URL has had) is given, the
+    timeout is only made longer if the URL has had hits since the last
+    time; there's no point in keeping a page nobody asks for.
+    """
+    key = _get_key(url)
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    state = cache.get(key)
+    if state is None:
+        new_timeout = timeout
+    else:
+        previous_digest, previous_timeout, previous_hits = state
+        if digest != previous_digest:
+            new_timeout = previous_timeout // 2
+        elif hits is None or previous_hits is None or hits > previous_hits:
+            new_timeout = previous_timeout * 2
+        else:
+            new_timeout = previous_timeout
+    new_timeout = min(max(new_timeout, min_timeout), max_timeout)
+    cache.set(key, (digest, new_timeout, hits), max_timeout * 2)
+    return new_timeout
+
+
+def forget_timeouts(cache, urls: typing.Iterable[str]) -> None:
+    """
+    Delete what's known about how often the pages of `urls` change, so
+    they start over with the timeout given to `cache_page`.
+    """
+    cache.delete_many([_get_key(x) for x in urls])
@@ -0,0 +1,53 @@
+"""
+Only let pages into the cache once their URL has missed a number of
+times, so URLs that are hardly ever requested again don't push out the
+ones that are.
+
+The misses are counted per process, in a fixed size sketch, or with
+`FANCY_SHARED_ADMISSION` in the cache so that all processes count
+together.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from fancy_cache.sketch import CountMinSketch
+from fancy_cache.utils import md5
+
+SHARED_ADMISSION = getattr(settings, "FANCY_SHARED_ADMISSION", False)
+ADMISSION_SKETCH_WIDTH = getattr(
+    settings, "FANCY_ADMISSION_SKETCH_WIDTH", 16384
+)
+
+_lock = threading.Lock()
+_windows = {}  # window seconds -> [sketch, when the window started]
+
+
+def count_miss(url: str, window: int, cache) -> int:
+    """
+    Count a miss for `url` and return how many there have been in the
+    current window of `window` seconds.
+    """
+    if SHARED_ADMISSION:
+        key = md5("%s__admission" % url)
+        cache.add(key, 0, window)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired in between
+            return 1
+    now = time.time()
+    with _lock:
+        sketch_and_start = _windows.get(window)
+        if sketch_and_start is None:
+            sketch_and_start = _windows[window] = [
+                CountMinSketch(width=ADMISSION_SKETCH_WIDTH),
+                now,
+            ]
+        sketch, start = sketch_and_start
+        if now - start >= window:
+            sketch.clear()
+            sketch_and_start[1] = now
+        sketch.add(url)
+        return sketch.estimate(url)
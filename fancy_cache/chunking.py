@@ -0,0 +1,74 @@
+"""
+Store values that are too big for one cache item, like Memcached's 1MB
+limit, as several chunks and a small manifest under the original key.
+
+The chunk keys include a version that's new every time so that a reader
+that got a manifest always gets the chunks that were stored with it,
+never a mix of old and new ones. The chunks are stored before the
+manifest and those of older versions are left to expire.
+
+Values that fit in one chunk are stored in the manifest itself, already
+pickled, so that they aren't pickled twice.
+"""
+import pickle
+import typing
+import uuid
+
+__all__ = ("Manifest", "get_chunked", "set_chunked")
+
+
+class Manifest(object):
+    """
+    What's stored under the original key of a value that's been split,
+    or of a small one with `data` the pickled value.
+    """
+
+    def __init__(self, version: str, count: int, data: bytes = None):
+        self.version = version
+        self.count = count
+        self.data = data
+
+    def keys(self, key: str) -> typing.List[str]:
+        return [
+            "%s.chunk.%s.%s" % (key, self.version, i) for i in range(self.count)
+        ]
+
+
+def set_chunked(
+    cache, key: str, value, timeout, chunk_size: int
+) -> typing.Optional[int]:
+    """
+    Store `value` under `key`, in chunks of `chunk_size` bytes if it's
+    bigger than that when pickled. Return the size of the pickled value,
+    or None if it couldn't be stored.
+    """
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    if len(data) <= chunk_size:
+        cache.set(key, Manifest("", 0, data), timeout)
+        return len(data)
+    manifest = Manifest(uuid.uuid4().hex, -(-len(data) // chunk_size))
+    chunks = {
+        chunk_key: data[i * chunk_size : (i + 1) * chunk_size]
+        for i, chunk_key in enumerate(manifest.keys(key))
+    }
+    if cache.set_many(chunks, timeout):
+        # Some chunks weren't stored so don't point to them.
+        return None
+    cache.set(key, manifest, timeout)
+    return len(data)
+
+
+def get_chunked(cache, key: str, value):
+    """
+    Return `value`, as got from `key`, or if it's a manifest the value
+    that was split. None if any of the chunks are gone.
+    """
+    if not isinstance(value, Manifest):
+        return value
+    if getattr(value, "data", None) is not None:
+        return pickle.loads(value.data)
+    chunk_keys = value.keys(key)
+    chunks = cache.get_many(chunk_keys)
+    if len(chunks) != len(chunk_keys):
+        return None
+    return pickle.loads(b"".join(chunks[chunk_key] for chunk_key in chunk_keys))
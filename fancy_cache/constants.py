@@ -1,2 +1,16 @@
 REMEMBERED_URLS_KEY = "fancy-urls"
+# The minute the remembered URLs have been swept up to, and followed by
+# ":<minute>" the URLs that expire in that minute.
+EXPIRING_URLS_KEY = "fancy-urls-expiring"
 LONG_TIME = 60 * 60 * 24 * 30
+TOP_URLS_KEY = "fancy-top-urls"
+# WSGI environ key that makes the middleware skip the cache lookup so the
+# view is rendered and cached again. Not settable through HTTP headers.
+REFRESH_ENVIRON_KEY = "fancy_cache.refresh"
+# WSGI environ key of the requests made by `fancy_cache.warming`, which
+# aren't counted in the stats, the top URLs or the request metrics.
+WARM_ENVIRON_KEY = "fancy_cache.warm"
+# Around the URL in the key prefix of views with `path_in_cache_key`.
+# Never in a URL as it's where the fragment would begin.
+PATH_KEY_DELIMITER = "#"
+GENERATION_KEY = "fancy-generation"
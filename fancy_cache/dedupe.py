@@ -0,0 +1,147 @@
+"""
+Store the body of responses once per distinct content, under its hash,
+instead of once per URL. The cache key of the page then only has the
+response without its body and the hash.
+
+Every body has the cache keys of the pages that refer to it, and when
+they expire, so that purging pages only deletes the bodies no other page
+refers to. A body is kept for as long as the page that refers to it
+that's cached the longest, so a page whose body is gone is a miss.
+"""
+import copy
+import hashlib
+import time
+import typing
+
+from fancy_cache.chunking import Manifest, get_chunked, set_chunked
+
+__all__ = ("DedupedResponse", "delete_pages", "dedupe", "resolve")
+
+BODY_KEY = "fancy-body:%s"
+REFERENCES_KEY = "fancy-body-references:%s"
+
+
+class DedupedResponse(object):
+    """
+    What's stored under the cache key of a page instead of the response.
+    """
+
+    def __init__(self, response, digest: str):
+        self.response = response
+        self.digest = digest
+
+
+def _get_references(cache, digest: str, now: int) -> typing.Optional[dict]:
+    """
+    Return {cache key: expiration time} of the pages that refer to the
+    body that haven't expired, or None if it's not known.
+    """
+    references = cache.get(REFERENCES_KEY % digest)
+    if references is None:
+        return None
+    return {k: v for k, v in references.items() if v > now}
+
+
+def _set_references(cache, digest: str, references: dict, now: int) -> int:
+    """
+    Store the pages that refer to the body and return for how long
+    they, and the body, have to be kept.
+    """
+    timeout = max(references.values()) - now
+    cache.set(REFERENCES_KEY % digest, references, timeout)
+    return timeout
+
+
+def _unreference(cache, digest: str, cache_key: str, now: int) -> bool:
+    """
+    Forget that the page of `cache_key` refers to the body and return
+    true if no other page does.
+    """
+    references = _get_references(cache, digest, now)
+    if references is None:
+        # Not known which pages refer to it; let it expire.
+        return False
+    references.pop(cache_key, None)
+    if not references:
+        return True
+    _set_references(cache, digest, references, now)
+    return False
+
+
+def _delete_bodies(cache, digests: typing.List[str], keys_to_delete) -> None:
+    """
+    Delete the bodies of `digests`, with their chunks and references,
+    and `keys_to_delete`.
+    """
+    keys_to_delete = list(keys_to_delete)
+    body_keys = [BODY_KEY % x for x in digests]
+    keys_to_delete.extend(body_keys)
+    keys_to_delete.extend(REFERENCES_KEY % x for x in digests)
+    for body_key, value in cache.get_many(body_keys).items():
+        if isinstance(value, Manifest):
+            keys_to_delete.extend(value.keys(body_key))
+    cache.delete_many(keys_to_delete)
+
+
+def dedupe(
+    cache, cache_key: str, response, timeout: int, chunk_size: int = None
+) -> DedupedResponse:
+    """
+    Store the body of `response` and return what to store for the page
+    of `cache_key`.
+    """
+    content = response.content
+    digest = hashlib.blake2b(content, digest_size=20).hexdigest()
+    now = int(time.time())
+    previous = get_chunked(cache, cache_key, cache.get(cache_key))
+    if isinstance(previous, DedupedResponse) and previous.digest != digest:
+        # The page has changed.
+        if _unreference(cache, previous.digest, cache_key, now):
+            _delete_bodies(cache, [previous.digest], [])
+    references = _get_references(cache, digest, now) or {}
+    references[cache_key] = now + timeout
+    timeout = _set_references(cache, digest, references, now)
+    body_key = BODY_KEY % digest
+    if chunk_size:
+        set_chunked(cache, body_key, content, timeout, chunk_size)
+    else:
+        cache.set(body_key, content, timeout)
+    response = copy.copy(response)
+    response.content = b""
+    return DedupedResponse(response, digest)
+
+
+def resolve(cache, value):
+    """
+    Return `value`, as got from the cache, or if it's a page with a
+    deduped body the response with its body. None if the body is gone.
+    """
+    if not isinstance(value, DedupedResponse):
+        return value
+    body_key = BODY_KEY % value.digest
+    content = get_chunked(cache, body_key, cache.get(body_key))
+    if content is None:
+        return None
+    value.response.content = content
+    return value.response
+
+
+def delete_pages(cache, cache_keys: typing.List[str]) -> typing.List[str]:
+    """
+    Delete the pages, and their chunks, and the bodies that no other
+    page refers to, and return the keys of the pages that were cached.
+    """
+    keys_to_delete = list(cache_keys)
+    digests = []
+    now = int(time.time())
+    found = cache.get_many(cache_keys)
+    for cache_key, value in found.items():
+        if isinstance(value, Manifest):
+            keys_to_delete.extend(value.keys(cache_key))
+            value = get_chunked(cache, cache_key, value)
+        if isinstance(value, DedupedResponse) and _unreference(
+            cache, value.digest, cache_key, now
+        ):
+            digests.append(value.digest)
+    _delete_bodies(cache, digests, keys_to_delete)
+    return [cache_key for cache_key in cache_keys if cache_key in found]
@@ -0,0 +1,265 @@
+"""
+A compact binary encoding of the remembered URLs dict
+({url: (cache_key, expiration_time)}).
+
+The layout, all integers little-endian, is::
+
+    header    b"FCU1", number of URLs and length of the body (uint32)
+    urls      the sorted URLs, their lengths and then all of them as one
+              zlib compressed string (which takes care of the prefixes
+              they share)
+    expires   one uint32 per URL
+    keys      every cache key is a template and the 32 character hex
+              digests (as made by Django's `learn_cache_key`) that are
+              unique to it, stored as 16 bytes each. The distinct
+              templates are stored once with an index per URL.
+    aliases   the distinct cache aliases, for URLs remembered with one,
+              and an index (plus one, or 0) per URL
+    tail      records added with `append()` after the body was encoded
+
+Columns of integers are stored with the smallest of uint8, uint16 or
+uint32 that fits all of them.
+
+Adding a URL with `append()` doesn't need to decode anything. The tail
+is allowed to grow as big as the body after which `can_append()` says
+it's time to encode it all again, dropping expired URLs.
+"""
+import collections
+import itertools
+import re
+import struct
+import typing
+import zlib
+
+__all__ = ("append", "can_append", "decode", "encode", "is_compact")
+
+MAGIC = b"FCU1"
+MIN_TAIL_SIZE = 4 * 1024
+
+_HEADER = struct.Struct("<4sII")
+# URL length, cache key length, expiration time, cache alias length
+_TAIL_RECORD = struct.Struct("<IIIH")
+_HEX_DIGEST = re.compile(r"(?<=\.)([0-9a-f]{32})(?=\.|$)")
+_MAX_UINT32 = (1 << 32) - 1
+
+
+def _pack_ints(values: typing.List[int]) -> bytes:
+    largest = max(values, default=0)
+    if largest < 1 << 8:
+        code = "B"
+    elif largest < 1 << 16:
+        code = "H"
+    else:
+        code = "I"
+    return code.encode() + struct.pack("<%d%s" % (len(values), code), *values)
+
+
+def _unpack_ints(
+    data: bytes, offset: int, count: int
+) -> typing.Tuple[typing.Tuple[int, ...], int]:
+    fmt = "<%d%s" % (count, chr(data[offset]))
+    values = struct.unpack_from(fmt, data, offset + 1)
+    return values, offset + 1 + struct.calcsize(fmt)
+
+
+def _pack_strings(strings: typing.List[str], compress: bool = False) -> bytes:
+    joined = "".join(strings).encode("utf-8")
+    if compress:
+        joined = zlib.compress(joined)
+    return (
+        struct.pack("<I", len(strings))
+        + _pack_ints([len(x) for x in strings])
+        + struct.pack("<I", len(joined))
+        + joined
+    )
+
+
+def _unpack_strings(
+    data: bytes, offset: int, compressed: bool = False
+) -> typing.Tuple[typing.List[str], int]:
+    (count,) = struct.unpack_from("<I", data, offset)
+    lengths, offset = _unpack_ints(data, offset + 4, count)
+    (size,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    joined = data[offset : offset + size]
+    if compressed:
+        joined = zlib.decompress(joined)
+    joined = joined.decode("utf-8")
+    ends = list(itertools.accumulate(lengths))
+    strings = [joined[start:end] for start, end in zip([0] + ends, ends)]
+    return strings, offset + size
+
+
+def is_compact(data) -> bool:
+    return isinstance(data, bytes) and data[:4] == MAGIC
+
+
+def encode(
+    remembered_urls: typing.Dict[str, typing.Tuple[str, int]],
+) -> bytes:
+    urls = sorted(remembered_urls)
+    expires = []
+    splits = []
+    aliases = {}
+    alias_ids = []
+    for url in urls:
+        value = remembered_urls[url]
+        if isinstance(value, str):
+            value = (value, 0)
+        expires.append(min(max(int(value[1]), 0), _MAX_UINT32))
+        if len(value) > 2 and value[2]:
+            alias_ids.append(aliases.setdefault(value[2], len(aliases)) + 1)
+        else:
+            alias_ids.append(0)
+        # [text, digest, text, digest, ..., text]
+        splits.append(_HEX_DIGEST.split(value[0]))
+
+    # Digests that are in more than one key, like the hash of the
+    # headers, are cheaper to keep in the template.
+    digest_counts = collections.Counter(
+        digest for pieces in splits for digest in pieces[1::2]
+    )
+    templates = {}
+    template_ids = []
+    digests = []
+    for pieces in splits:
+        template = [pieces[0]]
+        for i in range(1, len(pieces), 2):
+            if digest_counts[pieces[i]] == 1:
+                digests.append(pieces[i])
+                template.append(pieces[i + 1])
+            else:
+                template[-1] += pieces[i] + pieces[i + 1]
+        template_ids.append(
+            templates.setdefault(tuple(template), len(templates))
+        )
+
+    body = b"".join(
+        [
+            _pack_strings(urls, compress=True),
+            struct.pack("<%dI" % len(expires), *expires),
+            _pack_ints(template_ids),
+            struct.pack("<I", len(templates)),
+            _pack_ints([len(x) for x in templates]),
+            _pack_strings([piece for x in templates for piece in x]),
+            struct.pack("<I", len(digests)),
+            bytes.fromhex("".join(digests)),
+            _pack_ints(alias_ids),
+            _pack_strings(list(aliases)),
+        ]
+    )
+    return _HEADER.pack(MAGIC, len(urls), len(body)) + body
+
+
+def decode(data: bytes) -> typing.Dict[str, typing.Tuple[str, int]]:
+    magic, count, body_length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not compact encoded remembered URLs")
+    urls, offset = _unpack_strings(data, _HEADER.size, compressed=True)
+    expires = struct.unpack_from("<%dI" % count, data, offset)
+    offset += 4 * count
+    template_ids, offset = _unpack_ints(data, offset, count)
+    (templates_count,) = struct.unpack_from("<I", data, offset)
+    sizes, offset = _unpack_ints(data, offset + 4, templates_count)
+    pieces, offset = _unpack_strings(data, offset)
+    templates = []
+    position = 0
+    for size in sizes:
+        templates.append(pieces[position : position + size])
+        position += size
+    (digests_count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    digests = data[offset : offset + 16 * digests_count].hex()
+    offset += 16 * digests_count
+    alias_ids, offset = _unpack_ints(data, offset, count)
+    aliases, offset = _unpack_strings(data, offset)
+
+    remembered_urls = {}
+    position = 0
+    for url, expiration_time, template_id, alias_id in zip(
+        urls, expires, template_ids, alias_ids
+    ):
+        template = templates[template_id]
+        if len(template) == 1:
+            cache_key = template[0]
+        elif len(template) == 2:
+            cache_key = template[0] + digests[position : position + 32]
+            cache_key += template[1]
+            position += 32
+        else:
+            parts = [template[0]]
+            for piece in template[1:]:
+                parts.append(digests[position : position + 32])
+                parts.append(piece)
+                position += 32
+            cache_key = "".join(parts)
+        if alias_id:
+            remembered_urls[url] = (
+                cache_key,
+                expiration_time,
+                aliases[alias_id - 1],
+            )
+        else:
+            remembered_urls[url] = (cache_key, expiration_time)
+
+    offset = _HEADER.size + body_length
+    while offset < len(data):
+        (
+            url_length,
+            key_length,
+            expiration_time,
+            alias_length,
+        ) = _TAIL_RECORD.unpack_from(data, offset)
+        offset += _TAIL_RECORD.size
+        url = data[offset : offset + url_length].decode("utf-8")
+        offset += url_length
+        cache_key = data[offset : offset + key_length].decode("utf-8")
+        offset += key_length
+        if alias_length:
+            cache_alias = data[offset : offset + alias_length].decode("utf-8")
+            offset += alias_length
+            remembered_urls[url] = (cache_key, expiration_time, cache_alias)
+        else:
+            remembered_urls[url] = (cache_key, expiration_time)
+    return remembered_urls
+
+
+def can_append(data) -> bool:
+    """
+    Return true if `data` is compact encoded and its tail isn't yet due
+    to be encoded into the body.
+    """
+    if not is_compact(data):
+        return False
+    _, _, body_length = _HEADER.unpack_from(data)
+    tail_length = len(data) - _HEADER.size - body_length
+    return tail_length < max(MIN_TAIL_SIZE, body_length)
+
+
+def append(
+    data: bytes,
+    url: str,
+    cache_key: str,
+    expiration_time: int,
+    cache_alias: str = None,
+) -> bytes:
+    """
+    Return `data` with the URL added (or replaced) without decoding it.
+    """
+    url_bytes = url.encode("utf-8")
+    key_bytes = cache_key.encode("utf-8")
+    alias_bytes = (cache_alias or "").encode("utf-8")
+    return b"".join(
+        [
+            data,
+            _TAIL_RECORD.pack(
+                len(url_bytes),
+                len(key_bytes),
+                min(max(int(expiration_time), 0), _MAX_UINT32),
+                len(alias_bytes),
+            ),
+            url_bytes,
+            key_bytes,
+            alias_bytes,
+        ]
+    )
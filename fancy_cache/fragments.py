@@ -0,0 +1,189 @@
+"""
+Cache parts of pages, for pages that can't be cached whole because of
+a personalized part.
+
+Fragments are cached per URL, after `only_get_keys` or
+`forget_get_keys`, and take the same options as `cache_page`, so a
+callable `key_prefix`, `remember_all_urls` and
+`remember_stats_all_urls` work the same. Fragments are remembered as the
+URL followed by "#" and the name of the fragment, and a hash of what it
+varies on if anything, so ``find_urls(["/page*"], purge=True)`` purges
+the page and its fragments, and `purge_all` invalidates them too.
+
+For example::
+
+    from fancy_cache.fragments import cache_fragments
+
+    fragments = cache_fragments(
+        request,
+        {"sidebar": render_sidebar, "footer": render_footer},
+        timeout=600,
+        key_prefix=get_key_prefix,
+    )
+
+All the fragments are fetched with one `get_many`.
+"""
+import typing
+
+from fancy_cache.constants import PATH_KEY_DELIMITER
+from fancy_cache.middleware import FancyCacheMiddleware, RequestPath
+from fancy_cache.utils import md5
+
+__all__ = ("FragmentCache", "cache_fragment", "cache_fragments")
+
+FRAGMENT_KEY_PREFIX = "fancy-fragment"
+
+
+def _join(vary_on: typing.Sequence) -> str:
+    return ":".join(str(x) for x in vary_on)
+
+
+class FragmentCache(object):
+    """
+    The fragments of one request that share the same options.
+
+    `get_key` returns None, and the fragment is always rendered, if
+    the request isn't a GET or HEAD or if a callable `key_prefix`
+    returns None.
+    """
+
+    def __init__(
+        self,
+        request,
+        timeout: typing.Optional[int] = None,
+        cache: str = None,
+        key_prefix=None,
+        **options
+    ):
+        self.request = request
+        self.middleware = FancyCacheMiddleware(
+            lambda request: None,
+            cache_timeout=timeout,
+            cache_alias=cache,
+            key_prefix=key_prefix,
+            **options
+        )
+        self.fetched = {}
+        if request.method in ("GET", "HEAD"):
+            self.key_prefix = self.middleware._get_key_prefix(request)
+        else:
+            self.key_prefix = None
+        with RequestPath(
+            request,
+            self.middleware.only_get_keys,
+            self.middleware.forget_get_keys,
+        ):
+            self.url = request.get_full_path()
+
+    def get_url(self, name: str, vary_on: typing.Sequence = ()) -> str:
+        """
+        Return what the fragment is remembered as, with a hash of what
+        it varies on, if anything, so every variant is remembered.
+        """
+        url = "%s%s%s" % (self.url, PATH_KEY_DELIMITER, name)
+        if vary_on:
+            url += ":%s" % md5(_join(vary_on))[:12]
+        return url
+
+    def get_key(
+        self, name: str, vary_on: typing.Sequence = ()
+    ) -> typing.Optional[str]:
+        if self.key_prefix is None:
+            return None
+        return "%s.%s.%s" % (
+            FRAGMENT_KEY_PREFIX,
+            self.key_prefix,
+            md5("%s\n%s" % (self.get_url(name), _join(vary_on))),
+        )
+
+    def fetch(self, cache_keys: typing.Iterable[str]) -> None:
+        """
+        Get the fragments that haven't been fetched yet with one
+        `get_many`.
+        """
+        cache_keys = [
+            x for x in cache_keys if x is not None and x not in self.fetched
+        ]
+        if not cache_keys:
+            return
+        found = self.middleware.cache.get_many(cache_keys)
+        for cache_key in cache_keys:
+            self.fetched[cache_key] = found.get(cache_key)
+
+    def render(
+        self,
+        name: str,
+        render: typing.Callable[[], str],
+        vary_on: typing.Sequence = (),
+        timeout: typing.Optional[int] = None,
+    ) -> str:
+        """
+        Return the cached fragment, or call `render` and cache what it
+        returns for `timeout` seconds, or the timeout of this cache.
+        """
+        cache_key = self.get_key(name, vary_on)
+        if cache_key is None:
+            return render()
+        self.fetch([cache_key])
+        content = self.fetched[cache_key]
+        middleware = self.middleware
+        if middleware.remember_stats_all_urls:
+            middleware._incr_stats(
+                self.get_url(name, vary_on), content is not None
+            )
+        if content is not None:
+            return content
+
+        content = render()
+        if timeout is None:
+            timeout = middleware.cache_timeout
+        if timeout:
+            middleware.cache.set(cache_key, content, timeout)
+            self.fetched[cache_key] = content
+            if middleware.remember_all_urls:
+                middleware.remember_url(
+                    self.request,
+                    cache_key,
+                    timeout,
+                    url=self.get_url(name, vary_on),
+                    view=name,
+                )
+        return content
+
+
+def cache_fragments(
+    request,
+    fragments: typing.Dict[str, typing.Callable[[], str]],
+    timeout: typing.Optional[int] = None,
+    vary_on: typing.Sequence = (),
+    **options
+) -> typing.Dict[str, str]:
+    """
+    Return {name: content} of `fragments`, which is {name: callable}.
+    The ones that aren't cached are rendered by calling their callable
+    and cached for `timeout` seconds. `options` are the keyword
+    arguments of `cache_page`, like `cache`, `key_prefix` or
+    `only_get_keys`.
+    """
+    fragment_cache = FragmentCache(request, timeout, **options)
+    fragment_cache.fetch(fragment_cache.get_key(x, vary_on) for x in fragments)
+    return {
+        name: fragment_cache.render(name, render, vary_on)
+        for name, render in fragments.items()
+    }
+
+
+def cache_fragment(
+    request,
+    name: str,
+    render: typing.Callable[[], str],
+    timeout: typing.Optional[int] = None,
+    vary_on: typing.Sequence = (),
+    **options
+) -> str:
+    """
+    Like `cache_fragments` for one fragment.
+    """
+    return cache_fragments(
+        request, {name: render}, timeout, vary_on=vary_on, **options
+    )[name]
@@ -0,0 +1,55 @@
+"""
+Generation counters, one global and one per key prefix, that are part of
+every cache key when `FANCY_USE_GENERATIONS` is set. Incrementing one
+makes all the pages cached with it unreachable, so they are purged in
+one operation and left for the cache to evict.
+"""
+import time
+import typing
+
+from fancy_cache.constants import GENERATION_KEY
+from fancy_cache.utils import md5
+
+__all__ = ("get_generation", "incr_generation")
+
+
+def _generation_key(key_prefix: str = None) -> str:
+    if key_prefix is None:
+        return GENERATION_KEY
+    # The key prefix can be anything, like a user's name.
+    return "%s:%s" % (GENERATION_KEY, md5(key_prefix))
+
+
+def _initial_generation() -> int:
+    # Not 0, so that pages from before a counter was evicted don't come
+    # back when it's added again.
+    return int(time.time() * 1000)
+
+
+def get_generation(cache, key_prefix: str) -> str:
+    """
+    Return the global and the `key_prefix` generation, with one round
+    trip to `cache` unless they have to be added first.
+    """
+    keys = [_generation_key(), _generation_key(key_prefix)]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), None)
+            # Whatever was added first, by this or another process.
+            generations[key] = cache.get(key)
+    return "%s.%s" % tuple(generations[key] for key in keys)
+
+
+def incr_generation(cache, key_prefix: typing.Optional[str] = None) -> int:
+    """
+    Increment the global, or the `key_prefix`, generation and return it.
+    """
+    key = _generation_key(key_prefix)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Not there, so nothing was cached with it (or it was evicted).
+        generation = _initial_generation()
+        cache.set(key, generation, None)
+        return generation
@@ -0,0 +1,70 @@
+"""
+In-process tracking of the most requested URLs, periodically merged into
+the cache so that all processes contribute to the same top list.
+"""
+import threading
+import time
+import typing
+
+from django.conf import settings
+
+from fancy_cache.constants import LONG_TIME, TOP_URLS_KEY
+from fancy_cache.sketch import HeavyHitters
+
+TOP_URLS = getattr(settings, "FANCY_TOP_URLS", 0)
+TOP_URLS_FLUSH_INTERVAL = getattr(settings, "FANCY_TOP_URLS_FLUSH_INTERVAL", 10)
+
+
+def _new() -> HeavyHitters:
+    return HeavyHitters(TOP_URLS or 100)
+
+
+_lock = threading.Lock()
+_pending = _new()
+_last_flush = time.time()
+
+
+def record(url: str, hit: bool, cache) -> None:
+    """
+    Count one request for `url`. Every `FANCY_TOP_URLS_FLUSH_INTERVAL`
+    seconds what's been counted is merged into the cache.
+    """
+    with _lock:
+        _pending.add(url, hit)
+        if time.time() - _last_flush < TOP_URLS_FLUSH_INTERVAL:
+            return
+    flush(cache)
+
+
+def flush(cache) -> None:
+    """
+    Merge what's been counted in this process into the cache.
+    """
+    global _pending, _last_flush
+    with _lock:
+        pending = _pending
+        _pending = _new()
+        _last_flush = time.time()
+    if not pending.requests.counters:
+        return
+    # Note: this is a read-modify-write so concurrent flushes from other
+    # processes can occasionally lose some counts. It's only a sketch.
+    shared = cache.get(TOP_URLS_KEY)
+    if shared is None:
+        shared = pending
+    else:
+        shared.merge(pending)
+    cache.set(TOP_URLS_KEY, shared, LONG_TIME)
+
+
+def get_top_urls(
+    cache, n: int = None
+) -> typing.List[typing.Tuple[str, int, int]]:
+    """
+    Return a list of (url, requests, misses), most requested first.
+    """
+    flush(cache)
+    shared = cache.get(TOP_URLS_KEY)
+    if shared is None:
+        return []
+    return shared.top(n)
@@ -0,0 +1,95 @@
+import os
+
+_this_wo_ext = os.path.basename(__file__).rsplit(".", 1)[0]
+
+__doc__ = """
+Keep re-rendering the hottest remembered URLs shortly before their cached
+page expires, so they never present a cache miss. Requires
+`FANCY_REMEMBER_ALL_URLS` and `FANCY_REMEMBER_STATS_ALL_URLS`.
+
+To use: leave it running next to your web server like this::
+
+    $ ./manage.py %(this_file)s --lead-time 30 --min-hits 10
+
+Or only do one round, for example from cron::
+
+    $ ./manage.py %(this_file)s --once
+
+""" % dict(
+    this_file=_this_wo_ext
+)
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from fancy_cache.refresh import RefreshAheadScheduler
+
+
+class Command(BaseCommand):
+    help = __doc__.strip()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lead-time",
+            type=int,
+            default=30,
+            help="Refresh pages expiring within this many seconds",
+        )
+        parser.add_argument(
+            "--min-hits",
+            type=int,
+            default=1,
+            help="Hits needed since the last refresh to count as hot",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=None,
+            help="Max number of URLs to refresh per round",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10,
+            help="Seconds to wait between rounds",
+        )
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of URLs to refresh at the same time",
+        )
+        parser.add_argument(
+            "--host",
+            default=None,
+            help="Host to request the URLs as (default from ALLOWED_HOSTS)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Only do one round and then exit",
+        )
+
+    def handle(self, **options):
+        verbose = int(options["verbosity"]) > 1
+        scheduler = RefreshAheadScheduler(
+            lead_time=options["lead_time"],
+            min_hits=options["min_hits"],
+            top=options["top"],
+            interval=options["interval"],
+            concurrency=options["concurrency"],
+            host=options["host"],
+        )
+        while True:
+            results = scheduler.run()
+            if verbose:
+                for url, status_code, seconds in results:
+                    self.stdout.write(
+                        "%s %.3fs %s" % (status_code, seconds, url)
+                    )
+                self.stdout.write("-- %s URLs refreshed --" % len(results))
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
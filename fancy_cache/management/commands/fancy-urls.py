@@ -21,24 +21,58 @@ running this will purge all cached URLs::
 
     $ ./manage.py %(this_file)s --purge
 
+If you set `FANCY_USE_GENERATIONS` that's done, without looking at the
+URLs, by incrementing the generation that's part of every cache key. Or
+only the generation of one key prefix::
+
+    $ ./manage.py %(this_file)s --purge --key-prefix=myprefix
+
 If you enable `FANCY_REMEMBER_STATS_ALL_URLS` you can get a tally for each
 URL how many cache HITS and MISSES it has had.
 
+To save the URLs, whole and with their HITS, for `fancy-warm --file`::
+
+    $ ./manage.py %(this_file)s --export > urls.txt
+
+If you set `FANCY_TOP_URLS` you can list the most requested URLs and their
+miss rate with::
+
+    $ ./manage.py %(this_file)s --top 20
+
+If you set `FANCY_DEFER_REMEMBERED_URLS_SWEEP` run this regularly to
+drop the expired URLs from the remembered URLs::
+
+    $ ./manage.py %(this_file)s --sweep
+
+Pages of views with `path_in_cache_key` can be found, and purged, by
+scanning the keys in the cache (local memory or Redis only) instead of
+by the remembered URLs::
+
+    $ ./manage.py %(this_file)s --scan /path1.html /path3/* --purge
+
 """ % dict(
     this_file=_this_wo_ext
 )
 
 from optparse import make_option
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from fancy_cache.memory import find_urls
+from fancy_cache.memory import (
+    find_top_urls,
+    find_urls,
+    purge_all,
+    sweep_remembered_urls,
+)
+from fancy_cache.middleware import USE_GENERATIONS
+from fancy_cache.scanning import scan_urls
 
 
 class Command(BaseCommand):
     help = __doc__.strip()
 
     def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="*", help="URL patterns to find")
         parser.add_argument(
             "-p",
             "--purge",
@@ -46,18 +80,113 @@ class Command(BaseCommand):
             action="store_true",
             help="Purge found URLs",
         )
+        parser.add_argument(
+            "--key-prefix",
+            dest="key_prefix",
+            default=None,
+            help="With --purge, purge only the pages with this key prefix",
+        )
+        parser.add_argument(
+            "--top",
+            dest="top",
+            type=int,
+            default=None,
+            help="List the N most requested URLs",
+        )
+        parser.add_argument(
+            "--export",
+            dest="export",
+            action="store_true",
+            help="List the whole URLs and their hits, for fancy-warm --file",
+        )
+        parser.add_argument(
+            "--sweep",
+            dest="sweep",
+            action="store_true",
+            help="Drop the expired URLs from the remembered URLs",
+        )
+        parser.add_argument(
+            "--scan",
+            dest="scan",
+            action="store_true",
+            help="Find the URLs by scanning the keys in the cache",
+        )
+        parser.add_argument(
+            "--cache",
+            dest="cache",
+            default=None,
+            help="The cache alias to scan (default: default)",
+        )
 
     args = "urls"
 
-    def handle(self, *urls, **options):
+    def handle(self, *args, **options):
+        urls = options["urls"]
         verbose = int(options["verbosity"]) > 1
         _count = 0
+        if options["sweep"]:
+            swept = sweep_remembered_urls()
+            if verbose:
+                self.stdout.write("-- %s expired URLs swept --" % swept)
+            return
+
+        if options["key_prefix"] is not None and (
+            not options["purge"] or urls or not USE_GENERATIONS
+        ):
+            # Rather than purging, or listing, the pages of all key
+            # prefixes.
+            raise CommandError(
+                "--key-prefix only works with --purge, without URL "
+                "patterns, and FANCY_USE_GENERATIONS"
+            )
+
+        if options["purge"] and not urls and USE_GENERATIONS:
+            purge_all(options["key_prefix"])
+            if verbose:
+                self.stdout.write("-- all cached URLs purged --")
+            return
+
+        if options["top"]:
+            for url, requests, misses in find_top_urls(options["top"], urls):
+                _count += 1
+                self.stdout.write(
+                    "%s REQUESTS %s MISS RATE %.1f%%"
+                    % (
+                        url[:70].ljust(65),
+                        str(requests).ljust(7),
+                        100.0 * misses / requests,
+                    )
+                )
+            if verbose:
+                self.stdout.write("-- %s top URLs --" % _count)
+            return
+
+        if options["scan"]:
+            for url, cache_keys in scan_urls(
+                urls, purge=options["purge"], cache_alias=options["cache"]
+            ):
+                _count += 1
+                self.stdout.write(url)
+            if verbose:
+                self.stdout.write("-- %s URLs cached --" % _count)
+            return
+
         for url, cache_key, stats in find_urls(urls, purge=options["purge"]):
             _count += 1
-            if stats:
-                self.stdout.write(url[:70].ljust(65)),
-                self.stdout.write("HITS", str(stats["hits"]).ljust(5)),
-                self.stdout.write("MISSES", str(stats["misses"]).ljust(5))
+            if options["export"]:
+                if stats:
+                    self.stdout.write("%s\t%s" % (url, stats["hits"]))
+                else:
+                    self.stdout.write(url)
+            elif stats:
+                self.stdout.write(
+                    "%s HITS %s MISSES %s"
+                    % (
+                        url[:70].ljust(65),
+                        str(stats["hits"]).ljust(5),
+                        str(stats["misses"]).ljust(5),
+                    )
+                )
 
             else:
                 self.stdout.write(url)
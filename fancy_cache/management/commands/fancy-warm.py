@@ -0,0 +1,116 @@
+import os
+
+_this_wo_ext = os.path.basename(__file__).rsplit(".", 1)[0]
+
+__doc__ = """
+Re-request URLs through Django's own request handler, in-process, so that
+their cached pages are already in place before real traffic comes in.
+
+By default it requests all URLs remembered by `FANCY_REMEMBER_ALL_URLS`.
+You can limit that with URL patterns, the same as with `fancy-urls`::
+
+    $ ./manage.py %(this_file)s /path1.html /path3/*/*.json
+
+Or read the URLs from a file with one URL per line, or a sitemap::
+
+    $ ./manage.py %(this_file)s --file sitemap.xml
+
+If you enable `FANCY_REMEMBER_STATS_ALL_URLS` the URLs with the most
+cache HITS are requested first.
+
+Since purging also forgets the remembered URLs, and their stats, a handy
+thing to do on deploys is to save the list, with the hits, first::
+
+    $ ./manage.py fancy-urls --export > urls.txt
+    $ ./manage.py fancy-urls --purge
+    $ ./manage.py %(this_file)s --file urls.txt --top 100 --concurrency 8
+
+""" % dict(
+    this_file=_this_wo_ext
+)
+
+from django.core.management.base import BaseCommand
+
+from fancy_cache.warming import (
+    read_hits_file,
+    read_urls_file,
+    remembered_urls,
+    sort_urls_by_hits,
+    warm_urls,
+)
+
+
+class Command(BaseCommand):
+    help = __doc__.strip()
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="*", help="URL patterns")
+        parser.add_argument(
+            "-f",
+            "--file",
+            dest="files",
+            action="append",
+            default=[],
+            help="File with URLs (one per line, like from fancy-urls "
+            "--export) or a sitemap XML file",
+        )
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of URLs to request at the same time",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Max number of URLs to start requesting per second",
+        )
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Use a pool of processes instead of threads",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=None,
+            help="Only request the N URLs with the most cache hits",
+        )
+        parser.add_argument(
+            "--host",
+            default=None,
+            help="Host to request the URLs as (default from ALLOWED_HOSTS)",
+        )
+
+    def handle(self, *urls, **options):
+        verbose = int(options["verbosity"]) > 1
+        hits = {}
+        if options["files"]:
+            all_urls = []
+            for path in options["files"]:
+                all_urls.extend(read_urls_file(path))
+                hits.update(read_hits_file(path))
+        else:
+            all_urls = remembered_urls(urls or options["urls"])
+        # Unique but in the original order
+        all_urls = list(dict.fromkeys(all_urls))
+        all_urls = sort_urls_by_hits(all_urls, hits)
+        if options["top"] is not None:
+            all_urls = all_urls[: options["top"]]
+
+        _count = 0
+        for url, status_code, seconds in warm_urls(
+            all_urls,
+            concurrency=options["concurrency"],
+            rate=options["rate"],
+            use_processes=options["processes"],
+            host=options["host"],
+        ):
+            _count += 1
+            if verbose:
+                self.stdout.write("%s %.3fs %s" % (status_code, seconds, url))
+
+        if verbose:
+            self.stdout.write("-- %s URLs warmed --" % _count)
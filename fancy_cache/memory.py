@@ -1,63 +1,68 @@
-import json
 import logging
-import re
 import typing
-import zlib
 
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.utils.connection import ConnectionProxy
 
+from fancy_cache import heavy_hitters, metrics
+from fancy_cache.adaptive import forget_timeouts
+from fancy_cache.dedupe import delete_pages
 from fancy_cache.constants import LONG_TIME, REMEMBERED_URLS_KEY
-from fancy_cache.middleware import USE_MEMCACHED_CAS
-from fancy_cache.utils import md5, filter_remembered_urls
+from fancy_cache.generations import get_generation, incr_generation
+from fancy_cache.middleware import INDEX_CACHE_ALIAS, USE_MEMCACHED_CAS
+from fancy_cache.storage import get_storage
+from fancy_cache.utils import (
+    ExpiryBuckets,
+    _match,
+    _urls_to_regexes,
+    decode_remembered_urls,
+    encode_remembered_urls,
+    filter_remembered_urls,
+    md5,
+)
 
-__all__ = ("find_urls",)
+__all__ = (
+    "find_urls",
+    "find_top_urls",
+    "get_remembered_urls",
+    "get_url_stats",
+    "purge_all",
+    "sweep_remembered_urls",
+)
 
 LOGGER = logging.getLogger(__name__)
 
 COMPRESS_REMEMBERED_URLS = getattr(
     settings, "FANCY_COMPRESS_REMEMBERED_URLS", False
 )
+COMPACT_REMEMBERED_URLS = getattr(
+    settings, "FANCY_COMPACT_REMEMBERED_URLS", False
+)
 
-
-def _match(url: str, regexes: typing.List[typing.Pattern[str]]):
-    if not regexes:
-        return url
-    for regex in regexes:
-        if regex.match(url):
-            return True
-    return False
-
-
-def _urls_to_regexes(
-    urls: typing.List[str],
-) -> typing.List[typing.Pattern[str]]:
-    regexes = []
-    for each in urls:
-        parts = each.split("*")
-        if len(parts) == 1:
-            regexes.append(re.compile("^%s$" % re.escape(parts[0])))
-        else:
-            _re = ".*".join(re.escape(x) for x in parts)
-            regexes.append(re.compile("^%s$" % _re))
-    return regexes
+# The cache the remembered URLs and the stats are in.
+cache = ConnectionProxy(caches, INDEX_CACHE_ALIAS or DEFAULT_CACHE_ALIAS)
 
 
-def find_urls(
-    urls: typing.List[str] = None, purge: bool = False
-) -> typing.Generator[
-    typing.Tuple[str, str, typing.Optional[typing.Dict[str, int]]], None, None
-]:
+def get_remembered_urls() -> typing.Dict[str, typing.Tuple[str, int]]:
+    """
+    Return the remembered URLs dict as it is stored in the cache,
+    regardless of whether the cached pages still exist.
+    """
+    storage = get_storage(cache)
+    if storage is not None:
+        return storage.get_all()
     if USE_MEMCACHED_CAS is True:
         remembered_urls = cache._cache.get(REMEMBERED_URLS_KEY, {})
     else:
         remembered_urls = cache.get(REMEMBERED_URLS_KEY, {})
-    if COMPRESS_REMEMBERED_URLS:
-        if not isinstance(remembered_urls, dict):
-            remembered_urls = json.loads(
-                zlib.decompress(remembered_urls).decode()
-            )
-    keys_to_delete = []
+    return decode_remembered_urls(remembered_urls)
+
+
+def _find_remembered_urls(
+    urls: typing.List[str] = None,
+) -> typing.Iterator[typing.Tuple[str, str, typing.Optional[str]]]:
+    remembered_urls = get_remembered_urls()
     if urls:
         regexes = _urls_to_regexes(urls)
     for url in remembered_urls:
@@ -73,56 +78,184 @@ def find_urls(
                     0,
                 )
 
-            cache_key = cache_key_tuple[0]
+            cache_alias = None
+            if len(cache_key_tuple) > 2:
+                cache_alias = cache_key_tuple[2]
+            yield url, cache_key_tuple[0], cache_alias
+
 
-            if not cache.get(cache_key):
-                if purge:
-                    keys_to_delete.append(url)
-                continue
+def get_url_stats(url: str) -> typing.Optional[typing.Dict[str, int]]:
+    """
+    Return the hits and misses recorded for `url` when
+    `remember_stats_all_urls` is enabled, or None if nothing is recorded.
+    """
+    misses_cache_key = "%s__misses" % url
+    misses_cache_key = md5(misses_cache_key)
+    hits_cache_key = "%s__hits" % url
+    hits_cache_key = md5(hits_cache_key)
+
+    misses = cache.get(misses_cache_key)
+    hits = cache.get(hits_cache_key)
+    if misses is None and hits is None:
+        return None
+    return {"hits": hits or 0, "misses": misses or 0}
+
+
+def find_urls(
+    urls: typing.List[str] = None, purge: bool = False
+) -> typing.Generator[
+    typing.Tuple[str, str, typing.Optional[typing.Dict[str, int]]], None, None
+]:
+    storage = get_storage(cache)
+    if storage is not None:
+        found = storage.find(urls)
+    else:
+        found = _find_remembered_urls(urls)
+    keys_to_delete = []
+    for url, cache_key, cache_alias in found:
+        # The page is in the same cache as the remembered URLs unless
+        # it says otherwise.
+        page_cache = caches[cache_alias] if cache_alias else cache
+        if not page_cache.get(cache_key):
             if purge:
-                cache.delete(cache_key)
                 keys_to_delete.append(url)
-            misses_cache_key = "%s__misses" % url
-            misses_cache_key = md5(misses_cache_key)
-            hits_cache_key = "%s__hits" % url
-            hits_cache_key = md5(hits_cache_key)
-
-            misses = cache.get(misses_cache_key)
-            hits = cache.get(hits_cache_key)
-            if misses is None and hits is None:
-                stats = None
-            else:
-                stats = {"hits": hits or 0, "misses": misses or 0}
-            yield (url, cache_key, stats)
+            continue
+        if purge:
+            delete_pages(page_cache, [cache_key])
+            keys_to_delete.append(url)
+        yield (url, cache_key, get_url_stats(url))
 
     if keys_to_delete:
         # means something was changed
+        _forget_urls(storage, keys_to_delete)
 
-        if USE_MEMCACHED_CAS is True:
-            deleted = delete_keys_cas(keys_to_delete)
-            if deleted is True:
-                return
-            # CAS uses `cache._cache.get/set` so we need to set the
-            # REMEMBERED_URLS dict at that location.
-            # This is because CAS cannot call `BaseCache.make_key` to generate
-            # the key when it tries to get a cache entry set by `cache.get/set`.
-            remembered_urls = cache._cache.get(REMEMBERED_URLS_KEY, {})
-            remembered_urls = delete_keys(keys_to_delete, remembered_urls)
-            cache._cache.set(REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME)
+
+def _forget_urls(storage, keys_to_delete: typing.List[str]) -> None:
+    """
+    Drop `keys_to_delete` from the remembered URLs, with their adaptive
+    timeouts and stats.
+    """
+    forget_timeouts(cache, keys_to_delete)
+    # Their stats start over too; `fancy-urls --export` first to
+    # keep the hits.
+    _delete_url_stats(keys_to_delete)
+
+    if storage is not None:
+        storage.forget(keys_to_delete)
+        return
+
+    if USE_MEMCACHED_CAS is True:
+        deleted = delete_keys_cas(keys_to_delete)
+        if deleted is True:
             return
+        # CAS uses `cache._cache.get/set` so we need to set the
+        # REMEMBERED_URLS dict at that location.
+        # This is because CAS cannot call `BaseCache.make_key` to generate
+        # the key when it tries to get a cache entry set by `cache.get/set`.
+        remembered_urls = cache._cache.get(REMEMBERED_URLS_KEY, {})
+        remembered_urls = _delete_remembered_urls(
+            keys_to_delete, remembered_urls
+        )
+        cache._cache.set(REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME)
+        return
 
-        remembered_urls = cache.get(REMEMBERED_URLS_KEY, {})
-        if COMPRESS_REMEMBERED_URLS:
-            if not isinstance(remembered_urls, dict):
-                remembered_urls = json.loads(
-                    zlib.decompress(remembered_urls).decode()
-                )
-        remembered_urls = delete_keys(keys_to_delete, remembered_urls)
-        if COMPRESS_REMEMBERED_URLS:
-            remembered_urls = zlib.compress(
-                json.dumps(remembered_urls).encode()
+    remembered_urls = cache.get(REMEMBERED_URLS_KEY, {})
+    remembered_urls = _delete_remembered_urls(keys_to_delete, remembered_urls)
+    cache.set(REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME)
+
+
+def find_top_urls(
+    n: int = 10, urls: typing.List[str] = None
+) -> typing.List[typing.Tuple[str, int, int]]:
+    """
+    Return the `n` most requested URLs as (url, requests, misses) tuples,
+    most requested first. Requires the `FANCY_TOP_URLS` setting.
+
+    The numbers are approximate but the memory used is fixed no matter
+    how many distinct URLs there are.
+    """
+    found = heavy_hitters.get_top_urls(cache)
+    if urls:
+        regexes = _urls_to_regexes(urls)
+        found = [x for x in found if _match(x[0], regexes)]
+    return found[:n]
+
+
+def purge_all(key_prefix: str = None) -> None:
+    """
+    Purge every cached page, or only those cached with `key_prefix`,
+    by incrementing the generation that's part of their cache keys.
+    Requires the `FANCY_USE_GENERATIONS` setting.
+
+    The pages are left for the cache to evict but the remembered URLs
+    of the pages purged are forgotten, like with `find_urls`.
+    """
+    storage = get_storage(cache)
+    found = storage.find() if storage is not None else _find_remembered_urls()
+    if key_prefix is None:
+        keys_to_delete = [url for url, _, _ in found]
+    else:
+        # The generations are part of the key prefix in the cache keys.
+        marker = ".%s.%s" % (key_prefix, get_generation(cache, key_prefix))
+        keys_to_delete = [
+            url for url, cache_key, _ in found if marker in cache_key
+        ]
+    incr_generation(cache, key_prefix)
+    if keys_to_delete:
+        _forget_urls(storage, keys_to_delete)
+
+
+def sweep_remembered_urls() -> int:
+    """
+    Drop the expired URLs from the remembered URLs and return how many
+    there were. Use this, from a cron job or similar, if you have set
+    `FANCY_DEFER_REMEMBERED_URLS_SWEEP` so it's not done on every miss.
+    """
+    storage = get_storage(cache)
+    if storage is not None:
+        return storage.sweep()
+    buckets = ExpiryBuckets(cache)
+    if USE_MEMCACHED_CAS is True:
+        tries = 0
+        while tries < 100:
+            remembered_urls, cas_token = cache._cache.gets(REMEMBERED_URLS_KEY)
+            if remembered_urls is None:
+                return 0
+            remembered_urls = decode_remembered_urls(remembered_urls)
+            swept = buckets.sweep(remembered_urls)
+            if not swept:
+                buckets.commit()
+                return 0
+            remembered_urls = encode_remembered_urls(
+                remembered_urls,
+                compress=COMPRESS_REMEMBERED_URLS,
+                compact=COMPACT_REMEMBERED_URLS,
             )
+            tries += 1
+            if cache._cache.cas(
+                REMEMBERED_URLS_KEY, remembered_urls, cas_token, LONG_TIME
+            ):
+                buckets.commit()
+                return swept
+        LOGGER.error(
+            "Fancy cache sweep_remembered_urls failed after %s tries", tries
+        )
+        return 0
+
+    remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+    if remembered_urls is None:
+        return 0
+    remembered_urls = decode_remembered_urls(remembered_urls)
+    swept = buckets.sweep(remembered_urls)
+    if swept:
+        remembered_urls = encode_remembered_urls(
+            remembered_urls,
+            compress=COMPRESS_REMEMBERED_URLS,
+            compact=COMPACT_REMEMBERED_URLS,
+        )
         cache.set(REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME)
+    buckets.commit()
+    return swept
 
 
 def delete_keys_cas(keys_to_delete: typing.List[str]) -> bool:
@@ -133,26 +266,34 @@ def delete_keys_cas(keys_to_delete: typing.List[str]) -> bool:
         if remembered_urls is None:
             return False
 
-        if COMPRESS_REMEMBERED_URLS:
-            if not isinstance(remembered_urls, dict):
-                remembered_urls = json.loads(
-                    zlib.decompress(remembered_urls).decode()
-                )
-
-        remembered_urls = delete_keys(keys_to_delete, remembered_urls)
-        if COMPRESS_REMEMBERED_URLS:
-            remembered_urls = zlib.compress(
-                json.dumps(remembered_urls).encode()
-            )
+        remembered_urls = _delete_remembered_urls(
+            keys_to_delete, remembered_urls
+        )
         result = cache._cache.cas(
             REMEMBERED_URLS_KEY, remembered_urls, cas_token, LONG_TIME
         )
         tries += 1
+    if tries > 1 and metrics.collectors:
+        metrics.incr("fancy_cache_cas_retries_total", tries - 1)
     if result is False:
         LOGGER.error("Fancy cache delete_keys_cas failed after %s tries", tries)
     return result
 
 
+def _delete_remembered_urls(keys_to_delete: typing.List[str], remembered_urls):
+    """
+    Return the remembered urls, as stored in the cache, without
+    `keys_to_delete` and ready to be stored again.
+    """
+    remembered_urls = decode_remembered_urls(remembered_urls)
+    remembered_urls = delete_keys(keys_to_delete, remembered_urls)
+    return encode_remembered_urls(
+        remembered_urls,
+        compress=COMPRESS_REMEMBERED_URLS,
+        compact=COMPACT_REMEMBERED_URLS,
+    )
+
+
 def delete_keys(
     keys_to_delete: typing.List[str],
     remembered_urls: typing.Dict[str, typing.Tuple[str, int]],
@@ -162,9 +303,11 @@ def delete_keys(
     """
     for url in keys_to_delete:
         remembered_urls.pop(url)
-        misses_cache_key = "%s__misses" % url
-        hits_cache_key = "%s__hits" % url
-        cache.delete(misses_cache_key)
-        cache.delete(hits_cache_key)
     remembered_urls = filter_remembered_urls(remembered_urls)
     return remembered_urls
+
+
+def _delete_url_stats(urls: typing.List[str]) -> None:
+    cache.delete_many(
+        [md5("%s__%s" % (url, x)) for url in urls for x in ("misses", "hits")]
+    )
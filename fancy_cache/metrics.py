@@ -0,0 +1,186 @@
+"""
+Instrumentation of the cache middleware.
+
+Collectors are configured with the `FANCY_METRICS_COLLECTORS` setting
+which is a list of dotted paths to classes that implement the same methods
+as `Collector`. For example::
+
+    FANCY_METRICS_COLLECTORS = ["fancy_cache.metrics.InMemoryCollector"]
+
+The metrics reported are:
+
+* `fancy_cache_requests_total` (counter) labelled with `view` and
+  `result` which is one of "hit", "miss" or "bypass".
+* `fancy_cache_lookup_seconds` (histogram) time to compute the cache key
+  and get the response from the cache.
+* `fancy_cache_store_seconds` (histogram) time to set the response in the
+  cache.
+* `fancy_cache_entry_bytes` (histogram) size of the body of the response
+  stored, or of the whole pickled response with `FANCY_CHUNK_SIZE`.
+* `fancy_cache_index_update_seconds` (histogram) time to remember the URL.
+* `fancy_cache_cas_retries_total` (counter) extra Memcached check-and-set
+  attempts.
+"""
+import abc
+import bisect
+import threading
+import typing
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+__all__ = ("Collector", "InMemoryCollector", "incr", "observe")
+
+SECONDS_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+BYTES_BUCKETS = (
+    1024,
+    4 * 1024,
+    16 * 1024,
+    64 * 1024,
+    256 * 1024,
+    1024 * 1024,
+    4 * 1024 * 1024,
+)
+
+
+class Collector(abc.ABC):
+    """
+    Base class for collectors. Override both methods.
+    """
+
+    @abc.abstractmethod
+    def incr(self, name: str, labels: typing.Dict[str, str], value=1):
+        """
+        Add `value` to the counter `name` with the `labels`.
+        """
+
+    @abc.abstractmethod
+    def observe(self, name: str, labels: typing.Dict[str, str], value):
+        """
+        Add `value` to the histogram `name` with the `labels`.
+        """
+
+
+class InMemoryCollector(Collector):
+    """
+    Keeps counters and histograms in memory, per process, and can render
+    them in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+
+    def _buckets(self, name: str) -> typing.Tuple:
+        if name.endswith("_bytes"):
+            return BYTES_BUCKETS
+        return SECONDS_BUCKETS
+
+    def incr(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets(name)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0, 0]
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self.histograms.items()
+            )
+        last_name = None
+        for (name, labels), value in counters:
+            if name != last_name:
+                lines.append("# TYPE %s counter" % name)
+                last_name = name
+            lines.append("%s%s %s" % (name, _format_labels(labels), value))
+        for (name, labels), (counts, total, count) in histograms:
+            if name != last_name:
+                lines.append("# TYPE %s histogram" % name)
+                last_name = name
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets(name), counts):
+                cumulative += bucket_count
+                lines.append(
+                    "%s_bucket%s %s"
+                    % (
+                        name,
+                        _format_labels(labels + (("le", repr(bound)),)),
+                        cumulative,
+                    )
+                )
+            lines.append(
+                "%s_bucket%s %s"
+                % (name, _format_labels(labels + (("le", "+Inf"),)), count)
+            )
+            lines.append("%s_sum%s %r" % (name, _format_labels(labels), total))
+            lines.append(
+                "%s_count%s %s" % (name, _format_labels(labels), count)
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: typing.Tuple[typing.Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"'
+        % (
+            key,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for key, value in labels
+    )
+
+
+collectors = [
+    import_string(path)()
+    for path in getattr(settings, "FANCY_METRICS_COLLECTORS", [])
+]
+
+
+def incr(name: str, value=1, **labels) -> None:
+    for collector in collectors:
+        collector.incr(name, labels, value)
+
+
+def observe(name: str, value, **labels) -> None:
+    for collector in collectors:
+        collector.observe(name, labels, value)
@@ -3,14 +3,13 @@ Middleware based on Django's cache middleware.
 See https://github.com/django/django/blob/main/django/middleware/cache.py
 """
 import functools
-import json
 import logging
 import time
 import typing
-import zlib
 
 from django.conf import settings
 from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.http import StreamingHttpResponse
 from django.middleware.cache import (
     FetchFromCacheMiddleware,
     UpdateCacheMiddleware,
@@ -25,8 +24,31 @@ from django.utils.cache import (
 )
 from urllib.parse import parse_qs, urlencode
 
-from fancy_cache.constants import REMEMBERED_URLS_KEY, LONG_TIME
-from fancy_cache.utils import md5, filter_remembered_urls
+from fancy_cache.constants import (
+    REMEMBERED_URLS_KEY,
+    LONG_TIME,
+    PATH_KEY_DELIMITER,
+    REFRESH_ENVIRON_KEY,
+    WARM_ENVIRON_KEY,
+)
+from fancy_cache import (
+    admission,
+    dedupe,
+    encoding,
+    heavy_hitters,
+    metrics,
+    placeholders,
+)
+from fancy_cache.adaptive import adapt_timeout
+from fancy_cache.chunking import get_chunked, set_chunked
+from fancy_cache.generations import get_generation
+from fancy_cache.storage import get_storage
+from fancy_cache.utils import (
+    ExpiryBuckets,
+    decode_remembered_urls,
+    encode_remembered_urls,
+    md5,
+)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -36,6 +58,28 @@ USE_MEMCACHED_CAS = getattr(
 COMPRESS_REMEMBERED_URLS = getattr(
     settings, "FANCY_COMPRESS_REMEMBERED_URLS", False
 )
+COMPACT_REMEMBERED_URLS = getattr(
+    settings, "FANCY_COMPACT_REMEMBERED_URLS", False
+)
+DEFER_REMEMBERED_URLS_SWEEP = getattr(
+    settings, "FANCY_DEFER_REMEMBERED_URLS_SWEEP", False
+)
+TOP_URLS = getattr(settings, "FANCY_TOP_URLS", 0)
+INDEX_CACHE_ALIAS = getattr(settings, "FANCY_INDEX_CACHE_ALIAS", None)
+USE_GENERATIONS = getattr(settings, "FANCY_USE_GENERATIONS", False)
+CHUNK_SIZE = getattr(settings, "FANCY_CHUNK_SIZE", None)
+
+
+def _get_view_name(view_func) -> typing.Optional[str]:
+    # Unwrap functools.partial (as used by method_decorator) and
+    # bound methods.
+    func = getattr(view_func, "func", view_func)
+    func = getattr(func, "__func__", func)
+    module = getattr(func, "__module__", None)
+    qualname = getattr(func, "__qualname__", None)
+    if module and qualname:
+        return "%s.%s" % (module, qualname)
+    return None
 
 
 class RequestPath(object):
@@ -78,6 +122,36 @@ class RequestPath(object):
         return "%s%s" % (this.path, ("?" + iri_to_uri(qs)) if qs else "")
 
 
+class RequestHeaders(object):
+    """
+    Normalize the request headers, like the ones the response varies
+    on, while the cache key is made and put them back afterwards.
+    `normalizers` is a dict of header names to callables that get the
+    value, or "" if it's not there, and return the normalized value.
+    """
+
+    def __init__(self, request, normalizers):
+        self.request = request
+        self.normalizers = normalizers
+        self._prev_headers = {}
+
+    def __enter__(self):
+        meta = self.request.META
+        for header, normalizer in (self.normalizers or {}).items():
+            key = "HTTP_" + header.upper().replace("-", "_")
+            self._prev_headers[key] = meta.get(key)
+            meta[key] = normalizer(meta.get(key, ""))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        meta = self.request.META
+        for key, value in self._prev_headers.items():
+            if value is None:
+                meta.pop(key, None)
+            else:
+                meta[key] = value
+        self._prev_headers = {}
+
+
 class FancyUpdateCacheMiddleware(UpdateCacheMiddleware):
     """
     Response-phase cache middleware that updates the cache if the response is
@@ -102,12 +176,54 @@ class FancyUpdateCacheMiddleware(UpdateCacheMiddleware):
 
     def process_response(self, request, response):
         """Set the cache, if needed."""
+        response = self._process_response(request, response)
+        # Also when it's not cached.
+        self._fill_placeholders(request, response)
+        if self.timing_headers and hasattr(request, "_fancy_cache_timings"):
+            if request._cache_update_cache:
+                status = "MISS"
+            else:
+                status = "BYPASS"
+            if hasattr(response, "render") and callable(response.render):
+                # Wait until after it has been rendered and stored.
+                response.add_post_render_callback(
+                    lambda r: self._add_timing_headers(request, r, status)
+                )
+            else:
+                self._add_timing_headers(request, response, status)
+        return response
+
+    def _process_response(self, request, response):
         if not self._should_update_cache(request, response):
             # We don't need to update the cache, just return.
             return response
 
-        if response.streaming or response.status_code not in (200, 304):
+        if response.streaming and (
+            not self.cache_streaming or getattr(response, "is_async", False)
+        ):
+            return response
+
+        status_timeout = None
+        if response.status_code != 200:
+            status_timeout = self.status_timeouts.get(response.status_code)
+        if response.status_code not in (200, 304) and status_timeout is None:
             return response
+        if status_timeout is not None and (
+            response.streaming
+            or (
+                getattr(response, "is_rendered", True)
+                and len(response.content) > self.status_max_size
+            )
+        ):
+            return response
+
+        generation_time = self._get_generation_time(request)
+        # Cheap enough to make again, so not stored, but otherwise
+        # treated like any other response.
+        cheap = (
+            generation_time is not None
+            and generation_time < self.min_generation_time
+        )
 
         # Don't cache responses that set a user-specific (and maybe security
         # sensitive) cookie in response to a cookie-less request.
@@ -134,36 +250,221 @@ class FancyUpdateCacheMiddleware(UpdateCacheMiddleware):
             elif timeout == 0:
                 # max-age was set to 0, don't cache.
                 return response
+        if status_timeout is not None:
+            timeout = status_timeout
+        elif self.cost_timeouts and generation_time is not None:
+            for min_time, cost_timeout in sorted(self.cost_timeouts):
+                if generation_time >= min_time:
+                    timeout = cost_timeout
+        if (
+            self.adaptive_timeout
+            and timeout
+            and not cheap
+            and response.status_code == 200
+            and not response.streaming
+            and getattr(response, "is_rendered", True)
+        ):
+            timeout = self._adapt_timeout(request, response, timeout)
         patch_response_headers(response, timeout)
-        if timeout and response.status_code == 200:
-            if callable(self.key_prefix):
-                key_prefix = self.key_prefix(request)
-            else:
-                key_prefix = self.key_prefix
+        if (
+            timeout
+            and (response.status_code == 200 or status_timeout is not None)
+            and not cheap
+            and self._admit(request)
+        ):
+            key_prefix = self._get_key_prefix(request)
             if self.post_process_response:
+                t0 = time.perf_counter()
                 response = self.post_process_response(response, request)
+                self._add_timing(request, "postprocess", t0)
 
-            with RequestPath(request, self.only_get_keys, self.forget_get_keys):
+            with RequestPath(
+                request, self.only_get_keys, self.forget_get_keys
+            ), RequestHeaders(request, self.vary_normalizers):
                 cache_key = learn_cache_key(
                     request, response, timeout, key_prefix, cache=self.cache
                 )
 
                 if self.remember_all_urls:
+                    t0 = time.perf_counter()
                     self.remember_url(request, cache_key, timeout)
-
-            if hasattr(response, "render") and callable(response.render):
+                    seconds = self._add_timing(request, "index", t0)
+                    if metrics.collectors:
+                        metrics.observe(
+                            "fancy_cache_index_update_seconds",
+                            seconds,
+                            view=self._get_view_label(request),
+                        )
+
+            if response.streaming:
+                response.streaming_content = self._tee_streaming_content(
+                    request,
+                    cache_key,
+                    response,
+                    response.streaming_content,
+                    timeout,
+                )
+            elif hasattr(response, "render") and callable(response.render):
                 response.add_post_render_callback(
-                    lambda r: self.cache.set(cache_key, r, timeout)
+                    lambda r: self._store(request, cache_key, r, timeout)
                 )
             else:
-                self.cache.set(cache_key, response, timeout)
+                self._store(request, cache_key, response, timeout)
 
+        self._fill_placeholders(request, response)
         if self.post_process_response_always:
+            t0 = time.perf_counter()
             response = self.post_process_response_always(response, request)
+            self._add_timing(request, "postprocess", t0)
 
         return response
 
-    def remember_url(self, request, cache_key: str, timeout: int) -> None:
+    def _store(self, request, cache_key: str, response, timeout) -> None:
+        t0 = time.perf_counter()
+        value = response
+        if self.placeholders and not response.streaming:
+            value = placeholders.punch(response, self.placeholders)
+        elif self.dedupe_content and not response.streaming:
+            value = dedupe.dedupe(
+                self.cache, cache_key, response, timeout, CHUNK_SIZE
+            )
+        size = None
+        if CHUNK_SIZE:
+            size = set_chunked(
+                self.cache, cache_key, value, timeout, CHUNK_SIZE
+            )
+            if size is None:
+                LOGGER.warning("Fancy cache failed to store %s", cache_key)
+        else:
+            self.cache.set(cache_key, value, timeout)
+            if not response.streaming:
+                # Not pickled here, so the body is what's measured.
+                size = len(response.content)
+        seconds = self._add_timing(request, "store", t0)
+        if metrics.collectors:
+            view = self._get_view_label(request)
+            metrics.observe("fancy_cache_store_seconds", seconds, view=view)
+            if size is not None:
+                metrics.observe("fancy_cache_entry_bytes", size, view=view)
+        if isinstance(value, placeholders.PunchedResponse):
+            # Fill in the response being sent without splitting it again.
+            placeholders.splice(
+                response, value.parts, value.markers, request, self.placeholders
+            )
+
+    def _fill_placeholders(self, request, response) -> None:
+        if (
+            not self.placeholders
+            or response.streaming
+            or getattr(response, "_fancy_cache_spliced", False)
+        ):
+            return
+        if not getattr(response, "is_rendered", True):
+            # After it's been rendered and stored.
+            response.add_post_render_callback(
+                lambda r: self._fill_placeholders(request, r)
+            )
+            return
+        punched = placeholders.punch(response, self.placeholders)
+        placeholders.splice(
+            response, punched.parts, punched.markers, request, self.placeholders
+        )
+
+    def _get_generation_time(self, request) -> typing.Optional[float]:
+        """
+        Return the seconds it took to make the response, from after the
+        cache lookup until now, or None if it's not known.
+        """
+        started = getattr(request, "_fancy_cache_view_started", None)
+        if started is None:
+            return None
+        seconds = self._add_timing(request, "view", started)
+        del request._fancy_cache_view_started
+        if metrics.collectors:
+            metrics.observe(
+                "fancy_cache_generation_seconds",
+                seconds,
+                view=self._get_view_label(request),
+            )
+        return seconds
+
+    def _adapt_timeout(self, request, response, timeout) -> int:
+        hits = None
+        if self.remember_stats_all_urls:
+            hits = self.index_cache.get(
+                md5("%s__hits" % request.get_full_path()), 0
+            )
+        with RequestPath(request, self.only_get_keys, self.forget_get_keys):
+            url = request.get_full_path()
+        min_timeout, max_timeout = self.adaptive_timeout
+        return adapt_timeout(
+            self.index_cache,
+            url,
+            response.content,
+            timeout,
+            min_timeout,
+            max_timeout,
+            hits=hits,
+        )
+
+    def _admit(self, request) -> bool:
+        """
+        Return true if the response should be stored, which is once its
+        URL has missed `admit_after` times in `admission_window` seconds.
+        """
+        if self.admit_after <= 1:
+            return True
+        with RequestPath(request, self.only_get_keys, self.forget_get_keys):
+            url = request.get_full_path()
+        misses = admission.count_miss(
+            url, self.admission_window, self.index_cache
+        )
+        return misses >= self.admit_after
+
+    def _tee_streaming_content(
+        self,
+        request,
+        cache_key: str,
+        response,
+        streaming_content: typing.Iterator[bytes],
+        timeout,
+    ) -> typing.Iterator[bytes]:
+        """
+        Yield the chunks of the streaming response, as they are sent,
+        and store them once they all have been. Streams bigger than
+        `streaming_max_size`, or that aren't sent to the end, are not
+        stored.
+        """
+        chunks = []
+        size = 0
+        for chunk in streaming_content:
+            if chunks is not None:
+                size += len(chunk)
+                if size > self.streaming_max_size:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if chunks is None:
+            return
+        cached = StreamingHttpResponse(
+            chunks,
+            status=response.status_code,
+            reason=response.reason_phrase,
+        )
+        for header, value in response.items():
+            cached[header] = value
+        cached.cookies = response.cookies
+        self._store(request, cache_key, cached, timeout)
+
+    def remember_url(
+        self,
+        request,
+        cache_key: str,
+        timeout: int,
+        url: str = None,
+        view: str = None,
+    ) -> None:
         """
         Function to remember a newly cached URL.
 
@@ -174,53 +475,127 @@ class FancyUpdateCacheMiddleware(UpdateCacheMiddleware):
         - The key is the URL
         - The value is a tuple (cache key string, expiration time in seconds integer)
 
+        With FANCY_REMEMBERED_URLS_STORAGE they are stored there instead,
+        with `view`, or the view of the request, as the label.
+
+        The dictionary is in the FANCY_INDEX_CACHE_ALIAS cache, or the
+        default one, whatever cache the page is in. If it's another one,
+        the value gets the page's cache alias as a third item.
+
         If USE_MEMCACHED_CAS is True, we try to use CAS (check and set)
         to set the dictionary via self.cache._cache.cas to avoid missing
         cached URLs in high traffic environments.cache._cache.cas.
 
+        Expired URLs are dropped at the same time, by the minute they
+        expire in with `ExpiryBuckets`, unless
+        FANCY_DEFER_REMEMBERED_URLS_SWEEP is set, in which case
+        `fancy_cache.memory.sweep_remembered_urls` has to be called
+        every now and then instead.
+
         See Issue #7 for more information:
         https://github.com/peterbe/django-fancy-cache/issues/7
         """
-        url = request.get_full_path()
+        if url is None:
+            url = request.get_full_path()
+        if view is None:
+            view = self._get_view_label(request)
         expiration_time = int(time.time()) + timeout
+        cache_alias = self._get_page_cache_alias()
+
+        storage = get_storage(self.index_cache)
+        if storage is not None:
+            storage.remember(
+                url,
+                cache_key,
+                expiration_time,
+                view=view,
+                cache_alias=cache_alias,
+            )
+            return
 
+        index_cache = self.index_cache
+        buckets = ExpiryBuckets(index_cache)
         if USE_MEMCACHED_CAS is True:
             # Memcached check-and-set is available.
             # Try using check-and-set to avoid a race condition
             # in remembering urls; if this fails, fallback to cache.set.
-            result = self._remember_url_cas(url, cache_key, expiration_time)
-            if result:
-                # Remembered URLs have been successfully saved
-                # via Memcached CAS.
-                return
-            # CAS uses `cache._cache.get/set` so we need to set the
-            # REMEMBERED_URLS dict at that location.
-            # This is because CAS cannot call `BaseCache.make_key` to generate
-            # the key when it tries to get a cache entry set by `cache.get/set`.
-            remembered_urls = self.cache._cache.get(REMEMBERED_URLS_KEY, {})
-            remembered_urls = filter_remembered_urls(remembered_urls)
-            remembered_urls[url] = (cache_key, expiration_time)
-            self.cache._cache.set(
-                REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME
+            result = self._remember_url_cas(
+                url, cache_key, expiration_time, cache_alias, buckets
             )
-            return
-
-        remembered_urls = self.cache.get(REMEMBERED_URLS_KEY, {})
-        if COMPRESS_REMEMBERED_URLS:
-            if not isinstance(remembered_urls, dict):
-                remembered_urls = json.loads(
-                    zlib.decompress(remembered_urls).decode()
+            if not result:
+                # CAS uses `cache._cache.get/set` so we need to set the
+                # REMEMBERED_URLS dict at that location.
+                # This is because CAS cannot call `BaseCache.make_key` to
+                # generate the key when it tries to get a cache entry set
+                # by `cache.get/set`.
+                remembered_urls = index_cache._cache.get(
+                    REMEMBERED_URLS_KEY, {}
+                )
+                remembered_urls = self._add_remembered_url(
+                    remembered_urls,
+                    url,
+                    cache_key,
+                    expiration_time,
+                    cache_alias,
+                    buckets,
                 )
-        remembered_urls = filter_remembered_urls(remembered_urls)
-        remembered_urls[url] = (cache_key, expiration_time)
-        if COMPRESS_REMEMBERED_URLS:
-            remembered_urls = zlib.compress(
-                json.dumps(remembered_urls).encode()
+                index_cache._cache.set(
+                    REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME
+                )
+        else:
+            remembered_urls = index_cache.get(REMEMBERED_URLS_KEY, {})
+            remembered_urls = self._add_remembered_url(
+                remembered_urls,
+                url,
+                cache_key,
+                expiration_time,
+                cache_alias,
+                buckets,
+            )
+            index_cache.set(REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME)
+        # Only once what was swept is stored.
+        buckets.commit()
+        buckets.track(url, expiration_time)
+
+    def _add_remembered_url(
+        self,
+        remembered_urls,
+        url: str,
+        cache_key: str,
+        expiration_time: int,
+        cache_alias: str = None,
+        buckets: ExpiryBuckets = None,
+    ):
+        """
+        Return the remembered urls, as stored in the cache, with `url`
+        added and ready to be stored again. The expired URLs are swept
+        with `buckets`.
+        """
+        if COMPACT_REMEMBERED_URLS and encoding.can_append(remembered_urls):
+            # No need to decode (and filter) what's already there.
+            return encoding.append(
+                remembered_urls, url, cache_key, expiration_time, cache_alias
             )
-        self.cache.set(REMEMBERED_URLS_KEY, remembered_urls, LONG_TIME)
+        remembered_urls = decode_remembered_urls(remembered_urls)
+        if buckets is not None and not DEFER_REMEMBERED_URLS_SWEEP:
+            buckets.sweep(remembered_urls)
+        if cache_alias:
+            remembered_urls[url] = (cache_key, expiration_time, cache_alias)
+        else:
+            remembered_urls[url] = (cache_key, expiration_time)
+        return encode_remembered_urls(
+            remembered_urls,
+            compress=COMPRESS_REMEMBERED_URLS,
+            compact=COMPACT_REMEMBERED_URLS,
+        )
 
     def _remember_url_cas(
-        self, url: str, cache_key: str, expiration_time: int
+        self,
+        url: str,
+        cache_key: str,
+        expiration_time: int,
+        cache_alias: str = None,
+        buckets: ExpiryBuckets = None,
     ) -> bool:
         """
         Helper function to use Memcached CAS to store remembered URLs.
@@ -229,8 +604,9 @@ class FancyUpdateCacheMiddleware(UpdateCacheMiddleware):
         """
         result = False
         tries = 0  # Make sure an unexpected error doesn't cause a loop
+        index_cache = self.index_cache
         while result is False and tries <= 100:
-            remembered_urls, cas_token = self.cache._cache.gets(
+            remembered_urls, cas_token = index_cache._cache.gets(
                 REMEMBERED_URLS_KEY
             )
 
@@ -238,27 +614,23 @@ class FancyUpdateCacheMiddleware(UpdateCacheMiddleware):
                 # No cache entry; set the cache using `cache.set`.
                 return False
 
-            if COMPRESS_REMEMBERED_URLS:
-                if not isinstance(remembered_urls, dict):
-                    remembered_urls = json.loads(
-                        zlib.decompress(remembered_urls).decode()
-                    )
-
-            remembered_urls = filter_remembered_urls(remembered_urls)
-
-            remembered_urls[url] = (cache_key, expiration_time)
-
-            if COMPRESS_REMEMBERED_URLS:
-                remembered_urls = zlib.compress(
-                    json.dumps(remembered_urls).encode()
-                )
+            remembered_urls = self._add_remembered_url(
+                remembered_urls,
+                url,
+                cache_key,
+                expiration_time,
+                cache_alias,
+                buckets,
+            )
 
-            result = self.cache._cache.cas(
+            result = index_cache._cache.cas(
                 REMEMBERED_URLS_KEY, remembered_urls, cas_token, LONG_TIME
             )
 
             tries += 1
 
+        if tries > 1 and metrics.collectors:
+            metrics.incr("fancy_cache_cas_retries_total", tries - 1)
         if result is False:
             LOGGER.error(
                 "Django-fancy-cache failed to save using CAS after %s tries.",
@@ -293,51 +665,102 @@ class FancyFetchFromCacheMiddleware(FetchFromCacheMiddleware):
         Check whether the page is already cached and return the cached
         version if available.
         """
+        request._fancy_cache_timings = {}
         response = self._process_request(request)
-        if self.remember_stats_all_urls:
-            # then we're nosy
-            cache_key = request.get_full_path()
-            if response is None:
-                cache_key += "__misses"
+        if response is not None and self.timing_headers:
+            self._add_timing_headers(request, response, "HIT")
+        # Warm-ups and refreshes aren't traffic.
+        counted = not (
+            request.META.get(WARM_ENVIRON_KEY)
+            or request.META.get(REFRESH_ENVIRON_KEY)
+        )
+        if metrics.collectors and counted:
+            if response is not None:
+                result = "hit"
+            elif request._cache_update_cache:
+                result = "miss"
             else:
-                cache_key += "__hits"
-            cache_key = md5(cache_key)
-            if self.cache.get(cache_key) is None:
-                self.cache.set(cache_key, 0, LONG_TIME)
-            self.cache.incr(cache_key)
+                result = "bypass"
+            metrics.incr(
+                "fancy_cache_requests_total",
+                view=self._get_view_label(request),
+                result=result,
+            )
+        if self.remember_stats_all_urls and counted:
+            # then we're nosy
+            self._incr_stats(request.get_full_path(), response is not None)
+        if TOP_URLS and counted:
+            heavy_hitters.record(
+                request.get_full_path(), response is not None, self.index_cache
+            )
+        if response is None:
+            # How long it takes to make the response; see
+            # `_get_generation_time`.
+            request._fancy_cache_view_started = time.perf_counter()
         return response
 
+    def _incr_stats(self, url: str, hit: bool) -> None:
+        cache_key = url
+        if hit:
+            cache_key += "__hits"
+        else:
+            cache_key += "__misses"
+        cache_key = md5(cache_key)
+        index_cache = self.index_cache
+        if index_cache.get(cache_key) is None:
+            index_cache.set(cache_key, 0, LONG_TIME)
+        index_cache.incr(cache_key)
+
     def _process_request(self, request):
         if request.method not in ("GET", "HEAD"):
             request._cache_update_cache = False
             return None  # Don't bother checking the cache.
 
-        if callable(self.key_prefix):
-            key_prefix = self.key_prefix(request)
-            if key_prefix is None:
-                request._cache_update_cache = False
-                # Don't bother checking the cache if key_prefix function
-                # returns magic "None" value.
-                return None
-        else:
-            key_prefix = self.key_prefix
+        key_prefix = self._get_key_prefix(request)
+        if key_prefix is None:
+            request._cache_update_cache = False
+            # Don't bother checking the cache if key_prefix function
+            # returns magic "None" value.
+            return None
 
-        with RequestPath(request, self.only_get_keys, self.forget_get_keys):
+        if request.META.get(REFRESH_ENVIRON_KEY):
+            # Refresh-ahead; render the view again and update the cache.
+            request._cache_update_cache = True
+            return None
+
+        t0 = time.perf_counter()
+        with RequestPath(
+            request, self.only_get_keys, self.forget_get_keys
+        ), RequestHeaders(request, self.vary_normalizers):
             # try and get the cached GET response
             cache_key = get_cache_key(
                 request, key_prefix, "GET", cache=self.cache
             )
+        t1 = time.perf_counter()
+        self._add_timing(request, "key", t0)
 
         if cache_key is None:
-            request._cache_update_cache = True
-            return None  # No cache information available, need to rebuild.
-        response = self.cache.get(cache_key)
-        # if it wasn't found and we are looking for a HEAD, try looking just for that
-        if response is None and request.method == "HEAD":
-            cache_key = get_cache_key(
-                request, key_prefix, "HEAD", cache=self.cache
+            # No cache information available, need to rebuild.
+            response = None
+        else:
+            response = self._get_response(cache_key)
+            # if it wasn't found and we are looking for a HEAD, try looking
+            # just for that
+            if response is None and request.method == "HEAD":
+                with RequestPath(
+                    request, self.only_get_keys, self.forget_get_keys
+                ), RequestHeaders(request, self.vary_normalizers):
+                    cache_key = get_cache_key(
+                        request, key_prefix, "HEAD", cache=self.cache
+                    )
+                response = self._get_response(cache_key)
+        self._add_timing(request, "lookup", t1)
+        if metrics.collectors:
+            metrics.observe(
+                "fancy_cache_lookup_seconds",
+                time.perf_counter() - t0,
+                view=self._get_view_label(request),
             )
-            response = self.cache.get(cache_key)
 
         if response is None:
             request._cache_update_cache = True
@@ -345,13 +768,68 @@ class FancyFetchFromCacheMiddleware(FetchFromCacheMiddleware):
 
         # hit, return cached response
         request._cache_update_cache = False
+        response = placeholders.resolve(response, request, self.placeholders)
         if self.post_process_response_always:
+            t0 = time.perf_counter()
             response = self.post_process_response_always(
                 response, request=request
             )
+            self._add_timing(request, "postprocess", t0)
 
         return response
 
+    def _get_response(self, cache_key: str):
+        # Even without FANCY_CHUNK_SIZE or `dedupe_content`, in case
+        # they've just been unset.
+        value = get_chunked(self.cache, cache_key, self.cache.get(cache_key))
+        return dedupe.resolve(self.cache, value)
+
+    def _get_key_prefix(self, request) -> typing.Optional[str]:
+        if callable(self.key_prefix):
+            key_prefix = self.key_prefix(request)
+        else:
+            key_prefix = self.key_prefix
+        if key_prefix is not None and USE_GENERATIONS:
+            # Looked up once per request, not again for the response.
+            generations = request.__dict__.setdefault(
+                "_fancy_cache_generations", {}
+            )
+            if key_prefix not in generations:
+                generations[key_prefix] = get_generation(
+                    self.index_cache, key_prefix
+                )
+            key_prefix = "%s.%s" % (key_prefix, generations[key_prefix])
+        if key_prefix is not None and self.path_in_cache_key:
+            with RequestPath(request, self.only_get_keys, self.forget_get_keys):
+                key_prefix = "%s%s%s%s" % (
+                    key_prefix,
+                    PATH_KEY_DELIMITER,
+                    request.get_full_path(),
+                    PATH_KEY_DELIMITER,
+                )
+        return key_prefix
+
+    def get_cache_keys(self, request) -> typing.List[str]:
+        """
+        Return the keys that the GET and HEAD responses for `request`
+        are cached under, as far as they can be made from the headers
+        learned from earlier responses.
+        """
+        key_prefix = self._get_key_prefix(request)
+        if key_prefix is None:
+            return []
+        cache_keys = []
+        with RequestPath(
+            request, self.only_get_keys, self.forget_get_keys
+        ), RequestHeaders(request, self.vary_normalizers):
+            for method in ("GET", "HEAD"):
+                cache_key = get_cache_key(
+                    request, key_prefix, method, cache=self.cache
+                )
+                if cache_key is not None:
+                    cache_keys.append(cache_key)
+        return cache_keys
+
 
 class FancyCacheMiddleware(
     FancyUpdateCacheMiddleware, FancyFetchFromCacheMiddleware
@@ -395,6 +873,69 @@ class FancyCacheMiddleware(
         Only applicable if `remember_all_urls` is set. This stores a count
         of the number of times a `cache_page` hits and misses.
 
+    :param timing_headers:
+        Add an `X-Cache` header (HIT, MISS or BYPASS) and a `Server-Timing`
+        header with how long the cache key computation, the cache lookup,
+        post processing, remembering the URL and storing took.
+
+    :param path_in_cache_key:
+        Put the URL in the cache keys, instead of only a hash of it, so
+        that `fancy_cache.scanning.scan_urls` can find the cached pages
+        in the cache itself. Only for the local memory and Redis caches.
+
+    :param cache_streaming:
+        Cache streaming responses too. The chunks are kept as they are
+        sent and stored once the whole response has been sent, unless
+        it's bigger than `streaming_max_size` bytes. Hits are streamed
+        from the stored chunks.
+
+    :param admit_after:
+        Only store the response once its URL (after `only_get_keys` or
+        `forget_get_keys`) has missed this many times within
+        `admission_window` seconds.
+
+    :param min_generation_time:
+        Only store responses that took at least this many seconds to
+        make. Cheaper ones are made again every time.
+
+    :param cost_timeouts:
+        List of (seconds, timeout) to cache responses that took at least
+        that many seconds to make for that timeout instead, like
+        ``[(0.5, 600), (2, 3600)]``.
+
+    :param adaptive_timeout:
+        A (min, max) tuple of timeouts. Every time the response is made
+        again the timeout is doubled if its content is the same as the
+        last time and halved if not, within those bounds. With
+        `remember_stats_all_urls` it's only doubled if the URL has had
+        hits since.
+
+    :param dedupe_content:
+        Store the body of the response once for all URLs with the same
+        content, under its hash, and only the rest of the response per
+        URL.
+
+    :param placeholders:
+        Dict of markers in the content to callables that are called with
+        the request and return what to put in their place. The body is
+        split at the markers when it's stored so that they're filled in
+        on every hit without searching it. Not combined with
+        `dedupe_content`.
+
+    :param status_timeouts:
+        Dict of other status codes than 200 to cache responses with and
+        for how many seconds, like ``{404: 60, 301: 3600}``. They're
+        remembered like any other page.
+
+    :param status_max_size:
+        Responses with a status in `status_timeouts` that are bigger
+        than this many bytes aren't cached.
+
+    :param vary_normalizers:
+        Dict of request header names to callables that normalize their
+        value before the cache key is made, so that fewer variants of
+        pages that vary on them are cached. See `fancy_cache.vary`.
+
     """
 
     def __init__(
@@ -410,6 +951,22 @@ class FancyCacheMiddleware(
         remember_stats_all_urls=getattr(
             settings, "FANCY_REMEMBER_STATS_ALL_URLS", False
         ),
+        timing_headers=getattr(settings, "FANCY_TIMING_HEADERS", False),
+        path_in_cache_key=getattr(settings, "FANCY_PATH_IN_CACHE_KEY", False),
+        cache_streaming=getattr(settings, "FANCY_CACHE_STREAMING", False),
+        streaming_max_size=getattr(
+            settings, "FANCY_STREAMING_MAX_SIZE", 10 * 1024 * 1024
+        ),
+        admit_after=getattr(settings, "FANCY_ADMIT_AFTER", 1),
+        admission_window=getattr(settings, "FANCY_ADMISSION_WINDOW", 3600),
+        min_generation_time=getattr(settings, "FANCY_MIN_GENERATION_TIME", 0),
+        cost_timeouts=getattr(settings, "FANCY_COST_TIMEOUTS", None),
+        adaptive_timeout=getattr(settings, "FANCY_ADAPTIVE_TIMEOUT", None),
+        dedupe_content=getattr(settings, "FANCY_DEDUPE_CONTENT", False),
+        placeholders=None,
+        status_timeouts=getattr(settings, "FANCY_STATUS_TIMEOUTS", None),
+        status_max_size=getattr(settings, "FANCY_STATUS_MAX_SIZE", 64 * 1024),
+        vary_normalizers=getattr(settings, "FANCY_VARY_NORMALIZERS", None),
         **kwargs
     ):
         super().__init__(get_response)
@@ -450,3 +1007,73 @@ class FancyCacheMiddleware(
         self.forget_get_keys = forget_get_keys
         self.remember_all_urls = remember_all_urls
         self.remember_stats_all_urls = remember_stats_all_urls
+        self.timing_headers = timing_headers
+        self.path_in_cache_key = path_in_cache_key
+        self.cache_streaming = cache_streaming
+        self.streaming_max_size = streaming_max_size
+        self.admit_after = admit_after
+        self.admission_window = admission_window
+        self.min_generation_time = min_generation_time
+        self.cost_timeouts = cost_timeouts
+        self.adaptive_timeout = adaptive_timeout
+        self.dedupe_content = dedupe_content
+        self.placeholders = placeholders or {}
+        self.status_timeouts = status_timeouts or {}
+        self.status_max_size = status_max_size
+        self.vary_normalizers = vary_normalizers
+        # When used as a decorator, `get_response` is the view function.
+        # That's always called with `cache_alias` from `cache_page`.
+        if "cache_alias" in kwargs:
+            self.view_name = _get_view_name(get_response)
+        else:
+            self.view_name = None
+
+    @property
+    def index_cache(self):
+        """
+        The cache the remembered URLs and the stats are kept in, the
+        same one whatever cache the pages are in.
+        """
+        return caches[INDEX_CACHE_ALIAS or DEFAULT_CACHE_ALIAS]
+
+    def _get_page_cache_alias(self) -> typing.Optional[str]:
+        """
+        Return the alias of the cache the pages are in if it's not the
+        one the remembered URLs are in.
+        """
+        cache_alias = getattr(self, "cache_alias", DEFAULT_CACHE_ALIAS)
+        if cache_alias != (INDEX_CACHE_ALIAS or DEFAULT_CACHE_ALIAS):
+            return cache_alias
+        return None
+
+    def _get_view_label(self, request) -> str:
+        if self.view_name:
+            return self.view_name
+        resolver_match = getattr(request, "resolver_match", None)
+        return getattr(resolver_match, "view_name", None) or ""
+
+    def _add_timing(self, request, name: str, t0: float) -> float:
+        """
+        Add the time since `t0` to the request's timings and return it.
+        """
+        seconds = time.perf_counter() - t0
+        timings = getattr(request, "_fancy_cache_timings", None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + seconds
+        return seconds
+
+    def _add_timing_headers(self, request, response, status: str) -> None:
+        response["X-Cache"] = status
+        timings = getattr(request, "_fancy_cache_timings", None)
+        if not timings:
+            return
+        server_timing = ", ".join(
+            "fancy-%s;dur=%.3f" % (name, seconds * 1000)
+            for name, seconds in timings.items()
+        )
+        if response.has_header("Server-Timing") and status != "HIT":
+            server_timing = "%s, %s" % (
+                response["Server-Timing"],
+                server_timing,
+            )
+        response["Server-Timing"] = server_timing
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="RememberedURL",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("url", models.CharField(max_length=1000)),
+                ("url_hash", models.CharField(max_length=32, unique=True)),
+                (
+                    "url_prefix",
+                    models.CharField(db_index=True, max_length=255),
+                ),
+                ("cache_key", models.CharField(max_length=1000)),
+                ("cache_alias", models.CharField(blank=True, max_length=100)),
+                (
+                    "view",
+                    models.CharField(blank=True, db_index=True, max_length=255),
+                ),
+                ("expires", models.BigIntegerField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class RememberedURL(models.Model):
+    """
+    A remembered URL when `FANCY_REMEMBERED_URLS_STORAGE` is
+    "fancy_cache.storage.DatabaseStorage".
+    """
+
+    id = models.AutoField(primary_key=True)
+    url = models.CharField(max_length=1000)
+    # Unique and indexed instead of the URL, which is too long to be
+    # indexed by some databases, like MySQL with utf8mb4.
+    url_hash = models.CharField(max_length=32, unique=True)
+    url_prefix = models.CharField(max_length=255, db_index=True)
+    cache_key = models.CharField(max_length=1000)
+    # The cache the page is in, if not the one the URLs are remembered for.
+    cache_alias = models.CharField(max_length=100, blank=True)
+    view = models.CharField(max_length=255, blank=True, db_index=True)
+    # Seconds since epoch, like everywhere else the URLs are remembered.
+    expires = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return self.url
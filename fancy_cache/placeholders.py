@@ -0,0 +1,94 @@
+"""
+Punch holes in cached pages for the parts that differ per request.
+
+With ``placeholders={marker: callable}`` the body is split at the
+markers once, when it's stored, and what's cached is the response
+without its body and the parts in between. On a hit the parts and
+what the callables return for the request are put in the response as
+they are, so the body isn't searched or copied, like it is by a
+``response.content.replace(...)`` in `post_process_response_always`.
+"""
+import copy
+import re
+import typing
+
+__all__ = ("PunchedResponse", "punch", "resolve", "splice")
+
+
+class PunchedResponse(object):
+    """
+    What's stored under the cache key of a page instead of the response.
+    `parts` has one more item than `markers`; the body is the parts with
+    the markers in between.
+    """
+
+    def __init__(
+        self, response, parts: typing.List[bytes], markers: typing.List[str]
+    ):
+        self.response = response
+        self.parts = parts
+        self.markers = markers
+
+
+def _get_regex(markers: typing.Iterable[str]) -> typing.Pattern:
+    # The longest first in case one marker starts with another.
+    markers = sorted(markers, key=len, reverse=True)
+    return re.compile(
+        b"(%s)" % b"|".join(re.escape(x.encode("utf-8")) for x in markers)
+    )
+
+
+def punch(response, markers: typing.Iterable[str]) -> PunchedResponse:
+    """
+    Return what to store for `response` with the body split at the
+    markers.
+    """
+    pieces = _get_regex(markers).split(response.content)
+    response = copy.copy(response)
+    response.content = b""
+    return PunchedResponse(
+        response, pieces[::2], [x.decode("utf-8") for x in pieces[1::2]]
+    )
+
+
+def splice(
+    response,
+    parts: typing.List[bytes],
+    markers: typing.List[str],
+    request,
+    placeholders: typing.Dict[str, typing.Callable],
+) -> None:
+    """
+    Make the body of `response` the parts with what the placeholders
+    return for `request` in between. Markers that aren't placeholders
+    (any more) are left as they are.
+    """
+    values = {}
+    container = [parts[0]]
+    for marker, part in zip(markers, parts[1:]):
+        if marker not in values:
+            if marker in placeholders:
+                value = placeholders[marker](request)
+                if isinstance(value, str):
+                    value = value.encode(response.charset)
+                values[marker] = value
+            else:
+                values[marker] = marker.encode("utf-8")
+        container.append(values[marker])
+        container.append(part)
+    # Sent chunk by chunk as it is; `response.content` would join them.
+    response._container = container
+    if response.has_header("Content-Length"):
+        response["Content-Length"] = str(sum(len(x) for x in container))
+    response._fancy_cache_spliced = True
+
+
+def resolve(value, request, placeholders: typing.Dict[str, typing.Callable]):
+    """
+    Return `value`, as got from the cache, or if it's a punched page
+    the response with the placeholders filled in for `request`.
+    """
+    if not isinstance(value, PunchedResponse):
+        return value
+    splice(value.response, value.parts, value.markers, request, placeholders)
+    return value.response
@@ -0,0 +1,101 @@
+"""
+Purge cached pages by URL without having remembered them, by making the
+same cache keys `cache_page` would for a request for the URL.
+"""
+import typing
+from urllib.parse import urlencode
+
+from django.core.handlers.wsgi import WSGIRequest
+
+from fancy_cache.adaptive import forget_timeouts
+from fancy_cache.dedupe import delete_pages
+from fancy_cache.middleware import FancyCacheMiddleware, RequestPath
+from fancy_cache.warming import _make_environ
+
+__all__ = ("purge_url", "purge_urls")
+
+
+def _get_middleware(
+    key_prefix: typing.Optional[str],
+    view_options: typing.Optional[typing.Dict[str, typing.Any]],
+) -> FancyCacheMiddleware:
+    options = dict(view_options or {})
+    cache_alias = options.pop("cache", None)
+    if key_prefix is not None:
+        options["key_prefix"] = key_prefix
+    else:
+        options.setdefault("key_prefix", None)
+    return FancyCacheMiddleware(
+        lambda request: None, cache_alias=cache_alias, **options
+    )
+
+
+def _make_request(
+    url: str, headers: typing.Optional[typing.Dict[str, str]]
+) -> WSGIRequest:
+    extra_environ = {
+        "HTTP_%s" % name.upper().replace("-", "_"): value
+        for name, value in (headers or {}).items()
+    }
+    return WSGIRequest(_make_environ(url, extra_environ=extra_environ))
+
+
+def purge_urls(
+    urls: typing.Iterable[str],
+    headers: typing.Dict[str, str] = None,
+    key_prefix: str = None,
+    view_options: typing.Dict[str, typing.Any] = None,
+) -> typing.List[str]:
+    """
+    Delete the cached pages of `urls`, with one `delete_many`, and
+    return the cache keys, of the GET and HEAD responses, that were
+    cached and are deleted. The pages' adaptive timeouts start over.
+
+    `headers` are the request headers, like "Host" or the ones the
+    pages vary on. `view_options` are the keyword arguments given to
+    `cache_page`, like `cache`, `key_prefix` or `only_get_keys`, and
+    `key_prefix` overrides the one in there.
+
+    Like Django, the cache keys include the language and time zone that
+    are active, if `USE_I18N` and `USE_TZ` are enabled.
+    """
+    middleware = _get_middleware(key_prefix, view_options)
+    cache_keys = []
+    paths = []
+    for url in urls:
+        request = _make_request(url, headers)
+        cache_keys.extend(middleware.get_cache_keys(request))
+        with RequestPath(
+            request, middleware.only_get_keys, middleware.forget_get_keys
+        ):
+            paths.append(request.get_full_path())
+    deleted = []
+    if cache_keys:
+        deleted = delete_pages(middleware.cache, cache_keys)
+    if paths:
+        forget_timeouts(middleware.index_cache, paths)
+    return deleted
+
+
+def purge_url(
+    path: str,
+    query: typing.Union[str, typing.Dict[str, typing.Any]] = None,
+    headers: typing.Dict[str, str] = None,
+    key_prefix: str = None,
+    view_options: typing.Dict[str, typing.Any] = None,
+) -> typing.List[str]:
+    """
+    Delete the cached page of `path` (and `query`, as a string or a
+    dict) and return the cache keys that were deleted, like
+    `purge_urls`. None are returned if the page isn't cached.
+    """
+    if isinstance(query, dict):
+        query = urlencode(query, doseq=True)
+    if query:
+        path = "%s?%s" % (path, query)
+    return purge_urls(
+        [path],
+        headers=headers,
+        key_prefix=key_prefix,
+        view_options=view_options,
+    )
@@ -0,0 +1,138 @@
+"""
+Refresh-ahead for hot URLs.
+
+Uses the expiration times recorded by `remember_url` and the hits recorded
+with `remember_stats_all_urls` to re-render the most requested pages
+shortly before they expire. Pages that haven't had enough hits since they
+were last refreshed are left to expire naturally.
+"""
+import logging
+import threading
+import time
+import typing
+
+from fancy_cache.constants import REFRESH_ENVIRON_KEY
+from fancy_cache.memory import get_remembered_urls, get_url_stats
+from fancy_cache.warming import warm_urls
+
+__all__ = ("RefreshAheadScheduler",)
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RefreshAheadScheduler(object):
+    """
+    :param lead_time:
+        How many seconds before a page expires it's due to be refreshed.
+
+    :param min_hits:
+        How many cache hits a URL needs to have had since it was last
+        refreshed (or since the scheduler started) to count as hot.
+
+    :param top:
+        Max number of URLs, hottest first, to refresh per run.
+
+    :param interval:
+        Seconds between runs when started as a background thread.
+
+    :param concurrency:
+        Number of URLs to refresh at the same time.
+
+    :param host:
+        Host to request the URLs as. Defaults to one from ALLOWED_HOSTS.
+    """
+
+    def __init__(
+        self,
+        lead_time: int = 30,
+        min_hits: int = 1,
+        top: typing.Optional[int] = None,
+        interval: float = 10,
+        concurrency: int = 1,
+        host: str = None,
+    ):
+        self.lead_time = lead_time
+        self.min_hits = min_hits
+        self.top = top
+        self.interval = interval
+        self.concurrency = concurrency
+        self.host = host
+        # The number of hits each URL had when it was last looked at.
+        self._last_hits = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def due_urls(self, now: int = None) -> typing.List[str]:
+        """
+        Return the hot URLs that are about to expire, hottest first.
+        """
+        if now is None:
+            now = int(time.time())
+        remembered_urls = get_remembered_urls()
+        # Forget about URLs that are no longer remembered.
+        for url in list(self._last_hits):
+            if url not in remembered_urls:
+                del self._last_hits[url]
+
+        due = []
+        for url, value in remembered_urls.items():
+            if not isinstance(value, (tuple, list)):
+                continue
+            expiration_time = value[1]
+            if expiration_time - now > self.lead_time:
+                continue
+            stats = get_url_stats(url)
+            hits = stats["hits"] if stats else 0
+            last_hits = self._last_hits.get(url, 0)
+            if hits < last_hits:
+                # The stats have been reset since last time
+                last_hits = 0
+            if hits - last_hits < self.min_hits:
+                continue
+            due.append((hits - last_hits, hits, url))
+
+        due.sort(key=lambda x: x[0], reverse=True)
+        if self.top is not None:
+            due = due[: self.top]
+        for _, hits, url in due:
+            self._last_hits[url] = hits
+        return [url for _, _, url in due]
+
+    def run(self) -> typing.List[typing.Tuple[str, int, float]]:
+        """
+        Refresh all due URLs once and return the (url, status code,
+        seconds) of each.
+        """
+        return list(
+            warm_urls(
+                self.due_urls(),
+                concurrency=self.concurrency,
+                host=self.host,
+                extra_environ={REFRESH_ENVIRON_KEY: True},
+            )
+        )
+
+    def start(self) -> None:
+        """
+        Start refreshing every `interval` seconds in a daemon thread.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="fancy-cache-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run()
+            except Exception:
+                LOGGER.exception("Fancy cache refresh-ahead failed")
@@ -0,0 +1,117 @@
+"""
+Find, and purge, cached pages by scanning the keys in the cache itself
+instead of looking them up in the remembered URLs. Only pages of views
+with `path_in_cache_key` have the URL in their cache keys.
+
+Supported caches are the local memory and the Redis caches. The other
+Django caches can't list their keys.
+"""
+import re
+import typing
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+from fancy_cache.constants import PATH_KEY_DELIMITER
+
+__all__ = ("scan_urls",)
+
+SCAN_COUNT = 1000
+DELETE_BATCH_SIZE = 1000
+_ANY_URL_CHARS = "[^%s]*" % re.escape(PATH_KEY_DELIMITER)
+
+
+def _url_regex(url: str) -> str:
+    return _ANY_URL_CHARS.join(re.escape(part) for part in url.split("*"))
+
+
+def _keys_regex(urls: typing.List[str] = None) -> typing.Pattern:
+    # The keys Django makes, after the key prefix, are:
+    #   views.decorators.cache.cache_page.<key prefix>#<url>#.GET.<md5>.<md5>
+    #   views.decorators.cache.cache_header.<key prefix>#<url>#.<md5>
+    if urls:
+        url_regex = "|".join(_url_regex(url) for url in urls)
+    else:
+        url_regex = _ANY_URL_CHARS
+    return re.compile(
+        r"views\.decorators\.cache\.cache_(?P<kind>page|header)\."
+        r"[^{0}]*{0}(?P<url>{1}){0}\.".format(
+            re.escape(PATH_KEY_DELIMITER), url_regex
+        )
+    )
+
+
+def _redis_glob(url: str) -> str:
+    return "*views.decorators.cache.cache_*%s%s%s.*" % (
+        PATH_KEY_DELIMITER,
+        "*".join(
+            re.sub(r"([?\[\]\\])", r"\\\1", part) for part in url.split("*")
+        ),
+        PATH_KEY_DELIMITER,
+    )
+
+
+def _is_redis(cache) -> bool:
+    return hasattr(getattr(cache, "_cache", None), "get_client")
+
+
+def _scan_keys(cache, urls: typing.List[str] = None) -> typing.Iterator[str]:
+    if isinstance(cache, LocMemCache):
+        with cache._lock:
+            keys = [key for key in cache._cache if not cache._has_expired(key)]
+        yield from keys
+    elif _is_redis(cache):
+        client = cache._cache.get_client()
+        for url in urls or ["*"]:
+            for key in client.scan_iter(
+                match=_redis_glob(url), count=SCAN_COUNT
+            ):
+                yield key.decode()
+    else:
+        raise ImproperlyConfigured(
+            "Only the local memory and Redis caches can be scanned, not %s"
+            % type(cache).__name__
+        )
+
+
+def _delete_keys(cache, keys: typing.List[str]) -> None:
+    # These are the keys as they are in the cache so they can't go
+    # through `cache.delete_many` which would make them again.
+    if isinstance(cache, LocMemCache):
+        with cache._lock:
+            for key in keys:
+                cache._delete(key)
+    else:
+        client = cache._cache.get_client(write=True)
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            client.delete(*keys[i : i + DELETE_BATCH_SIZE])
+
+
+def scan_urls(
+    urls: typing.List[str] = None,
+    purge: bool = False,
+    cache_alias: str = None,
+) -> typing.List[typing.Tuple[str, typing.List[str]]]:
+    """
+    Return (url, cache keys) of the pages cached in `cache_alias` whose
+    URL matches any of the `urls` patterns, in which "*" is a wildcard,
+    or all of them. The cache keys are as they are in the cache, with
+    its key prefix and version.
+
+    With `purge` the pages, and the headers they vary on, are deleted.
+    """
+    cache = caches[cache_alias or DEFAULT_CACHE_ALIAS]
+    regex = _keys_regex(urls)
+    found = {}
+    keys_to_delete = set()
+    for key in _scan_keys(cache, urls):
+        match = regex.search(key)
+        if not match:
+            continue
+        keys_to_delete.add(key)
+        if match.group("kind") == "page":
+            found.setdefault(match.group("url"), []).append(key)
+    if purge and keys_to_delete:
+        _delete_keys(cache, sorted(keys_to_delete))
+    return sorted(found.items())
@@ -0,0 +1,127 @@
+"""
+Fixed size data structures for counting URLs, no matter how many
+distinct URLs there are.
+"""
+import hashlib
+import typing
+from array import array
+
+
+class CountMinSketch(object):
+    """
+    Approximate counter. The estimate for a key is never lower than its
+    true count and only too high by collisions with other keys.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = [array("q", [0]) * width for _ in range(depth)]
+
+    def _indexes(self, key: str) -> typing.List[int]:
+        # Don't use hash() because it's different in every process and
+        # sketches from different processes get merged.
+        digest = hashlib.blake2b(
+            key.encode("utf-8"), digest_size=4 * self.depth
+        ).digest()
+        return [
+            int.from_bytes(digest[i * 4 : (i + 1) * 4], "little") % self.width
+            for i in range(self.depth)
+        ]
+
+    def add(self, key: str, count: int = 1) -> None:
+        for row, index in zip(self.table, self._indexes(key)):
+            row[index] += count
+
+    def estimate(self, key: str) -> int:
+        return min(
+            row[index] for row, index in zip(self.table, self._indexes(key))
+        )
+
+    def merge(self, other: "CountMinSketch") -> None:
+        assert (self.width, self.depth) == (other.width, other.depth)
+        for row, other_row in zip(self.table, other.table):
+            for i, count in enumerate(other_row):
+                if count:
+                    row[i] += count
+
+    def clear(self) -> None:
+        for row in self.table:
+            for i in range(self.width):
+                row[i] = 0
+
+
+class SpaceSaving(object):
+    """
+    Keeps track of (approximately) the `k` most frequent keys.
+    Each counted key has a count and the max amount it might be
+    overestimated by.
+    """
+
+    def __init__(self, k: int = 100):
+        self.k = k
+        self.counters = {}  # key -> [count, error]
+
+    def add(self, key: str, count: int = 1) -> None:
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.k:
+            self.counters[key] = [count, 0]
+        else:
+            # Replace the least frequent key. The new key might have been
+            # seen as many times as the one it replaces.
+            smallest = min(self.counters, key=lambda x: self.counters[x][0])
+            smallest_count = self.counters.pop(smallest)[0]
+            self.counters[key] = [smallest_count + count, smallest_count]
+
+    def merge(self, other: "SpaceSaving") -> None:
+        for key, (count, error) in other.counters.items():
+            counter = self.counters.setdefault(key, [0, 0])
+            counter[0] += count
+            counter[1] += error
+        if len(self.counters) > self.k:
+            keep = self.top(self.k)
+            self.counters = dict(
+                (key, [count, error]) for key, count, error in keep
+            )
+
+    def top(self, n: int = None) -> typing.List[typing.Tuple[str, int, int]]:
+        found = sorted(
+            (
+                (key, count, error)
+                for key, (count, error) in self.counters.items()
+            ),
+            key=lambda x: x[1],
+            reverse=True,
+        )
+        return found[:n] if n is not None else found
+
+
+class HeavyHitters(object):
+    """
+    The top `k` URLs by number of requests together with an estimate
+    of how many of those requests were cache misses.
+    """
+
+    def __init__(self, k: int = 100, width: int = 2048, depth: int = 4):
+        self.requests = SpaceSaving(k)
+        self.misses = CountMinSketch(width, depth)
+
+    def add(self, url: str, hit: bool) -> None:
+        self.requests.add(url)
+        if not hit:
+            self.misses.add(url)
+
+    def merge(self, other: "HeavyHitters") -> None:
+        self.requests.merge(other.requests)
+        self.misses.merge(other.misses)
+
+    def top(self, n: int = None) -> typing.List[typing.Tuple[str, int, int]]:
+        """
+        Return a list of (url, requests, misses), most requested first.
+        """
+        return [
+            (url, count, min(count, self.misses.estimate(url)))
+            for url, count, _ in self.requests.top(n)
+        ]
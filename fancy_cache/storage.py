@@ -0,0 +1,400 @@
+"""
+Other places to keep the remembered URLs than one dict in the cache.
+
+Configured with the `FANCY_REMEMBERED_URLS_STORAGE` setting which is the
+dotted path to a class like `BaseStorage`. For example::
+
+    FANCY_REMEMBERED_URLS_STORAGE = "fancy_cache.storage.RedisStorage"
+"""
+import abc
+import atexit
+import re
+import threading
+import time
+import typing
+
+import django
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
+from django.utils.module_loading import import_string
+
+from fancy_cache.constants import REMEMBERED_URLS_KEY
+from fancy_cache.utils import _match, _urls_to_regexes, md5
+
+__all__ = ("BaseStorage", "DatabaseStorage", "RedisStorage", "get_storage")
+
+REMEMBERED_URLS_STORAGE = getattr(
+    settings, "FANCY_REMEMBERED_URLS_STORAGE", None
+)
+DEFER_REMEMBERED_URLS_SWEEP = getattr(
+    settings, "FANCY_DEFER_REMEMBERED_URLS_SWEEP", False
+)
+REMEMBERED_URLS_BUFFER_SIZE = getattr(
+    settings, "FANCY_REMEMBERED_URLS_BUFFER_SIZE", 0
+)
+REMEMBERED_URLS_FLUSH_INTERVAL = getattr(
+    settings, "FANCY_REMEMBERED_URLS_FLUSH_INTERVAL", 10
+)
+
+
+def get_storage(cache) -> typing.Optional["BaseStorage"]:
+    """
+    Return the configured storage for the remembered URLs of `cache`,
+    or None if they're stored as one dict in the cache.
+    """
+    if not REMEMBERED_URLS_STORAGE:
+        return None
+    return import_string(REMEMBERED_URLS_STORAGE)(cache)
+
+
+class BaseStorage(abc.ABC):
+    """
+    Override `remember`, `get_all`, `forget` and `sweep`. Override
+    `find` too if the storage can search by URL pattern.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @abc.abstractmethod
+    def remember(
+        self,
+        url: str,
+        cache_key: str,
+        expiration_time: int,
+        view: str = "",
+        cache_alias: str = None,
+    ):
+        """
+        Remember the URL and, unless `FANCY_DEFER_REMEMBERED_URLS_SWEEP`
+        is set, forget the expired ones. `cache_alias` is the cache the
+        page is in, if it's not the one the URLs are remembered for.
+        """
+
+    @abc.abstractmethod
+    def get_all(self) -> typing.Dict[str, typing.Tuple[str, int]]:
+        """
+        Return {url: (cache_key, expiration_time)}, or
+        {url: (cache_key, expiration_time, cache_alias)}, of all
+        remembered URLs.
+        """
+
+    def find(
+        self, urls: typing.List[str] = None
+    ) -> typing.Iterator[typing.Tuple[str, str, typing.Optional[str]]]:
+        """
+        Yield (url, cache_key, cache_alias) of the remembered URLs that
+        match any of the `urls` patterns, in which "*" is a wildcard, or
+        all of them.
+        """
+        regexes = _urls_to_regexes(urls) if urls else []
+        for url, value in self.get_all().items():
+            if _match(url, regexes):
+                yield url, value[0], value[2] if len(value) > 2 else None
+
+    @abc.abstractmethod
+    def forget(self, urls: typing.List[str]) -> None:
+        """
+        Forget the `urls`.
+        """
+
+    @abc.abstractmethod
+    def sweep(self, now: int = None) -> int:
+        """
+        Forget the expired URLs and return how many there were.
+        """
+
+
+class RedisStorage(BaseStorage):
+    """
+    Keeps the remembered URLs in Redis as a hash of URL to cache key
+    (prefixed with the cache alias and a newline if there is one) and a
+    sorted set of URLs scored by expiration time. Every operation is
+    atomic so there's no need for check-and-set.
+
+    Requires Django's `RedisCache` backend.
+    """
+
+    SCAN_COUNT = 1000
+    SWEEP_BATCH_SIZE = 1000
+
+    # Only forget the URLs that haven't been remembered again since
+    # they were found to be expired.
+    SWEEP_SCRIPT = """
+    local urls = redis.call(
+        "ZRANGEBYSCORE", KEYS[2], "-inf", ARGV[1], "LIMIT", 0, ARGV[2]
+    )
+    for _, url in ipairs(urls) do
+        redis.call("HDEL", KEYS[1], url)
+        redis.call("ZREM", KEYS[2], url)
+    end
+    return #urls
+    """
+
+    def __init__(self, cache):
+        super().__init__(cache)
+        if not hasattr(getattr(cache, "_cache", None), "get_client"):
+            raise ImproperlyConfigured(
+                "RedisStorage requires the "
+                "django.core.cache.backends.redis.RedisCache backend"
+            )
+        self.urls_key = cache.make_key("%s:urls" % REMEMBERED_URLS_KEY)
+        self.expires_key = cache.make_key("%s:expires" % REMEMBERED_URLS_KEY)
+
+    def _client(self, write: bool = False):
+        return self.cache._cache.get_client(write=write)
+
+    @staticmethod
+    def _split_value(value: bytes) -> typing.Tuple[str, typing.Optional[str]]:
+        # Cache keys can't contain newlines; see `validate_key`.
+        cache_alias, _, cache_key = value.decode().rpartition("\n")
+        return cache_key, cache_alias or None
+
+    def remember(
+        self, url, cache_key, expiration_time, view="", cache_alias=None
+    ):
+        if cache_alias:
+            cache_key = "%s\n%s" % (cache_alias, cache_key)
+        pipeline = self._client(write=True).pipeline()
+        pipeline.hset(self.urls_key, url, cache_key)
+        pipeline.zadd(self.expires_key, {url: expiration_time})
+        pipeline.execute()
+        if not DEFER_REMEMBERED_URLS_SWEEP:
+            self.sweep()
+
+    def get_all(self):
+        pipeline = self._client().pipeline(transaction=False)
+        pipeline.hgetall(self.urls_key)
+        pipeline.zrange(self.expires_key, 0, -1, withscores=True)
+        cache_keys, expires = pipeline.execute()
+        expires = dict(expires)
+        remembered_urls = {}
+        for url, value in cache_keys.items():
+            cache_key, cache_alias = self._split_value(value)
+            expiration_time = int(expires.get(url, 0))
+            if cache_alias:
+                remembered_urls[url.decode()] = (
+                    cache_key,
+                    expiration_time,
+                    cache_alias,
+                )
+            else:
+                remembered_urls[url.decode()] = (cache_key, expiration_time)
+        return remembered_urls
+
+    def find(self, urls=None):
+        client = self._client()
+        seen = set()
+        for pattern in urls or ["*"]:
+            match = "*".join(
+                re.sub(r"([?\[\]\\])", r"\\\1", part)
+                for part in pattern.split("*")
+            )
+            for url, value in client.hscan_iter(
+                self.urls_key, match, count=self.SCAN_COUNT
+            ):
+                if url not in seen:
+                    seen.add(url)
+                    yield (url.decode(),) + self._split_value(value)
+
+    def forget(self, urls):
+        if not urls:
+            return
+        pipeline = self._client(write=True).pipeline()
+        pipeline.hdel(self.urls_key, *urls)
+        pipeline.zrem(self.expires_key, *urls)
+        pipeline.execute()
+
+    def sweep(self, now=None):
+        if now is None:
+            now = int(time.time())
+        script = self._client(write=True).register_script(self.SWEEP_SCRIPT)
+        swept = 0
+        while True:
+            count = script(
+                keys=[self.urls_key, self.expires_key],
+                args=[now, self.SWEEP_BATCH_SIZE],
+            )
+            swept += count
+            if count < self.SWEEP_BATCH_SIZE:
+                return swept
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    Keeps the remembered URLs in the database, with the
+    `fancy_cache.models.RememberedURL` model, so they survive the cache
+    being cleared or restarted. Requires "fancy_cache" in
+    INSTALLED_APPS.
+
+    URLs are written as they're remembered unless
+    `FANCY_REMEMBERED_URLS_BUFFER_SIZE` is set. Then they're kept in a
+    buffer per process which is written with one bulk upsert every that
+    many URLs or `FANCY_REMEMBERED_URLS_FLUSH_INTERVAL` seconds,
+    whichever is first, checked on every request, as well as before
+    anything is read and when the process exits.
+
+    Unless `FANCY_DEFER_REMEMBERED_URLS_SWEEP` is set, the expired URLs
+    are deleted after a buffer is written, or when URLs are written as
+    they're remembered, every `FANCY_REMEMBERED_URLS_FLUSH_INTERVAL`
+    seconds.
+    """
+
+    BATCH_SIZE = 500
+    # Of the URLs, in `RememberedURL.url_prefix`, for `startswith`.
+    PREFIX_LENGTH = 255
+
+    _lock = threading.Lock()
+    _pending = {}  # url -> RememberedURL
+    _last_flush = time.time()
+    _last_sweep = 0.0
+    _flush_hooked = False
+
+    @staticmethod
+    def _model():
+        # Not imported at the top because this module is imported
+        # before the app registry is ready.
+        from fancy_cache.models import RememberedURL
+
+        return RememberedURL
+
+    def remember(
+        self, url, cache_key, expiration_time, view="", cache_alias=None
+    ):
+        cls = type(self)
+        model = self._model()
+        if len(url) > model._meta.get_field("url").max_length:
+            # Can't be stored, so can't be purged by URL either.
+            return
+        remembered_url = model(
+            url=url,
+            url_hash=md5(url),
+            url_prefix=url[: self.PREFIX_LENGTH],
+            cache_key=cache_key,
+            cache_alias=cache_alias or "",
+            expires=expiration_time,
+            view=view,
+        )
+        with cls._lock:
+            cls._pending[url] = remembered_url
+            if (
+                len(cls._pending) < REMEMBERED_URLS_BUFFER_SIZE
+                and time.time() - cls._last_flush
+                < REMEMBERED_URLS_FLUSH_INTERVAL
+            ):
+                if not cls._flush_hooked:
+                    # So a process that goes quiet, or exits, doesn't
+                    # keep URLs that can't be purged from elsewhere.
+                    cls._flush_hooked = True
+                    request_started.connect(_flush_stale_buffer)
+                    atexit.register(cls.flush)
+                return
+        self.flush()
+        if not DEFER_REMEMBERED_URLS_SWEEP and (
+            # A whole buffer was written, or it's been a while.
+            REMEMBERED_URLS_BUFFER_SIZE
+            or time.time() - cls._last_sweep >= REMEMBERED_URLS_FLUSH_INTERVAL
+        ):
+            self.sweep()
+
+    @classmethod
+    def flush(cls) -> None:
+        """
+        Write the URLs remembered in this process to the database.
+        """
+        with cls._lock:
+            pending = list(cls._pending.values())
+            cls._pending = {}
+            cls._last_flush = time.time()
+        if not pending:
+            return
+        model = cls._model()
+        if django.VERSION >= (4, 1):
+            model.objects.bulk_create(
+                pending,
+                batch_size=cls.BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["url_hash"],
+                update_fields=["cache_key", "cache_alias", "view", "expires"],
+            )
+        else:
+            for each in pending:
+                model.objects.update_or_create(
+                    url_hash=each.url_hash,
+                    defaults={
+                        "url": each.url,
+                        "url_prefix": each.url_prefix,
+                        "cache_key": each.cache_key,
+                        "cache_alias": each.cache_alias,
+                        "view": each.view,
+                        "expires": each.expires,
+                    },
+                )
+
+    def get_all(self):
+        self.flush()
+        remembered_urls = {}
+        for url, cache_key, cache_alias, expires in (
+            self._model()
+            .objects.values_list("url", "cache_key", "cache_alias", "expires")
+            .iterator()
+        ):
+            if cache_alias:
+                remembered_urls[url] = (cache_key, expires, cache_alias)
+            else:
+                remembered_urls[url] = (cache_key, expires)
+        return remembered_urls
+
+    def find(self, urls=None):
+        self.flush()
+        queryset = self._model().objects.values_list(
+            "url", "cache_key", "cache_alias"
+        )
+        if not urls:
+            for url, cache_key, cache_alias in queryset.iterator():
+                yield url, cache_key, cache_alias or None
+            return
+        seen = set()
+        for pattern, regex in zip(urls, _urls_to_regexes(urls)):
+            prefix = pattern.split("*")[0]
+            if prefix == pattern:
+                found = queryset.filter(url_hash=md5(pattern))
+            else:
+                # Indexed, then checked against the whole pattern.
+                found = queryset.filter(
+                    url_prefix__startswith=prefix[: self.PREFIX_LENGTH]
+                )
+            for url, cache_key, cache_alias in found.iterator():
+                if url not in seen and regex.match(url):
+                    seen.add(url)
+                    yield url, cache_key, cache_alias or None
+
+    def forget(self, urls):
+        self.flush()
+        model = self._model()
+        for i in range(0, len(urls), self.BATCH_SIZE):
+            model.objects.filter(
+                url_hash__in=[md5(x) for x in urls[i : i + self.BATCH_SIZE]]
+            ).delete()
+
+    def sweep(self, now=None):
+        self.flush()
+        type(self)._last_sweep = time.time()
+        if now is None:
+            now = int(time.time())
+        deleted, _ = self._model().objects.filter(expires__lte=now).delete()
+        return deleted
+
+
+def _flush_stale_buffer(**kwargs) -> None:
+    """
+    Write the buffered URLs of `DatabaseStorage` if they've been waiting
+    for longer than `FANCY_REMEMBERED_URLS_FLUSH_INTERVAL` seconds.
+    """
+    if (
+        DatabaseStorage._pending
+        and time.time() - DatabaseStorage._last_flush
+        >= REMEMBERED_URLS_FLUSH_INTERVAL
+    ):
+        DatabaseStorage.flush()
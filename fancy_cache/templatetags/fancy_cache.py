@@ -0,0 +1,144 @@
+from django.template import (
+    Library,
+    Node,
+    TemplateSyntaxError,
+    VariableDoesNotExist,
+)
+
+from fancy_cache.fragments import FragmentCache
+
+register = Library()
+
+OPTIONS = {
+    "using": "cache",
+    "key_prefix": "key_prefix",
+    "only_get_keys": "only_get_keys",
+    "forget_get_keys": "forget_get_keys",
+}
+CACHES_KEY = "fancy_cache_fragments"
+
+
+class FancyCacheNode(Node):
+    def __init__(
+        self, nodelist, expire_time_var, fragment_name, vary_on, options
+    ):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.options = options
+
+    def _resolve_expire_time(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError(
+                '"fancy_cache" tag got an unknown variable: %r'
+                % self.expire_time_var.var
+            )
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise TemplateSyntaxError(
+                    '"fancy_cache" tag got a non-integer timeout value: %r'
+                    % expire_time
+                )
+        return expire_time
+
+    def _resolve(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        options = {}
+        for name, var in self.options.items():
+            value = var.resolve(context)
+            if name.endswith("_get_keys") and isinstance(value, str):
+                value = [x.strip() for x in value.split(",") if x.strip()]
+            options[name] = value
+        return vary_on, options
+
+    @staticmethod
+    def _get_fragment_cache(context, request, options):
+        fragment_caches = context.render_context[CACHES_KEY]
+        key = repr(sorted(options.items()))
+        if key not in fragment_caches:
+            fragment_caches[key] = FragmentCache(request, **options)
+        return fragment_caches[key]
+
+    def _prefetch(self, context, request) -> None:
+        """
+        Fetch all the fragments of the template, as far as their keys
+        can be made already, with one `get_many` per set of options.
+        """
+        context.render_context[CACHES_KEY] = {}
+        # The template being rendered, which is the included one
+        # inside an `include`.
+        template = context.render_context.template
+        nodes = [self]
+        if template is not None:
+            nodes += template.nodelist.get_nodes_by_type(FancyCacheNode)
+        cache_keys = {}
+        for node in nodes:
+            vary_on, options = node._resolve(context)
+            fragment_cache = self._get_fragment_cache(context, request, options)
+            cache_keys.setdefault(fragment_cache, []).append(
+                fragment_cache.get_key(node.fragment_name, vary_on)
+            )
+        for fragment_cache, keys in cache_keys.items():
+            fragment_cache.fetch(keys)
+
+    def render(self, context):
+        request = context.get("request")
+        if request is None:
+            # Without the "request" context processor there's no URL
+            # to cache the fragment for.
+            return self.nodelist.render(context)
+        if CACHES_KEY not in context.render_context:
+            self._prefetch(context, request)
+        expire_time = self._resolve_expire_time(context)
+        vary_on, options = self._resolve(context)
+        fragment_cache = self._get_fragment_cache(context, request, options)
+        return fragment_cache.render(
+            self.fragment_name,
+            lambda: self.nodelist.render(context),
+            vary_on,
+            expire_time,
+        )
+
+
+@register.tag("fancy_cache")
+def do_fancy_cache(parser, token):
+    """
+    Like Django's `cache` tag but cached per URL like `cache_page`, and
+    with its options::
+
+        {% load fancy_cache %}
+        {% fancy_cache [expire_time] [fragment_name] [var1] [var2] .. %}
+            .. some expensive processing ..
+        {% endfancy_cache %}
+
+    The options are given last, like
+    ``using="fragments" key_prefix=prefix only_get_keys="page,sort"``.
+    A callable `key_prefix` has to have `do_not_call_in_templates` set.
+
+    All the fragments in the template are fetched with one `get_many`
+    when the first one is rendered. Requires the "request" context
+    processor.
+    """
+    nodelist = parser.parse(("endfancy_cache",))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    options = {}
+    while len(tokens) > 3 and tokens[-1].split("=", 1)[0] in OPTIONS:
+        name, value = tokens.pop().split("=", 1)
+        options[OPTIONS[name]] = parser.compile_filter(value)
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            "'%r' tag requires at least 2 arguments." % tokens[0]
+        )
+    return FancyCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],  # fragment_name can't be a variable.
+        [parser.compile_filter(t) for t in tokens[3:]],
+        options,
+    )
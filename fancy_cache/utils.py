@@ -1,12 +1,142 @@
 import hashlib
+import json
+import re
 import time
 import typing
+import zlib
+
+from fancy_cache import encoding
+from fancy_cache.constants import EXPIRING_URLS_KEY, LONG_TIME
 
 
 def md5(x) -> str:
     return hashlib.md5(x.encode("utf-8")).hexdigest()
 
 
+class ExpiryBuckets(object):
+    """
+    The remembered URLs by the minute they expire in, in keys of their
+    own next to the remembered urls dict, so that `sweep()` only needs
+    to look at the URLs that have expired instead of all of them. The
+    remembered urls dict itself stays as it is.
+
+    `sweep()` doesn't change anything in the cache so it can be tried
+    again, like with CAS; call `commit()` once the remembered urls are
+    stored.
+    """
+
+    # Further behind than that and it's quicker to look at all the URLs.
+    MAX_MINUTES = 60 * 24
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._commit = None
+
+    @staticmethod
+    def _get_key(minute: int) -> str:
+        return "%s:%s" % (EXPIRING_URLS_KEY, minute)
+
+    def track(self, url: str, expiration_time: int) -> None:
+        """
+        Put `url` in the bucket of the minute it expires in.
+        """
+        key = self._get_key(expiration_time // 60)
+        found = self.cache.get_many([EXPIRING_URLS_KEY, key])
+        if EXPIRING_URLS_KEY not in found:
+            # Not swept yet; the first sweep looks at all the URLs.
+            return
+        urls = found.get(key)
+        self.cache.set(
+            key, url if urls is None else urls + "\n" + url, LONG_TIME
+        )
+
+    def sweep(
+        self,
+        remembered_urls: typing.Dict[str, typing.Tuple[str, int]],
+        now: int = None,
+    ) -> int:
+        """
+        Drop the URLs that expired before this minute from
+        `remembered_urls` and return how many there were.
+        """
+        if now is None:
+            now = int(time.time())
+        this_minute = now // 60
+        swept_minute = self.cache.get(EXPIRING_URLS_KEY)
+        if (
+            swept_minute is None
+            or this_minute - swept_minute > self.MAX_MINUTES
+        ):
+            # Like the first time, or if it's been evicted.
+            expired = [
+                url
+                for url, value in remembered_urls.items()
+                if not isinstance(value, tuple) or value[1] <= now
+            ]
+            for url in expired:
+                del remembered_urls[url]
+            self._commit = (None, remembered_urls, this_minute - 1)
+            return len(expired)
+
+        minutes = range(swept_minute + 1, this_minute)
+        keys = [self._get_key(x) for x in minutes]
+        found = self.cache.get_many(keys) if keys else {}
+        swept = 0
+        for minute, key in zip(minutes, keys):
+            for url in found.get(key, "").split("\n"):
+                value = remembered_urls.get(url)
+                if value is not None and value[1] // 60 == minute:
+                    # Not if it's been remembered again since.
+                    del remembered_urls[url]
+                    swept += 1
+        self._commit = (keys, None, this_minute - 1)
+        return swept
+
+    def commit(self) -> None:
+        """
+        Forget the buckets that have been swept, or make them all after
+        looking at all the URLs.
+        """
+        if self._commit is None:
+            return
+        keys, remembered_urls, swept_minute = self._commit
+        self._commit = None
+        if keys is not None:
+            if keys:
+                self.cache.delete_many(keys)
+                self.cache.set(EXPIRING_URLS_KEY, swept_minute, LONG_TIME)
+            return
+        buckets = {}
+        for url, value in remembered_urls.items():
+            buckets.setdefault(self._get_key(value[1] // 60), []).append(url)
+        buckets = {key: "\n".join(urls) for key, urls in buckets.items()}
+        buckets[EXPIRING_URLS_KEY] = swept_minute
+        self.cache.set_many(buckets, LONG_TIME)
+
+
+def _match(url: str, regexes: typing.List[typing.Pattern[str]]):
+    if not regexes:
+        return url
+    for regex in regexes:
+        if regex.match(url):
+            return True
+    return False
+
+
+def _urls_to_regexes(
+    urls: typing.List[str],
+) -> typing.List[typing.Pattern[str]]:
+    regexes = []
+    for each in urls:
+        parts = each.split("*")
+        if len(parts) == 1:
+            regexes.append(re.compile("^%s$" % re.escape(parts[0])))
+        else:
+            _re = ".*".join(re.escape(x) for x in parts)
+            regexes.append(re.compile("^%s$" % _re))
+    return regexes
+
+
 def filter_remembered_urls(
     remembered_urls: typing.Dict[str, typing.Tuple[str, int]],
 ) -> typing.Dict[str, typing.Tuple[str, int]]:
@@ -23,3 +153,37 @@ def filter_remembered_urls(
         if isinstance(value, tuple) and value[1] > now
     }
     return remembered_urls
+
+
+def decode_remembered_urls(
+    remembered_urls,
+) -> typing.Dict[str, typing.Tuple[str, int]]:
+    """
+    Return the remembered urls dict from how it's stored in the cache;
+    as a dict, as zlib compressed JSON or compact encoded.
+    """
+    if isinstance(remembered_urls, dict):
+        return remembered_urls
+    if encoding.is_compact(remembered_urls):
+        return encoding.decode(remembered_urls)
+    remembered_urls = json.loads(zlib.decompress(remembered_urls).decode())
+    # JSON turns the (cache_key, expiration_time) tuples into lists.
+    return {
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in remembered_urls.items()
+    }
+
+
+def encode_remembered_urls(
+    remembered_urls: typing.Dict[str, typing.Tuple[str, int]],
+    compress: bool = False,
+    compact: bool = False,
+):
+    """
+    Return the remembered urls dict as it should be stored in the cache.
+    """
+    if compact:
+        return encoding.encode(remembered_urls)
+    if compress:
+        return zlib.compress(json.dumps(remembered_urls).encode())
+    return remembered_urls
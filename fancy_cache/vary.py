@@ -0,0 +1,92 @@
+"""
+Normalizers for `vary_normalizers`, to collapse the values of request
+headers pages vary on into the few that make a difference. For
+example::
+
+    from fancy_cache import vary
+
+    @cache_page(
+        3600,
+        vary_normalizers={
+            "Accept-Language": vary.accept_language(["en", "sv", "de"]),
+            "Accept-Encoding": vary.accept_encoding(),
+        },
+    )
+    def myview(request):
+        ...
+"""
+import typing
+
+from django.conf import settings
+from django.utils.translation.trans_real import parse_accept_lang_header
+
+__all__ = ("accept_encoding", "accept_language")
+
+
+def accept_language(
+    languages: typing.Iterable[str] = None, default: str = None
+) -> typing.Callable[[str], str]:
+    """
+    Return a normalizer of the "Accept-Language" header to the most
+    preferred of `languages`, `settings.LANGUAGES` by default, or
+    `default`, `settings.LANGUAGE_CODE` by default, if none of them are
+    accepted. "en-us" matches "en" and the other way around.
+    """
+
+    def normalize(value: str) -> str:
+        supported = (
+            [x.lower() for x in languages]
+            if languages is not None
+            else [code.lower() for code, _ in settings.LANGUAGES]
+        )
+        for language, _ in parse_accept_lang_header(value):
+            if language == "*":
+                break
+            if language in supported:
+                return language
+            base = language.split("-")[0]
+            if base in supported:
+                return base
+            for code in supported:
+                if code.split("-")[0] == base:
+                    return code
+        return default if default is not None else settings.LANGUAGE_CODE
+
+    return normalize
+
+
+def accept_encoding(
+    encodings: typing.Iterable[str] = ("gzip",)
+) -> typing.Callable[[str], str]:
+    """
+    Return a normalizer of the "Accept-Encoding" header to the first of
+    `encodings` that's accepted, or "identity". "*" accepts any of
+    them that isn't refused with "q=0".
+    """
+    encodings = list(encodings)
+
+    def normalize(value: str) -> str:
+        accepted = set()
+        refused = set()
+        for each in value.split(","):
+            coding, _, params = each.strip().partition(";")
+            quality = 1.0
+            name, _, q = params.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(q)
+                except ValueError:
+                    pass
+            coding = coding.strip().lower()
+            if quality > 0:
+                accepted.add(coding)
+            else:
+                refused.add(coding)
+        for encoding in encodings:
+            if encoding in accepted:
+                return encoding
+            if "*" in accepted and encoding not in refused:
+                return encoding
+        return "identity"
+
+    return normalize
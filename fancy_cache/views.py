@@ -1,6 +1,8 @@
 from django.shortcuts import render
 from django.conf import settings
+from django.http import Http404, HttpResponse
 
+from fancy_cache import metrics as _metrics
 from fancy_cache.memory import find_urls
 
 
@@ -15,3 +17,13 @@ def home(request):
         ),
     }
     return render(request, "fancy-cache/home.html", data)
+
+
+def metrics(request):
+    for collector in _metrics.collectors:
+        if isinstance(collector, _metrics.InMemoryCollector):
+            return HttpResponse(
+                collector.render(),
+                content_type="text/plain; version=0.0.4; charset=utf-8",
+            )
+    raise Http404("No InMemoryCollector in FANCY_METRICS_COLLECTORS")
@@ -0,0 +1,225 @@
+"""
+Re-request URLs in-process, through Django's own WSGI handler, so that
+`cache_page` puts fresh responses back in the cache before real traffic
+arrives. No network is involved.
+"""
+import io
+import sys
+import time
+import typing
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from urllib.parse import unquote_to_bytes, urlsplit
+from xml.etree import ElementTree
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+from fancy_cache.constants import WARM_ENVIRON_KEY
+from fancy_cache.memory import (
+    _match,
+    _urls_to_regexes,
+    get_remembered_urls,
+    get_url_stats,
+)
+
+__all__ = (
+    "warm_url",
+    "warm_urls",
+    "read_hits_file",
+    "read_urls_file",
+    "sort_urls_by_hits",
+)
+
+_handler = None
+
+
+def _get_handler() -> WSGIHandler:
+    global _handler
+    if _handler is None:
+        _handler = WSGIHandler()
+    return _handler
+
+
+def _default_host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*" and not host.startswith("."):
+            return host
+    return "localhost"
+
+
+def _make_environ(
+    url: str,
+    host: str = None,
+    extra_environ: typing.Dict[str, typing.Any] = None,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Return the WSGI environ of a GET request for `url`, marked as a
+    warm-up so it's not counted as traffic.
+    """
+    parts = urlsplit(url)
+    host = parts.netloc or host or _default_host()
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        # WSGI wants the path un-quoted and latin-1 decoded.
+        "PATH_INFO": unquote_to_bytes(parts.path or "/").decode("iso-8859-1"),
+        "QUERY_STRING": parts.query,
+        "SERVER_NAME": host.split(":")[0],
+        "SERVER_PORT": "443" if parts.scheme == "https" else "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": parts.scheme or "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        WARM_ENVIRON_KEY: True,
+    }
+    if extra_environ:
+        environ.update(extra_environ)
+    return environ
+
+
+def warm_url(
+    url: str,
+    host: str = None,
+    extra_environ: typing.Dict[str, typing.Any] = None,
+) -> typing.Tuple[str, int, float]:
+    """
+    Run a GET request for `url` through the WSGI handler and return
+    a tuple of (url, status code, seconds it took).
+    """
+    environ = _make_environ(url, host, extra_environ)
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+        return lambda data: None
+
+    t0 = time.time()
+    result = _get_handler()(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return url, int(statuses[0].split()[0]), time.time() - t0
+
+
+def warm_urls(
+    urls: typing.Iterable[str],
+    concurrency: int = 1,
+    rate: typing.Optional[float] = None,
+    use_processes: bool = False,
+    host: str = None,
+    extra_environ: typing.Dict[str, typing.Any] = None,
+) -> typing.Generator[typing.Tuple[str, int, float], None, None]:
+    """
+    Request every URL in `urls` using a pool of `concurrency` threads
+    (or processes if `use_processes`). The URLs are started in the order
+    given and if `rate` is set, no more than that many are started
+    per second.
+
+    Yields (url, status code, seconds) tuples in order of completion.
+    """
+    if use_processes:
+        executor = ProcessPoolExecutor(
+            max_workers=concurrency, initializer=django.setup
+        )
+    else:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    with executor:
+        futures = []
+        next_start = time.monotonic()
+        for url in urls:
+            if rate:
+                delay = next_start - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_start = max(next_start, time.monotonic()) + 1.0 / rate
+            futures.append(executor.submit(warm_url, url, host, extra_environ))
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _read_lines(content: bytes) -> typing.List[typing.List[str]]:
+    return [
+        line.split()
+        for line in content.decode("utf-8").splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+
+
+def read_urls_file(path: str) -> typing.List[str]:
+    """
+    Return the URLs listed in `path` which is either a sitemap XML file
+    or a plain text file with one URL per line. Anything after the URL
+    on the line, like the hits from ``fancy-urls --export``, is ignored.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    if content.lstrip().startswith(b"<"):
+        urls = []
+        for element in ElementTree.fromstring(content).iter():
+            # Sitemaps are namespaced so the tag is "{...}loc".
+            if element.tag.split("}")[-1] == "loc" and element.text:
+                parts = urlsplit(element.text.strip())
+                url = parts.path or "/"
+                if parts.query:
+                    url += "?" + parts.query
+                urls.append(url)
+        return urls
+    return [fields[0] for fields in _read_lines(content)]
+
+
+def read_hits_file(path: str) -> typing.Dict[str, int]:
+    """
+    Return {url: hits} of the URLs listed in `path` with their hits, as
+    written by ``fancy-urls --export``.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    if content.lstrip().startswith(b"<"):
+        return {}
+    return {
+        fields[0]: int(fields[1])
+        for fields in _read_lines(content)
+        if len(fields) > 1 and fields[1].isdigit()
+    }
+
+
+def remembered_urls(urls: typing.List[str] = None) -> typing.List[str]:
+    """
+    Return the remembered URLs, optionally only those matching the
+    `find_urls` style patterns in `urls`. Unlike `find_urls` this includes
+    URLs whose cached page has already gone.
+    """
+    regexes = _urls_to_regexes(urls) if urls else []
+    return [url for url in get_remembered_urls() if _match(url, regexes)]
+
+
+def sort_urls_by_hits(
+    urls: typing.Iterable[str], hits: typing.Dict[str, int] = None
+) -> typing.List[str]:
+    """
+    Return `urls` sorted by most recorded cache hits first, or the
+    hits in `hits` ({url: hits}) for the URLs in there. URLs without
+    any recorded stats keep their relative order at the end.
+    """
+    hits = hits or {}
+
+    def get_hits(url):
+        if url in hits:
+            return hits[url]
+        stats = get_url_stats(url)
+        return stats["hits"] if stats else -1
+
+    return sorted(urls, key=get_hits, reverse=True)
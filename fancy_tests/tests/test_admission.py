@@ -0,0 +1,50 @@
+import re
+import unittest
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.test.client import RequestFactory
+
+from fancy_cache import admission
+
+from . import views
+
+
+def random_string(response):
+    return re.findall(r"Random:(\w+)", response.content.decode("utf8"))[0]
+
+
+class TestAdmission(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+        admission._windows.clear()
+
+    def assert_admitted_on_third_miss(self):
+        request = self.factory.get("/anything")
+        first = random_string(views.home12(request))
+        second = random_string(views.home12(request))
+        ok_(first != second)
+        # Other URLs are counted separately.
+        views.home12(self.factory.get("/other"))
+        third = random_string(views.home12(request))
+        ok_(third != second)
+        eq_(random_string(views.home12(request)), third)
+
+    def test_admit_after(self):
+        self.assert_admitted_on_third_miss()
+
+    @mock.patch("fancy_cache.admission.SHARED_ADMISSION", True)
+    def test_admit_after_shared(self):
+        self.assert_admitted_on_third_miss()
+        ok_(not admission._windows)
+
+    def test_admission_window(self):
+        with mock.patch("time.time", return_value=1000):
+            eq_(admission.count_miss("/a", 10, cache), 1)
+            eq_(admission.count_miss("/a", 10, cache), 2)
+        with mock.patch("time.time", return_value=1010):
+            eq_(admission.count_miss("/a", 10, cache), 1)
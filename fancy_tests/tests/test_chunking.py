@@ -0,0 +1,57 @@
+import pickle
+import re
+import unittest
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.test.client import RequestFactory
+
+from fancy_cache.chunking import Manifest, get_chunked, set_chunked
+from fancy_cache.purge import purge_url
+
+from . import views
+
+
+class TestChunking(unittest.TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_set_and_get_chunked(self):
+        ok_(set_chunked(cache, "small", "x", 60, 100))
+        # Stored as it was pickled to measure it
+        eq_(cache.get("small").data, pickle.dumps("x", pickle.HIGHEST_PROTOCOL))
+        eq_(get_chunked(cache, "small", cache.get("small")), "x")
+
+        value = {"data": "x" * 1000}
+        ok_(set_chunked(cache, "big", value, 60, 100))
+        manifest = cache.get("big")
+        ok_(isinstance(manifest, Manifest))
+        eq_(manifest.count, 11)
+        eq_(get_chunked(cache, "big", manifest), value)
+
+        # A new version doesn't touch the chunks of the old one.
+        ok_(set_chunked(cache, "big", {"data": "y" * 1000}, 60, 100))
+        eq_(get_chunked(cache, "big", manifest), value)
+        eq_(get_chunked(cache, "big", cache.get("big"))["data"][0], "y")
+
+        cache.delete(manifest.keys("big")[3])
+        eq_(get_chunked(cache, "big", manifest), None)
+
+    @mock.patch("fancy_cache.middleware.CHUNK_SIZE", 100)
+    def test_chunked_response(self):
+        factory = RequestFactory()
+        first = views.home(factory.get("/anything")).content
+        stored = [pickle.loads(x) for x in cache._cache.values()]
+        ok_(any(isinstance(x, Manifest) for x in stored))
+        second = views.home(factory.get("/anything")).content
+        eq_(first, second)
+        eq_(len(re.findall(rb"Random:\w+", second)), 1)
+
+    @mock.patch("fancy_cache.middleware.CHUNK_SIZE", 100)
+    def test_purge_deletes_chunks(self):
+        factory = RequestFactory()
+        views.home(factory.get("/anything"))
+        ok_([x for x in cache._cache if ".chunk." in x])
+        purge_url("/anything")
+        eq_([x for x in cache._cache if ".chunk." in x], [])
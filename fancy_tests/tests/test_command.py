@@ -3,9 +3,11 @@ import time
 from django.test import TestCase
 from nose.tools import ok_
 from django.core.cache import cache
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from io import StringIO
+from fancy_cache import heavy_hitters
 from fancy_cache.constants import REMEMBERED_URLS_KEY
+from fancy_cache.utils import md5
 
 
 class TestBaseCommand(TestCase):
@@ -41,9 +43,40 @@ class TestBaseCommand(TestCase):
         call_command("fancy-urls", verbosity=3, stdout=out)
         self.assertIn("4 URLs cached", out.getvalue())
 
+    def test_fancyurls_command_with_stats(self):
+        cache.set(md5("/page1.html__hits"), 3)
+        out = StringIO()
+        call_command("fancy-urls", stdout=out)
+        self.assertIn("HITS 3     MISSES 0", out.getvalue())
+
     def test_purge_command(self):
         out = StringIO()
         # Note: first call will show 4 URLs, so call again to confirm deletion
         call_command("fancy-urls", "--purge")
         call_command("fancy-urls", verbosity=3, stdout=out)
         self.assertIn("0 URLs cached", out.getvalue())
+
+    def test_purge_key_prefix_without_generations(self):
+        with self.assertRaises(CommandError):
+            call_command("fancy-urls", "--purge", "--key-prefix", "myprefix")
+        # Nothing was purged
+        out = StringIO()
+        call_command("fancy-urls", verbosity=3, stdout=out)
+        self.assertIn("4 URLs cached", out.getvalue())
+
+    def test_sweep_command(self):
+        self.urls["/page1.html"] = ("key1", int(time.time()) - 1)
+        cache.set(REMEMBERED_URLS_KEY, self.urls, 5)
+        out = StringIO()
+        call_command("fancy-urls", "--sweep", verbosity=3, stdout=out)
+        self.assertIn("1 expired URLs swept", out.getvalue())
+        self.assertNotIn("/page1.html", cache.get(REMEMBERED_URLS_KEY))
+
+    def test_top_command(self):
+        heavy_hitters.record("/page1.html", True, cache)
+        heavy_hitters.record("/page1.html", False, cache)
+        out = StringIO()
+        call_command("fancy-urls", "--top", "5", verbosity=3, stdout=out)
+        self.assertIn("/page1.html", out.getvalue())
+        self.assertIn("MISS RATE 50.0%", out.getvalue())
+        self.assertIn("1 top URLs", out.getvalue())
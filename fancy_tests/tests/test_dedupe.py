@@ -0,0 +1,82 @@
+import pickle
+import time
+import unittest
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.test.client import RequestFactory
+
+from fancy_cache.constants import REFRESH_ENVIRON_KEY
+from fancy_cache.dedupe import BODY_KEY, DedupedResponse
+from fancy_cache.purge import purge_url
+
+from . import views
+
+
+def stored_values():
+    return [pickle.loads(x) for x in cache._cache.values()]
+
+
+class TestDedupe(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_dedupe_content(self):
+        for path in ("/page", "/page/", "/page?utm_source=x"):
+            views.static_deduped(self.factory.get(path))
+        stored = stored_values()
+        eq_(stored.count(b"Static"), 1)
+        deduped = [x for x in stored if isinstance(x, DedupedResponse)]
+        eq_(len(deduped), 3)
+        eq_(deduped[0].response.content, b"")
+
+        response = views.static_deduped(self.factory.get("/page/"))
+        eq_(response.content, b"Static")
+
+        # The body stays until no page refers to it.
+        purge_url("/page")
+        purge_url("/page/")
+        ok_(b"Static" in stored_values())
+        purge_url("/page", "utm_source=x")
+        ok_(b"Static" not in stored_values())
+
+    def test_body_gone(self):
+        views.static_deduped(self.factory.get("/page"))
+        stored = [x for x in stored_values() if isinstance(x, DedupedResponse)]
+        cache.delete("fancy-body:%s" % stored[0].digest)
+        # A miss, so it's stored again
+        eq_(views.static_deduped(self.factory.get("/page")).content, b"Static")
+        ok_(b"Static" in stored_values())
+
+    def test_stored_again(self):
+        views.static_deduped(self.factory.get("/page"))
+        views.static_deduped(
+            self.factory.get("/page", **{REFRESH_ENVIRON_KEY: True})
+        )
+        purge_url("/page")
+        ok_(b"Static" not in stored_values())
+
+    def test_content_changed(self):
+        views.changing_deduped(self.factory.get("/page", HTTP_X_BODY="One"))
+        views.changing_deduped(
+            self.factory.get(
+                "/page", HTTP_X_BODY="Two", **{REFRESH_ENVIRON_KEY: True}
+            )
+        )
+        stored = stored_values()
+        ok_(b"One" not in stored)
+        ok_(b"Two" in stored)
+        eq_(views.changing_deduped(self.factory.get("/page")).content, b"Two")
+
+    def test_kept_for_the_longest_timeout(self):
+        views.static_deduped(self.factory.get("/page"))
+        views.static_deduped_briefly(self.factory.get("/brief"))
+        (digest,) = {
+            x.digest for x in stored_values() if isinstance(x, DedupedResponse)
+        }
+        with mock.patch("time.time", return_value=time.time() + 30):
+            ok_(cache.get(BODY_KEY % digest) is not None)
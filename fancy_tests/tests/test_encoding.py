@@ -0,0 +1,71 @@
+import json
+import pickle
+import time
+import unittest
+import zlib
+
+from nose.tools import eq_, ok_
+
+from fancy_cache import encoding
+from fancy_cache.utils import decode_remembered_urls, encode_remembered_urls
+
+
+def make_urls(n):
+    expiration_time = int(time.time()) + 60
+    return {
+        "/page/%s.html?q=%s"
+        % (i, i % 7): (
+            "views.decorators.cache.cache_page.prefix.GET."
+            "%032x.d41d8cd98f00b204e9800998ecf8427e.en-us.UTC" % i,
+            expiration_time + i,
+        )
+        for i in range(n)
+    }
+
+
+class TestEncoding(unittest.TestCase):
+    def test_encode_decode(self):
+        urls = make_urls(100)
+        urls["/ünicode/€"] = ("key.with.Ünicode", 0)
+        urls[""] = ("", 1)
+        urls["/paged/1"] = ("key1", 2, "pages")
+        urls["/paged/2"] = ("key2", 3, "pages")
+        urls["/other"] = ("key3", 4, "other")
+        data = encoding.encode(urls)
+        ok_(encoding.is_compact(data))
+        eq_(encoding.decode(data), urls)
+        ok_(len(data) < len(pickle.dumps(urls, pickle.HIGHEST_PROTOCOL)) / 2)
+
+        eq_(encoding.decode(encoding.encode({})), {})
+
+    def test_append(self):
+        urls = make_urls(10)
+        data = encoding.encode(urls)
+        ok_(encoding.can_append(data))
+        data = encoding.append(data, "/new", "new-key", 123)
+        data = encoding.append(data, "/page/1.html?q=1", "replaced", 456)
+        data = encoding.append(data, "/paged", "paged-key", 789, "pages")
+        decoded = encoding.decode(data)
+        eq_(len(decoded), 12)
+        eq_(decoded["/new"], ("new-key", 123))
+        eq_(decoded["/page/1.html?q=1"], ("replaced", 456))
+        eq_(decoded["/paged"], ("paged-key", 789, "pages"))
+
+        # The tail can't grow forever
+        for i in range(1000):
+            if not encoding.can_append(data):
+                break
+            data = encoding.append(data, "/new/%s" % i, "key", 123)
+        ok_(not encoding.can_append(data))
+        ok_(not encoding.can_append({}))
+
+    def test_decode_remembered_urls(self):
+        urls = make_urls(3)
+        eq_(decode_remembered_urls(urls), urls)
+        compressed = encode_remembered_urls(urls, compress=True)
+        eq_(compressed, zlib.compress(json.dumps(urls).encode()))
+        # Tuples, not the lists JSON would make.
+        eq_(decode_remembered_urls(compressed), urls)
+        compact = encode_remembered_urls(urls, compress=True, compact=True)
+        ok_(encoding.is_compact(compact))
+        eq_(decode_remembered_urls(compact), urls)
@@ -0,0 +1,192 @@
+import unittest
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test.client import RequestFactory
+
+from fancy_cache.fragments import cache_fragment, cache_fragments
+from fancy_cache.memory import find_urls
+
+TEMPLATE = Template(
+    "{% load fancy_cache %}"
+    "{% fancy_cache 60 sidebar only_get_keys='page' %}"
+    "{{ counter.sidebar }}"
+    "{% endfancy_cache %}|"
+    "{{ counter.personal }}|"
+    "{% fancy_cache 60 footer user only_get_keys='page' %}"
+    "{{ counter.footer }}"
+    "{% endfancy_cache %}"
+)
+
+
+class Counter(object):
+    def __init__(self):
+        self.counts = {}
+
+    def __getitem__(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        return "%s%s" % (name, self.counts[name])
+
+    def render(self, name):
+        return lambda: self[name]
+
+
+class TestFragments(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.counter = Counter()
+
+    def tearDown(self):
+        cache.clear()
+
+    def render(self, request, counter=None, user="peter"):
+        context = Context(
+            {
+                "request": request,
+                "counter": counter or self.counter,
+                "user": user,
+            }
+        )
+        return TEMPLATE.render(context)
+
+    def test_cache_fragments(self):
+        fragments = {
+            "sidebar": self.counter.render("sidebar"),
+            "footer": self.counter.render("footer"),
+        }
+        request = self.factory.get("/page")
+        result = cache_fragments(request, fragments, 60)
+        eq_(result, {"sidebar": "sidebar1", "footer": "footer1"})
+
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as m:
+            result = cache_fragments(self.factory.get("/page"), fragments, 60)
+        eq_(result, {"sidebar": "sidebar1", "footer": "footer1"})
+        eq_(m.call_count, 1)
+
+        # Per URL and what they vary on
+        result = cache_fragments(self.factory.get("/other"), fragments, 60)
+        eq_(result, {"sidebar": "sidebar2", "footer": "footer2"})
+        result = cache_fragments(
+            self.factory.get("/page"), fragments, 60, vary_on=["peter"]
+        )
+        eq_(result, {"sidebar": "sidebar3", "footer": "footer3"})
+
+    def test_only_get_keys(self):
+        render = self.counter.render("sidebar")
+        for path in ("/page?page=1&junk=x", "/page?page=1&junk=y"):
+            content = cache_fragment(
+                self.factory.get(path),
+                "sidebar",
+                render,
+                60,
+                only_get_keys=["page"],
+            )
+            eq_(content, "sidebar1")
+        content = cache_fragment(
+            self.factory.get("/page?page=2"),
+            "sidebar",
+            render,
+            60,
+            only_get_keys=["page"],
+        )
+        eq_(content, "sidebar2")
+
+    def test_key_prefix_callable(self):
+        render = self.counter.render("sidebar")
+        for i in range(2):
+            content = cache_fragment(
+                self.factory.get("/page"),
+                "sidebar",
+                render,
+                60,
+                key_prefix=lambda request: None,
+            )
+        eq_(content, "sidebar2")
+
+        # Not cached for other methods either
+        cache_fragment(self.factory.post("/page"), "sidebar", render, 60)
+        content = cache_fragment(
+            self.factory.post("/page"), "sidebar", render, 60
+        )
+        eq_(content, "sidebar4")
+
+    def test_remember_and_purge(self):
+        render = self.counter.render("sidebar")
+        for i in range(3):
+            cache_fragment(
+                self.factory.get("/page"),
+                "sidebar",
+                render,
+                60,
+                remember_all_urls=True,
+                remember_stats_all_urls=True,
+            )
+        found = list(find_urls(["/page*"]))
+        eq_(len(found), 1)
+        url, _, stats = found[0]
+        eq_(url, "/page#sidebar")
+        eq_(stats, {"hits": 2, "misses": 1})
+
+        list(find_urls(["/page*"], purge=True))
+        content = cache_fragment(
+            self.factory.get("/page"), "sidebar", render, 60
+        )
+        eq_(content, "sidebar2")
+
+    def test_purge_every_variant(self):
+        render = self.counter.render("sidebar")
+        for user in ("peter", "anna"):
+            cache_fragment(
+                self.factory.get("/page"),
+                "sidebar",
+                render,
+                60,
+                vary_on=[user],
+                remember_all_urls=True,
+            )
+        found = sorted(x[0] for x in find_urls(["/page*"]))
+        eq_(len(found), 2)
+        ok_(all(x.startswith("/page#sidebar:") for x in found))
+
+        list(find_urls(["/page*"], purge=True))
+        contents = [
+            cache_fragment(
+                self.factory.get("/page"),
+                "sidebar",
+                render,
+                60,
+                vary_on=[user],
+            )
+            for user in ("peter", "anna")
+        ]
+        # Both rendered again
+        eq_(contents, ["sidebar3", "sidebar4"])
+
+    def test_template_tag(self):
+        eq_(
+            self.render(self.factory.get("/page?page=1")),
+            "sidebar1|personal1|footer1",
+        )
+
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as m:
+            content = self.render(self.factory.get("/page?page=1&junk=x"))
+        eq_(content, "sidebar1|personal2|footer1")
+        eq_(m.call_count, 1)
+
+        content = self.render(
+            self.factory.get("/page?page=1&junk=y"), user="ashley"
+        )
+        eq_(content, "sidebar1|personal3|footer2")
+
+    def test_template_tag_without_request(self):
+        content = TEMPLATE.render(
+            Context({"counter": self.counter, "user": "peter"})
+        )
+        eq_(content, "sidebar1|personal1|footer1")
+        content = TEMPLATE.render(
+            Context({"counter": self.counter, "user": "peter"})
+        )
+        eq_(content, "sidebar2|personal2|footer2")
+        ok_(not cache._cache)
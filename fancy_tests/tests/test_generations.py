@@ -0,0 +1,79 @@
+import importlib
+import re
+import time
+import unittest
+from io import StringIO
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.client import RequestFactory
+
+from fancy_cache.constants import GENERATION_KEY
+from fancy_cache.memory import find_urls, purge_all
+
+from . import views
+
+
+def random_string(response):
+    return re.findall(r"Random:(\w+)", response.content.decode("utf8"))[0]
+
+
+@mock.patch("fancy_cache.middleware.USE_GENERATIONS", True)
+class TestGenerations(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def get(self):
+        # A new request every time because the generations are looked
+        # up once per request.
+        return self.factory.get("/anything")
+
+    def test_purge_all(self):
+        first = random_string(views.home(self.get()))
+        eq_(random_string(views.home(self.get())), first)
+        purge_all()
+        second = random_string(views.home(self.get()))
+        ok_(second != first)
+        eq_(random_string(views.home(self.get())), second)
+
+    def test_purge_all_key_prefix(self):
+        home = random_string(views.home(self.factory.get("/")))
+        home2 = random_string(views.home2(self.factory.get("/")))
+        purge_all("a_key")
+        eq_(random_string(views.home(self.factory.get("/"))), home)
+        ok_(random_string(views.home2(self.factory.get("/"))) != home2)
+
+    def test_purge_all_forgets_urls(self):
+        views.home6(self.factory.get("/a"))
+        views.home15(self.factory.get("/b"))
+        eq_(sorted(url for url, _, _ in find_urls()), ["/a", "/b"])
+        purge_all("a_key")
+        eq_([url for url, _, _ in find_urls()], ["/a"])
+        views.home15(self.factory.get("/b"))
+        purge_all()
+        eq_(list(find_urls()), [])
+        out = StringIO()
+        call_command("fancy-urls", stdout=out)
+        eq_(out.getvalue(), "")
+
+    def test_evicted_generation(self):
+        first = random_string(views.home(self.get()))
+        time.sleep(0.01)
+        cache.delete(GENERATION_KEY)
+        ok_(random_string(views.home(self.get())) != first)
+
+    def test_purge_command(self):
+        command = importlib.import_module(
+            "fancy_cache.management.commands.fancy-urls"
+        )
+        first = random_string(views.home(self.get()))
+        with mock.patch.object(command, "USE_GENERATIONS", True):
+            out = StringIO()
+            call_command("fancy-urls", "--purge", verbosity=2, stdout=out)
+        eq_(out.getvalue(), "-- all cached URLs purged --\n")
+        ok_(random_string(views.home(self.get())) != first)
@@ -6,10 +6,19 @@ import zlib
 
 from nose.tools import eq_, ok_
 from django.core.cache import cache, caches
+from django.test.client import RequestFactory
 from unittest import mock
 
-from fancy_cache.constants import REMEMBERED_URLS_KEY
-from fancy_cache.memory import find_urls
+from fancy_cache import encoding
+from fancy_cache.constants import LONG_TIME, REMEMBERED_URLS_KEY
+from fancy_cache.memory import (
+    find_urls,
+    get_url_stats,
+    sweep_remembered_urls,
+)
+from fancy_cache.middleware import FancyCacheMiddleware
+
+from . import views
 
 
 class TestMemory(unittest.TestCase):
@@ -74,6 +83,49 @@ class TestMemory(unittest.TestCase):
         found = list(find_urls([]))
         eq_(len(found), 0)
 
+    @mock.patch("fancy_cache.memory.COMPACT_REMEMBERED_URLS", True)
+    def test_find_and_purge_one_url_compact(self):
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        cache.set(REMEMBERED_URLS_KEY, encoding.encode(remembered_urls), 5)
+        found = list(find_urls(["/page1.html"], purge=True))
+        eq_(found, [("/page1.html", "key1", None)])
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        ok_(encoding.is_compact(remembered_urls))
+        eq_(len(encoding.decode(remembered_urls)), 3)
+        eq_(len(list(find_urls([]))), 3)
+
+    def test_sweep_on_remember_url(self):
+        cache.set(REMEMBERED_URLS_KEY, self.urls, LONG_TIME)
+        middleware = FancyCacheMiddleware(lambda r: None, cache_alias=None)
+        now = time.time()
+        for i in range(3):
+            with mock.patch("time.time", return_value=now + 120 * i):
+                middleware.remember_url(
+                    RequestFactory().get("/new%s.html" % i), "k", 30
+                )
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        # The expired ones, by looking at all of them the first time and
+        # by the minute they expire after that.
+        eq_(list(remembered_urls), ["/new2.html"])
+        eq_(sweep_remembered_urls(), 0)
+
+    @mock.patch("fancy_cache.middleware.DEFER_REMEMBERED_URLS_SWEEP", True)
+    def test_sweep_remembered_urls(self):
+        self.urls["/page1.html"] = ("key1", int(time.time()) - 1)
+        cache.set(REMEMBERED_URLS_KEY, self.urls, 5)
+        request = RequestFactory().get("/new.html")
+        middleware = FancyCacheMiddleware(lambda r: None, cache_alias=None)
+        middleware.remember_url(request, "key5", 5)
+        eq_(len(cache.get(REMEMBERED_URLS_KEY)), 5)
+        # Stored as a plain dict, like it always has been
+        eq_(type(cache.get(REMEMBERED_URLS_KEY)), dict)
+
+        eq_(sweep_remembered_urls(), 1)
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        eq_(len(remembered_urls), 4)
+        ok_("/page1.html" not in remembered_urls)
+        eq_(sweep_remembered_urls(), 0)
+
     def test_find_one_url(self):
         found = list(find_urls(["/page1.html"]))
         eq_(len(found), 1)
@@ -124,6 +176,68 @@ class TestMemory(unittest.TestCase):
         ok_(("/page3.html?foo=else", "key4", None) in found)
 
 
+@mock.patch("fancy_cache.middleware.INDEX_CACHE_ALIAS", "default")
+class TestIndexCacheAlias(unittest.TestCase):
+    def setUp(self):
+        self.pages = caches["pages_backend"]
+
+    def tearDown(self):
+        cache.clear()
+        self.pages.clear()
+
+    def test_remember_and_purge_url(self):
+        middleware = FancyCacheMiddleware(
+            lambda r: None,
+            cache_alias="pages_backend",
+            remember_stats_all_urls=True,
+        )
+        request = RequestFactory().get("/page1.html")
+        eq_(middleware.process_request(request), None)
+        self.pages.set("key1", "page")
+        middleware.remember_url(request, "key1", 60)
+
+        # The pages in one cache, the URLs and stats in the other.
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        eq_(remembered_urls["/page1.html"][::2], ("key1", "pages_backend"))
+        ok_(self.pages.get(REMEMBERED_URLS_KEY) is None)
+        eq_(get_url_stats("/page1.html"), {"hits": 0, "misses": 1})
+
+        found = list(find_urls(["/page1.html"], purge=True))
+        eq_(found, [("/page1.html", "key1", {"hits": 0, "misses": 1})])
+        ok_(self.pages.get("key1") is None)
+        eq_(len(cache.get(REMEMBERED_URLS_KEY)), 0)
+        # The stats go with the URL
+        eq_(get_url_stats("/page1.html"), None)
+
+    def test_same_cache_alias(self):
+        middleware = FancyCacheMiddleware(lambda r: None, cache_alias=None)
+        middleware.remember_url(RequestFactory().get("/page1.html"), "k", 60)
+        eq_(len(cache.get(REMEMBERED_URLS_KEY)["/page1.html"]), 2)
+
+
+class TestDefaultIndexCache(unittest.TestCase):
+    def tearDown(self):
+        cache.clear()
+        caches["pages_backend"].clear()
+
+    def test_other_cache_alias(self):
+        # Without FANCY_INDEX_CACHE_ALIAS the URLs are remembered in the
+        # default cache too.
+        pages = caches["pages_backend"]
+        response = views.home_pages(RequestFactory().get("/page1.html"))
+        ok_(pages.get(REMEMBERED_URLS_KEY) is None)
+
+        found = list(find_urls(["/page1.html"]))
+        eq_(len(found), 1)
+        cache_key = found[0][1]
+        ok_(pages.get(cache_key) is not None)
+
+        list(find_urls(["/page1.html"], purge=True))
+        ok_(pages.get(cache_key) is None)
+        response2 = views.home_pages(RequestFactory().get("/page1.html"))
+        ok_(response2.content != response.content)
+
+
 class TestMemoryWithMemcached(unittest.TestCase):
     def setUp(self):
         expiration_time = int(time.time()) + 5
@@ -0,0 +1,106 @@
+import pickle
+import unittest
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.test.client import RequestFactory
+
+from fancy_cache import metrics
+from fancy_cache.views import metrics as metrics_view
+
+from . import views
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.collector = metrics.InMemoryCollector()
+        patcher = mock.patch.object(metrics, "collectors", [self.collector])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_render(self):
+        self.collector.incr("things_total", {"view": 'a"b'})
+        self.collector.observe("took_seconds", {}, 0.0003)
+        self.collector.observe("took_seconds", {}, 10)
+        text = self.collector.render()
+        ok_('things_total{view="a\\"b"} 1\n' in text)
+        ok_("# TYPE took_seconds histogram\n" in text)
+        ok_('took_seconds_bucket{le="0.00025"} 0\n' in text)
+        ok_('took_seconds_bucket{le="0.0005"} 1\n' in text)
+        ok_('took_seconds_bucket{le="1.0"} 1\n' in text)
+        ok_('took_seconds_bucket{le="+Inf"} 2\n' in text)
+        ok_("took_seconds_count 2\n" in text)
+
+    def test_middleware_metrics(self):
+        request = self.factory.get("/anything")
+        views.home(request)
+        views.home(request)
+        views.home(self.factory.post("/anything"))
+        views.home6(self.factory.get("/remembered"))
+
+        view = "fancy_tests.tests.views.home"
+        counters = self.collector.counters
+        key = (
+            "fancy_cache_requests_total",
+            (("result", "hit"), ("view", view)),
+        )
+        eq_(counters[key], 1)
+        key = (
+            "fancy_cache_requests_total",
+            (("result", "miss"), ("view", view)),
+        )
+        eq_(counters[key], 1)
+        key = (
+            "fancy_cache_requests_total",
+            (("result", "bypass"), ("view", view)),
+        )
+        eq_(counters[key], 1)
+
+        histograms = self.collector.histograms
+        eq_(histograms[("fancy_cache_lookup_seconds", (("view", view),))][2], 2)
+        eq_(histograms[("fancy_cache_store_seconds", (("view", view),))][2], 1)
+        _, size, count = histograms[
+            ("fancy_cache_entry_bytes", (("view", view),))
+        ]
+        eq_(count, 1)
+        ok_(size > 0)
+        key = (
+            "fancy_cache_index_update_seconds",
+            (("view", "fancy_tests.tests.views.home6"),),
+        )
+        eq_(histograms[key][2], 1)
+
+    def test_stored_as_without_metrics(self):
+        views.home(self.factory.get("/anything"))
+        (value,) = [
+            x
+            for x in (pickle.loads(y) for y in cache._cache.values())
+            if isinstance(x, HttpResponse)
+        ]
+        ((_, size, _),) = [
+            v
+            for k, v in self.collector.histograms.items()
+            if k[0] == "fancy_cache_entry_bytes"
+        ]
+        eq_(size, len(value.content))
+
+    def test_metrics_view(self):
+        views.home(self.factory.get("/anything"))
+        response = metrics_view(self.factory.get("/metrics"))
+        eq_(response.status_code, 200)
+        ok_(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        ok_(
+            b'fancy_cache_requests_total{result="miss",'
+            b'view="fancy_tests.tests.views.home"} 1' in response.content
+        )
+
+        with mock.patch.object(metrics, "collectors", []):
+            self.assertRaises(
+                Http404, metrics_view, self.factory.get("/metrics")
+            )
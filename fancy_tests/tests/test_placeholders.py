@@ -0,0 +1,64 @@
+import unittest
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+
+from fancy_cache.placeholders import punch, resolve
+
+from . import views
+
+
+class TestPlaceholders(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_punch_and_resolve(self):
+        response = HttpResponse("<b>{{a}}</b>{{ab}}{{a}}")
+        punched = punch(response, ["{{a}}", "{{ab}}"])
+        eq_(punched.parts, [b"<b>", b"</b>", b"", b""])
+        eq_(punched.markers, ["{{a}}", "{{ab}}", "{{a}}"])
+        eq_(punched.response.content, b"")
+        # The original is left alone
+        eq_(response.content, b"<b>{{a}}</b>{{ab}}{{a}}")
+
+        request = self.factory.get("/")
+        placeholders = {"{{a}}": lambda request: "å"}
+        response = resolve(punched, request, placeholders)
+        # Not a placeholder any more, so left as it is
+        eq_(response.content, "<b>å</b>{{ab}}å".encode("utf-8"))
+
+        eq_(resolve(response, request, placeholders), response)
+
+    def test_view(self):
+        request = self.factory.get("/page?user=peter")
+        response = views.personalized(request)
+        eq_(response.status_code, 200)
+        content = response.content.decode()
+        ok_("<p>Hi peter!</p>" in content)
+        ok_("<p>Bye peter</p>" in content)
+        random_string = content.split("<p>")[2]
+
+        stored = [x for x in cache._cache.values() if b"PunchedResponse" in x]
+        eq_(len(stored), 1)
+
+        request = self.factory.get("/page?user=ashley")
+        response = views.personalized(request)
+        content = response.content.decode()
+        ok_("<p>Hi ashley!</p>" in content)
+        ok_("<p>Bye ashley</p>" in content)
+        eq_(content.split("<p>")[2], random_string)
+        eq_(len(response._container), 5)
+
+        response = views.personalized(self.factory.get("/page"))
+        ok_("<p>Hi anonymous!</p>" in response.content.decode())
+
+    def test_not_cached(self):
+        request = self.factory.post("/page?user=peter")
+        response = views.personalized(request)
+        ok_("<p>Hi peter!</p>" in response.content.decode())
+        ok_(not cache._cache)
@@ -0,0 +1,72 @@
+import re
+import unittest
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.test.client import RequestFactory
+
+from fancy_cache.purge import purge_url, purge_urls
+
+from . import views
+
+
+def random_string(response):
+    return re.findall(r"Random:(\w+)", response.content.decode("utf8"))[0]
+
+
+class TestPurge(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_purge_url(self):
+        request = self.factory.get("/anything")
+        first = random_string(views.home(request))
+        eq_(random_string(views.home(request)), first)
+
+        eq_(purge_url("/other"), [])
+        eq_(random_string(views.home(request)), first)
+        purged = purge_url("/anything", headers={"Host": "testserver"})
+        # Only the GET response was cached.
+        eq_([x.split(".")[5] for x in purged], ["GET"])
+        eq_(purge_url("/anything", headers={"Host": "testserver"}), [])
+        ok_(random_string(views.home(request)) != first)
+
+    def test_purge_url_view_options(self):
+        request = self.factory.get("/anything?foo=1&other=junk")
+        first = random_string(views.home5(request))
+        eq_(random_string(views.home5(request)), first)
+
+        # Without the same `only_get_keys` it's a different key.
+        eq_(purge_url("/anything", {"foo": "1", "other": "x"}), [])
+        eq_(random_string(views.home5(request)), first)
+        purged = purge_url(
+            "/anything",
+            {"foo": "1", "other": "x"},
+            view_options={"only_get_keys": ["foo", "bar"]},
+        )
+        eq_(len(purged), 1)
+        ok_(random_string(views.home5(request)) != first)
+
+    def test_purge_url_key_prefix(self):
+        request = self.factory.get("/anything")
+        first = random_string(views.home2(request))
+        eq_(purge_url("/anything"), [])
+        eq_(len(purge_url("/anything", key_prefix="a_key")), 1)
+        ok_(random_string(views.home2(request)) != first)
+        # A callable key prefix is called with the made up request.
+        views.home2(request)
+        purged = purge_url(
+            "/anything", view_options={"key_prefix": views.prefixer1}
+        )
+        eq_(len(purged), 1)
+
+    def test_purge_urls(self):
+        first = random_string(views.home(self.factory.get("/a")))
+        second = random_string(views.home(self.factory.get("/b?c=d")))
+        # "/e" isn't cached.
+        eq_(len(purge_urls(["/a", "/b?c=d", "/e"])), 2)
+        ok_(random_string(views.home(self.factory.get("/a"))) != first)
+        ok_(random_string(views.home(self.factory.get("/b?c=d"))) != second)
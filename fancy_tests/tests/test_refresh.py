@@ -0,0 +1,74 @@
+import time
+import unittest
+from io import StringIO
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.client import RequestFactory
+
+from fancy_cache.constants import REFRESH_ENVIRON_KEY, REMEMBERED_URLS_KEY
+from fancy_cache.memory import find_urls
+from fancy_cache.refresh import RefreshAheadScheduler
+from fancy_cache.warming import warm_url
+
+from . import views
+
+
+class TestRefresh(unittest.TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def get(self, url):
+        return views.home6(RequestFactory().get(url))
+
+    def _expire_soon(self, url, seconds):
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        cache_key, _ = remembered_urls[url]
+        remembered_urls[url] = (cache_key, int(time.time()) + seconds)
+        cache.set(REMEMBERED_URLS_KEY, remembered_urls)
+
+    def test_refresh_environ_skips_cache_lookup(self):
+        self.get("/remembered")
+        self.get("/remembered")
+        warm_url("/remembered", extra_environ={REFRESH_ENVIRON_KEY: True})
+        ((url, cache_key, stats),) = find_urls([])
+        # The refresh is neither counted as a hit nor a miss
+        eq_(stats, {"hits": 1, "misses": 1})
+
+    def test_due_urls(self):
+        self.get("/remembered?hot=1")
+        self.get("/remembered?hot=1")
+        self.get("/remembered?cold=1")
+        self.get("/remembered?later=1")
+        self.get("/remembered?later=1")
+        self._expire_soon("/remembered?hot=1", 10)
+        self._expire_soon("/remembered?cold=1", 10)
+
+        scheduler = RefreshAheadScheduler(lead_time=30)
+        eq_(scheduler.due_urls(), ["/remembered?hot=1"])
+        # No new hits since last time, so it's no longer hot
+        eq_(scheduler.due_urls(), [])
+
+    def test_run(self):
+        self.get("/remembered")
+        self.get("/remembered")
+        self._expire_soon("/remembered", 10)
+        ((url, cache_key, stats),) = find_urls([])
+        content_before = cache.get(cache_key).content
+
+        scheduler = RefreshAheadScheduler(lead_time=30)
+        ((url, status_code, seconds),) = scheduler.run()
+        eq_(url, "/remembered")
+        eq_(status_code, 200)
+        ok_(cache.get(cache_key).content != content_before)
+        _, expiration_time = cache.get(REMEMBERED_URLS_KEY)["/remembered"]
+        ok_(expiration_time > int(time.time()) + 30)
+
+    def test_refresh_command(self):
+        self.get("/remembered")
+        self.get("/remembered")
+        self._expire_soon("/remembered", 10)
+        out = StringIO()
+        call_command("fancy-refresh", "--once", verbosity=3, stdout=out)
+        ok_("1 URLs refreshed" in out.getvalue())
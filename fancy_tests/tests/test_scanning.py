@@ -0,0 +1,100 @@
+import unittest
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test.client import RequestFactory
+from io import StringIO
+
+from fancy_cache.purge import purge_url
+from fancy_cache.scanning import scan_urls
+
+from . import views
+
+try:
+    import fakeredis
+    from django.core.cache.backends.redis import RedisCache
+except ImportError:
+    fakeredis = None
+
+
+class TestScanning(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_scan_urls(self):
+        for path in ("/page1.html?page=1&junk=1", "/page2.html", "/other"):
+            views.home11(self.factory.get(path))
+        # Not in the keys
+        views.home(self.factory.get("/page3.html"))
+
+        found = scan_urls()
+        eq_(
+            [url for url, _ in found],
+            ["/other", "/page1.html?page=1", "/page2.html"],
+        )
+        eq_(len(found[0][1]), 1)
+        ok_(".cache_page.#/other#.GET." in found[0][1][0])
+        eq_(len(scan_urls(["/page*"])), 2)
+        eq_(scan_urls(["/page2.html", "/other"])[0][0], "/other")
+        eq_(scan_urls(["/page"]), [])
+
+        eq_(len(scan_urls(["/page*"], purge=True)), 2)
+        eq_([url for url, _ in scan_urls()], ["/other"])
+        ok_(cache.get(found[1][1][0]) is None)
+
+    def test_purge_url(self):
+        views.home11(self.factory.get("/page.html"))
+        purged = purge_url(
+            "/page.html", view_options={"path_in_cache_key": True}
+        )
+        eq_(len(purged), 1)
+        eq_(scan_urls(), [])
+
+    def test_fancyurls_command(self):
+        views.home11(self.factory.get("/page.html"))
+        out = StringIO()
+        call_command("fancy-urls", "--scan", "/page*", stdout=out)
+        eq_(out.getvalue(), "/page.html\n")
+        call_command("fancy-urls", "--scan", "--purge", stdout=StringIO())
+        eq_(scan_urls(), [])
+
+    def test_unsupported_cache(self):
+        self.assertRaises(
+            ImproperlyConfigured, scan_urls, cache_alias="dummy_backend"
+        )
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is required")
+class TestScanningRedis(unittest.TestCase):
+    def setUp(self):
+        self.cache = RedisCache(
+            "redis://fakeredis",
+            {"OPTIONS": {"connection_class": fakeredis.FakeConnection}},
+        )
+        patcher = mock.patch(
+            "fancy_cache.scanning.caches", {"default": self.cache}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_scan_urls(self):
+        key = "views.decorators.cache.cache_page.prefix#%s#.GET.abc.def"
+        for url in ("/page1.html", "/page[2].html?q=*", "/other"):
+            self.cache.set(key % url, "page")
+        self.cache.set("views.decorators.cache.cache_page..GET.abc", "page")
+
+        eq_(len(scan_urls()), 3)
+        eq_([url for url, _ in scan_urls(["/page[2]*"])], ["/page[2].html?q=*"])
+        eq_(len(scan_urls(["/page*"], purge=True)), 2)
+        eq_([url for url, _ in scan_urls()], ["/other"])
+        ok_(self.cache.get(key % "/other"))
+        ok_(self.cache.get(key % "/page1.html") is None)
@@ -0,0 +1,50 @@
+import pickle
+import unittest
+
+from nose.tools import eq_, ok_
+
+from fancy_cache.sketch import CountMinSketch, HeavyHitters, SpaceSaving
+
+
+class TestSketch(unittest.TestCase):
+    def test_count_min_sketch(self):
+        sketch = CountMinSketch(width=64, depth=4)
+        for i in range(1000):
+            sketch.add("/page%s.html" % (i % 100))
+        sketch.add("/hot.html", 500)
+        ok_(sketch.estimate("/hot.html") >= 500)
+        ok_(sketch.estimate("/page1.html") >= 10)
+
+        other = CountMinSketch(width=64, depth=4)
+        other.add("/hot.html", 10)
+        sketch.merge(other)
+        ok_(sketch.estimate("/hot.html") >= 510)
+
+    def test_space_saving(self):
+        summary = SpaceSaving(k=3)
+        for url, count in (("/a", 10), ("/b", 5), ("/c", 3), ("/d", 1)):
+            summary.add(url, count)
+        eq_(len(summary.counters), 3)
+        eq_([x[0] for x in summary.top(2)], ["/a", "/b"])
+
+        other = SpaceSaving(k=3)
+        other.add("/b", 20)
+        other.add("/e", 1)
+        summary.merge(other)
+        eq_(len(summary.counters), 3)
+        eq_(summary.top(1), [("/b", 25, 0)])
+
+    def test_heavy_hitters(self):
+        hitters = HeavyHitters(k=10)
+        for i in range(10000):
+            # A long tail of distinct URLs
+            hitters.add("/search?q=%s" % i, hit=False)
+            if i % 2:
+                hitters.add("/popular", hit=i % 4 == 1)
+        eq_(len(hitters.requests.counters), 10)
+        url, requests, misses = hitters.top(1)[0]
+        eq_(url, "/popular")
+        ok_(requests >= 5000)
+        ok_(2500 <= misses <= requests)
+        # Can be stored in the cache
+        eq_(pickle.loads(pickle.dumps(hitters)).top(1)[0][0], "/popular")
@@ -0,0 +1,225 @@
+import time
+import unittest
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache, caches
+from django.core.signals import request_started
+from django.test import TestCase
+from django.test.client import RequestFactory
+from nose.tools import eq_, ok_
+
+from fancy_cache.memory import (
+    find_urls,
+    get_remembered_urls,
+    sweep_remembered_urls,
+)
+from fancy_cache.fragments import cache_fragment
+from fancy_cache.middleware import FancyCacheMiddleware
+from fancy_cache.models import RememberedURL
+from fancy_cache.storage import DatabaseStorage, RedisStorage
+
+try:
+    import fakeredis
+    import lupa  # NOQA (needed by fakeredis for Lua scripts)
+    from django.core.cache.backends.redis import RedisCache
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipUnless(fakeredis, "fakeredis and lupa are required")
+@mock.patch(
+    "fancy_cache.storage.REMEMBERED_URLS_STORAGE",
+    "fancy_cache.storage.RedisStorage",
+)
+class TestRedisStorage(unittest.TestCase):
+    def setUp(self):
+        self.cache = RedisCache(
+            "redis://fakeredis",
+            {"OPTIONS": {"connection_class": fakeredis.FakeConnection}},
+        )
+        self.cache.clear()
+        for patcher in (
+            mock.patch("fancy_cache.memory.cache", self.cache),
+            mock.patch.object(
+                FancyCacheMiddleware,
+                "index_cache",
+                new_callable=mock.PropertyMock,
+                return_value=self.cache,
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def remember(self, path, cache_key, timeout=60):
+        middleware = FancyCacheMiddleware(lambda r: None, cache_alias=None)
+        request = RequestFactory().get(path)
+        middleware.remember_url(request, cache_key, timeout)
+
+    def test_remember_and_find_urls(self):
+        for i, path in enumerate(
+            ("/page1.html", "/page2.html", "/list?tag[]=a")
+        ):
+            self.cache.set("key%s" % i, "page")
+            self.remember(path, "key%s" % i)
+
+        remembered_urls = get_remembered_urls()
+        eq_(len(remembered_urls), 3)
+        eq_(remembered_urls["/page1.html"][0], "key0")
+        ok_(remembered_urls["/page1.html"][1] > time.time())
+
+        eq_(
+            sorted(x[0] for x in find_urls(["/page*"])),
+            ["/page1.html", "/page2.html"],
+        )
+        eq_([x[0] for x in find_urls(["/list?tag[]=a"])], ["/list?tag[]=a"])
+        eq_([x[0] for x in find_urls(["/list?tag[]=*"])], ["/list?tag[]=a"])
+        eq_(len(list(find_urls())), 3)
+
+        eq_(len(list(find_urls(["/page1.html"], purge=True))), 1)
+        ok_(self.cache.get("key0") is None)
+        eq_(sorted(get_remembered_urls()), ["/list?tag[]=a", "/page2.html"])
+
+    def test_sweep(self):
+        self.remember("/expired.html", "key1", timeout=-1)
+        self.remember("/page.html", "key2")
+        # The sweep that happened when /page.html was remembered
+        eq_(list(get_remembered_urls()), ["/page.html"])
+
+        with mock.patch(
+            "fancy_cache.storage.DEFER_REMEMBERED_URLS_SWEEP", True
+        ):
+            self.remember("/expired.html", "key1", timeout=-1)
+            self.remember("/other.html", "key3")
+        eq_(len(get_remembered_urls()), 3)
+        eq_(sweep_remembered_urls(), 1)
+        eq_(sorted(get_remembered_urls()), ["/other.html", "/page.html"])
+
+    def test_remember_cache_alias(self):
+        storage = RedisStorage(self.cache)
+        storage.remember("/page1.html", "key1", 2000000000, cache_alias="pages")
+        storage.remember("/page2.html", "key2", 2000000000)
+        eq_(
+            storage.get_all(),
+            {
+                "/page1.html": ("key1", 2000000000, "pages"),
+                "/page2.html": ("key2", 2000000000),
+            },
+        )
+        eq_(
+            sorted(storage.find()),
+            [("/page1.html", "key1", "pages"), ("/page2.html", "key2", None)],
+        )
+
+    def test_requires_redis(self):
+        self.assertRaises(ImproperlyConfigured, RedisStorage, cache)
+
+
+@mock.patch(
+    "fancy_cache.storage.REMEMBERED_URLS_STORAGE",
+    "fancy_cache.storage.DatabaseStorage",
+)
+class TestDatabaseStorage(TestCase):
+    def setUp(self):
+        DatabaseStorage._pending = {}
+        DatabaseStorage._last_flush = time.time()
+        DatabaseStorage._last_sweep = 0.0
+
+    def tearDown(self):
+        cache.clear()
+
+    def remember(self, path, cache_key, timeout=60):
+        cache.set(cache_key, "page")
+        middleware = FancyCacheMiddleware(lambda r: None, cache_alias=None)
+        request = RequestFactory().get(path)
+        middleware.remember_url(request, cache_key, timeout)
+
+    def test_remember_and_find_urls(self):
+        self.remember("/page1.html", "key1")
+        self.remember("/page2.html", "key2")
+        self.remember("/other.html?page=1", "key3")
+        self.remember("/page1.html", "key4")
+        # Written through by default
+        eq_(RememberedURL.objects.count(), 3)
+
+        remembered_urls = get_remembered_urls()
+        eq_(RememberedURL.objects.count(), 3)
+        eq_(remembered_urls["/page1.html"][0], "key4")
+
+        eq_(
+            sorted(x[0] for x in find_urls(["/page*"])),
+            ["/page1.html", "/page2.html"],
+        )
+        eq_([x[0] for x in find_urls(["/*?page=1"])], ["/other.html?page=1"])
+        eq_([x[0] for x in find_urls(["/PAGE*"])], [])
+
+        eq_(len(list(find_urls(["/page1.html"], purge=True))), 1)
+        ok_(cache.get("key4") is None)
+        eq_(RememberedURL.objects.count(), 2)
+
+    @mock.patch("fancy_cache.storage.REMEMBERED_URLS_BUFFER_SIZE", 2)
+    def test_flush_and_sweep(self):
+        self.remember("/expired.html", "key1", timeout=-1)
+        eq_(RememberedURL.objects.count(), 0)
+        self.remember("/page.html", "key2")
+        # Buffer full, so written, then swept
+        eq_(
+            list(RememberedURL.objects.values_list("url", flat=True)),
+            ["/page.html"],
+        )
+
+        with mock.patch(
+            "fancy_cache.storage.DEFER_REMEMBERED_URLS_SWEEP", True
+        ):
+            self.remember("/expired.html", "key1", timeout=-1)
+        eq_(sweep_remembered_urls(), 1)
+        eq_(list(get_remembered_urls()), ["/page.html"])
+
+    def test_sweep_every_interval(self):
+        self.remember("/expired1.html", "key1", timeout=-1)
+        eq_(RememberedURL.objects.count(), 0)
+        # Not on every URL remembered
+        self.remember("/expired2.html", "key2", timeout=-1)
+        eq_(RememberedURL.objects.count(), 1)
+
+        DatabaseStorage._last_sweep -= 60
+        self.remember("/page.html", "key3")
+        eq_(
+            list(RememberedURL.objects.values_list("url", flat=True)),
+            ["/page.html"],
+        )
+
+    def test_long_url(self):
+        url = "/page.html?q=%s" % ("x" * 500)
+        self.remember(url, "key1")
+        self.remember(url, "key2")
+        eq_(RememberedURL.objects.count(), 1)
+        eq_([x[:2] for x in find_urls([url])], [(url, "key2")])
+        eq_([x[0] for x in find_urls(["/page.html?q=x*"])], [url])
+
+    @mock.patch("fancy_cache.storage.REMEMBERED_URLS_BUFFER_SIZE", 100)
+    def test_flush_on_next_request(self):
+        self.remember("/page.html", "key1")
+        eq_(RememberedURL.objects.count(), 0)
+        request_started.send(sender=self.__class__)
+        # Not yet
+        eq_(RememberedURL.objects.count(), 0)
+
+        DatabaseStorage._last_flush -= 60
+        request_started.send(sender=self.__class__)
+        eq_(RememberedURL.objects.count(), 1)
+
+    def test_fragment_view(self):
+        cache_fragment(
+            RequestFactory().get("/page.html"),
+            "sidebar",
+            lambda: "sidebar",
+            60,
+            remember_all_urls=True,
+        )
+        remembered_url = RememberedURL.objects.get()
+        eq_(remembered_url.url, "/page.html#sidebar")
+        eq_(remembered_url.view, "sidebar")
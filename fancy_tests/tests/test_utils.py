@@ -3,8 +3,8 @@ import unittest
 
 from django.core.cache import cache
 
-from fancy_cache.constants import REMEMBERED_URLS_KEY
-from fancy_cache.utils import filter_remembered_urls
+from fancy_cache.constants import EXPIRING_URLS_KEY, REMEMBERED_URLS_KEY
+from fancy_cache.utils import ExpiryBuckets, filter_remembered_urls
 
 
 class TestUtils(unittest.TestCase):
@@ -32,3 +32,35 @@ class TestUtils(unittest.TestCase):
         remembered_urls = filter_remembered_urls(self.urls)
         self.assertEqual(len(remembered_urls.keys()), len(self.urls.keys()) - 1)
         self.assertNotIn(url, remembered_urls.keys())
+
+    def test_expiry_buckets(self):
+        now = 60 * 1000 + 30
+        buckets = ExpiryBuckets(cache)
+        remembered_urls = {
+            "/old": ("key1", now - 120),
+            "/a": ("key2", now + 10),
+        }
+        # The first time all of them are looked at.
+        self.assertEqual(buckets.sweep(remembered_urls, now), 1)
+        buckets.commit()
+        for url, expiration_time in (
+            ("/b", now + 70),
+            ("/again", now + 70),
+            ("/again", now + 200),
+            ("/later", now + 3600),
+        ):
+            remembered_urls[url] = ("key", expiration_time)
+            buckets.track(url, expiration_time)
+
+        self.assertEqual(buckets.sweep(remembered_urls, now + 60), 1)
+        buckets.commit()
+        self.assertEqual(sorted(remembered_urls), ["/again", "/b", "/later"])
+
+        # Can be tried again until it's committed
+        for i in range(2):
+            copy = dict(remembered_urls)
+            self.assertEqual(buckets.sweep(copy, now + 130), 1)
+        buckets.commit()
+        self.assertEqual(sorted(copy), ["/again", "/later"])
+        self.assertEqual(buckets.sweep(copy, now + 130), 0)
+        self.assertEqual(cache.get(EXPIRING_URLS_KEY), 1001)
@@ -0,0 +1,64 @@
+import unittest
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.test.client import RequestFactory
+
+from fancy_cache import vary
+
+from . import views
+
+
+class TestVary(unittest.TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_accept_language(self):
+        normalize = vary.accept_language(["en", "sv", "pt-br"], default="en")
+        eq_(normalize("sv-SE,sv;q=0.9,en;q=0.8"), "sv")
+        eq_(normalize("de;q=1.0, en-GB;q=0.8"), "en")
+        eq_(normalize("pt"), "pt-br")
+        eq_(normalize("de"), "en")
+        eq_(normalize(""), "en")
+
+    def test_accept_encoding(self):
+        normalize = vary.accept_encoding()
+        eq_(normalize("gzip, deflate, br"), "gzip")
+        eq_(normalize("br;q=1.0, gzip;q=0.5"), "gzip")
+        eq_(normalize("gzip;q=0, br"), "identity")
+        eq_(normalize("*"), "gzip")
+        eq_(normalize("gzip;q=0, *"), "identity")
+        eq_(normalize("GZIP;q=0, *"), "identity")
+        eq_(vary.accept_encoding(["br", "gzip"])("br;q=0, *"), "gzip")
+        eq_(normalize(""), "identity")
+
+    def test_view(self):
+        headers = [
+            ("en-US,en;q=0.9", "gzip, deflate, br"),
+            ("en-GB", "br, gzip"),
+            ("de, en;q=0.5", "gzip"),
+        ]
+        contents = set()
+        normalized_contents = set()
+        for accept_language, accept_encoding in headers:
+            for i in range(2):
+                request = self.factory.get(
+                    "/page",
+                    HTTP_ACCEPT_LANGUAGE=accept_language,
+                    HTTP_ACCEPT_ENCODING=accept_encoding,
+                )
+                contents.add(views.varies(request).content)
+                response = views.varies_normalized(request)
+                normalized_contents.add(response.content)
+                # Put back for the view
+                eq_(request.META["HTTP_ACCEPT_LANGUAGE"], accept_language)
+        eq_(len(contents), 3)
+        eq_(len(normalized_contents), 1)
+
+        request = self.factory.get("/page", HTTP_ACCEPT_LANGUAGE="sv")
+        response = views.varies_normalized(request)
+        ok_(response.content not in normalized_contents)
+        ok_("HTTP_ACCEPT_ENCODING" not in request.META)
@@ -7,8 +7,10 @@ from django.test.client import RequestFactory
 from django.core.cache import cache, caches
 from unittest import mock
 
+from fancy_cache import encoding
 from fancy_cache.constants import REMEMBERED_URLS_KEY
-from fancy_cache.memory import find_urls
+from fancy_cache.memory import find_top_urls, find_urls
+from fancy_cache.purge import purge_url
 
 from . import views
 
@@ -57,6 +59,17 @@ class TestViews(unittest.TestCase):
         )[0]
         eq_(random_string_1, random_string_2)
 
+    @mock.patch("fancy_cache.middleware.COMPACT_REMEMBERED_URLS", True)
+    def test_remember_all_urls_compact(self):
+        for path in ("/anything", "/other"):
+            response = views.home6(self.factory.get(path))
+            eq_(response.status_code, 200)
+
+        remembered_urls = cache.get(REMEMBERED_URLS_KEY)
+        ok_(encoding.is_compact(remembered_urls))
+        urls = sorted(x[0] for x in find_urls())
+        eq_(urls, ["/anything", "/other"])
+
     def test_render_home2(self):
         authenticated = RequestFactory(AUTH_USER="peter")
         request = self.factory.get("/2")
@@ -344,3 +357,141 @@ class TestViews(unittest.TestCase):
         # Make sure clearing the dummy cache doesn't raise an error,
         # even though it should do nothing.
         caches["dummy_backend"].clear()
+
+    @mock.patch("fancy_cache.middleware.TOP_URLS", 10)
+    def test_top_urls(self):
+        for i in range(3):
+            views.home(self.factory.get("/popular"))
+        views.home(self.factory.get("/other"))
+
+        found = find_top_urls(10)
+        eq_(found[0], ("/popular", 3, 1))
+        eq_(found[1], ("/other", 1, 1))
+        eq_(find_top_urls(10, ["/oth*"]), [("/other", 1, 1)])
+
+    def test_timing_headers(self):
+        request = self.factory.get("/anything")
+        response = views.home10(request)
+        eq_(response["X-Cache"], "MISS")
+        ok_(re.match(r"fancy-key;dur=[\d.]+, ", response["Server-Timing"]))
+        ok_("fancy-store;dur=" in response["Server-Timing"])
+
+        response = views.home10(request)
+        eq_(response["X-Cache"], "HIT")
+        timings = response["Server-Timing"]
+        ok_("fancy-lookup;dur=" in timings)
+        ok_("fancy-store" not in timings)
+
+        request = RequestFactory(AUTH_USER="peter").get("/anything")
+        response = views.home10(request)
+        eq_(response["X-Cache"], "BYPASS")
+
+        # The headers are off by default
+        response = views.home(self.factory.get("/anything"))
+        ok_(not response.has_header("X-Cache"))
+
+    def test_streaming(self):
+        request = self.factory.get("/export")
+        response = views.streaming(request)
+        ok_(response.streaming)
+        content = b"".join(response.streaming_content)
+        eq_(content.count(b"\n"), 3)
+
+        response = views.streaming(request)
+        ok_(response.streaming)
+        eq_(response["Content-Type"], "text/csv")
+        eq_(b"".join(response.streaming_content), content)
+
+    def test_streaming_abandoned(self):
+        request = self.factory.get("/export")
+        response = views.streaming(request)
+        next(iter(response.streaming_content))
+        response.close()
+        first = b"".join(views.streaming(request).streaming_content)
+        eq_(b"".join(views.streaming(request).streaming_content), first)
+
+    def test_streaming_too_big(self):
+        request = self.factory.get("/export?lines=10")
+        first = b"".join(views.streaming(request).streaming_content)
+        ok_(len(first) > 200)
+        ok_(b"".join(views.streaming(request).streaming_content) != first)
+
+    def test_min_generation_time(self):
+        request = self.factory.get("/anything")
+        response = views.home13(request)
+        # Not stored, but with the same headers as if it were
+        eq_(response["Cache-Control"], "max-age=60")
+        ok_(response.has_header("Expires"))
+        eq_(response["X-Always"], "yes")
+        ok_(views.home13(request).content != response.content)
+
+        request = self.factory.get("/anything?sleep=0.05")
+        response = views.home13(request)
+        eq_(response["Cache-Control"], "max-age=60")
+        eq_(views.home13(request).content, response.content)
+
+    def test_cost_timeouts(self):
+        request = self.factory.get("/anything?sleep=0.1")
+        response = views.home13(request)
+        eq_(response["Cache-Control"], "max-age=600")
+        eq_(views.home13(request).content, response.content)
+
+    def test_adaptive_timeout(self):
+        max_ages = []
+        now = time.time()
+        for view, path in ((views.static, "/static"), (views.home14, "/home")):
+            for i in range(4):
+                # After the longest timeout, so it has expired
+                now += 101
+                with mock.patch("time.time", return_value=now):
+                    response = view(self.factory.get(path))
+                max_ages.append(response["Cache-Control"])
+        eq_(
+            max_ages,
+            ["max-age=%s" % x for x in (20, 40, 80, 100, 20, 10, 10, 10)],
+        )
+
+    def test_adaptive_timeout_forgotten(self):
+        def get(view, path, seconds_later=0):
+            with mock.patch("time.time", return_value=now + seconds_later):
+                return view(self.factory.get(path))["Cache-Control"]
+
+        now = time.time()
+        get(views.static, "/static")
+        eq_(get(views.static, "/static", 101), "max-age=40")
+        purge_url("/static")
+        eq_(get(views.static, "/static", 101), "max-age=20")
+
+        get(views.static_remembered, "/remembered")
+        eq_(get(views.static_remembered, "/remembered", 101), "max-age=40")
+        list(find_urls(["/remembered"], purge=True))
+        eq_(get(views.static_remembered, "/remembered", 101), "max-age=20")
+
+        # Not kept for longer than twice the longest timeout
+        eq_(get(views.static, "/static", 101 + 201), "max-age=20")
+
+    def test_status_timeouts(self):
+        request = self.factory.get("/nowhere")
+        response = views.missing(request)
+        eq_(response.status_code, 404)
+        eq_(response["Cache-Control"], "max-age=10")
+        not_found = response.content
+        eq_(views.missing(request).content, not_found)
+
+        request = self.factory.get("/old?moved=1")
+        response = views.missing(request)
+        eq_(response.status_code, 301)
+        eq_(response["Cache-Control"], "max-age=100")
+        eq_(views.missing(request)["Location"], response["Location"])
+
+        # Not configured, or too big
+        for path in ("/nowhere?gone=1", "/nowhere?big=1"):
+            request = self.factory.get(path)
+            response = views.missing(request)
+            ok_(views.missing(request).content != response.content)
+
+        found = sorted(url for url, _, _ in find_urls([]))
+        eq_(found, ["/nowhere", "/old?moved=1"])
+        list(find_urls(["/nowhere"], purge=True))
+        response = views.missing(self.factory.get("/nowhere"))
+        ok_(response.content != not_found)
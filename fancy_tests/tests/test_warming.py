@@ -0,0 +1,140 @@
+import os
+import tempfile
+import time
+import unittest
+from io import StringIO
+from unittest import mock
+
+from nose.tools import eq_, ok_
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.client import RequestFactory
+
+from fancy_cache.constants import REMEMBERED_URLS_KEY
+from fancy_cache.memory import find_top_urls, find_urls
+from fancy_cache.utils import md5
+from fancy_cache.warming import (
+    read_hits_file,
+    read_urls_file,
+    sort_urls_by_hits,
+    warm_url,
+    warm_urls,
+)
+
+from . import views
+
+
+class TestWarming(unittest.TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_warm_url(self):
+        url, status_code, seconds = warm_url("/remembered?foo=bar")
+        eq_(url, "/remembered?foo=bar")
+        eq_(status_code, 200)
+        ok_(seconds >= 0)
+        ((found_url, cache_key, stats),) = find_urls([])
+        eq_(found_url, "/remembered?foo=bar")
+        # Warm-ups aren't counted
+        eq_(stats, None)
+
+        views.home6(RequestFactory().get("/remembered?foo=bar"))
+        ((found_url, cache_key, stats),) = find_urls([])
+        eq_(stats, {"hits": 1, "misses": 0})
+
+    @mock.patch("fancy_cache.middleware.TOP_URLS", 10)
+    def test_warm_url_not_in_top_urls(self):
+        warm_url("/remembered")
+        eq_(find_top_urls(10), [])
+        views.home6(RequestFactory().get("/remembered"))
+        eq_(find_top_urls(10), [("/remembered", 1, 0)])
+
+    def test_warm_urls(self):
+        urls = ["/remembered?page=%s" % i for i in range(10)]
+        results = list(warm_urls(urls, concurrency=3))
+        eq_(sorted(x[0] for x in results), sorted(urls))
+        ok_(all(x[1] == 200 for x in results))
+        eq_(len(list(find_urls([]))), 10)
+
+    def test_warm_urls_rate(self):
+        t0 = time.time()
+        list(warm_urls(["/remembered?a=1", "/remembered?a=2"], rate=10))
+        ok_(time.time() - t0 >= 0.1)
+
+    def test_sort_urls_by_hits(self):
+        cache.set(md5("/a__hits"), 1)
+        cache.set(md5("/b__hits"), 10)
+        eq_(sort_urls_by_hits(["/c", "/a", "/b"]), ["/b", "/a", "/c"])
+
+    def test_read_urls_file(self):
+        with tempfile.NamedTemporaryFile("w", delete=False) as f:
+            f.write("/page1.html\n\n# comment\n/page2.html?foo=bar\t3\n")
+        try:
+            eq_(read_urls_file(f.name), ["/page1.html", "/page2.html?foo=bar"])
+            eq_(read_hits_file(f.name), {"/page2.html?foo=bar": 3})
+        finally:
+            os.remove(f.name)
+
+    def test_read_sitemap_file(self):
+        with tempfile.NamedTemporaryFile("w", delete=False) as f:
+            f.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                "<url><loc>https://example.com/page1.html</loc></url>"
+                "<url><loc>https://example.com/page2.html?a=b</loc></url>"
+                "</urlset>"
+            )
+        try:
+            eq_(read_urls_file(f.name), ["/page1.html", "/page2.html?a=b"])
+        finally:
+            os.remove(f.name)
+
+    def test_warm_command(self):
+        expiration_time = int(time.time()) + 5
+        cache.set(
+            REMEMBERED_URLS_KEY,
+            {
+                "/remembered?x=1": ("gone1", expiration_time),
+                "/remembered?x=2": ("gone2", expiration_time),
+            },
+            5,
+        )
+        out = StringIO()
+        call_command("fancy-warm", verbosity=3, stdout=out)
+        ok_("2 URLs warmed" in out.getvalue())
+        eq_(len(list(find_urls([]))), 2)
+
+        out = StringIO()
+        call_command("fancy-warm", "/remembered?x=1", verbosity=3, stdout=out)
+        ok_("1 URLs warmed" in out.getvalue())
+
+    def test_export_purge_and_warm(self):
+        long_url = "/remembered?long=%s" % ("x" * 100)
+        for url, hits in (("/remembered?cold=1", 0), (long_url, 2)):
+            for i in range(hits + 1):
+                views.home6(RequestFactory().get(url))
+        out = StringIO()
+        call_command("fancy-urls", export=True, stdout=out)
+        lines = sorted(out.getvalue().splitlines())
+        eq_(lines, ["/remembered?cold=1\t0", "%s\t2" % long_url])
+
+        with tempfile.NamedTemporaryFile("w", delete=False) as f:
+            f.write(out.getvalue())
+        try:
+            call_command("fancy-urls", purge=True, stdout=StringIO())
+            eq_(list(find_urls([])), [])
+            out = StringIO()
+            call_command(
+                "fancy-warm",
+                "--file",
+                f.name,
+                "--top",
+                "1",
+                verbosity=3,
+                stdout=out,
+            )
+        finally:
+            os.remove(f.name)
+        ok_("200 " in out.getvalue())
+        ok_(long_url in out.getvalue())
+        eq_([x[0] for x in find_urls([])], [long_url])
@@ -1,7 +1,15 @@
+import time
 import uuid
+from django.http import (
+    HttpResponse,
+    HttpResponseGone,
+    HttpResponseNotFound,
+    HttpResponsePermanentRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
 from django.views.decorators.cache import never_cache
-from fancy_cache import cache_page
+from fancy_cache import cache_page, vary
 
 
 def _view(request):
@@ -73,3 +81,128 @@ def home8(request):
 @cache_page(60, remember_stats_all_urls=True, remember_all_urls=True)
 def home9(request):
     return _view(request)
+
+
+@cache_page(60, timing_headers=True, key_prefix=prefixer1)
+def home10(request):
+    return _view(request)
+
+
+@cache_page(60, path_in_cache_key=True, only_get_keys=["page"])
+def home11(request):
+    return _view(request)
+
+
+@cache_page(60, cache_streaming=True, streaming_max_size=200)
+def streaming(request):
+    random_string = uuid.uuid4().hex
+    lines = int(request.GET.get("lines", 3))
+    return StreamingHttpResponse(
+        ("%s:%s\n" % (random_string, i) for i in range(lines)),
+        content_type="text/csv",
+    )
+
+
+@cache_page(60, admit_after=3, admission_window=10)
+def home12(request):
+    return _view(request)
+
+
+def _mark_always(response, request):
+    response["X-Always"] = "yes"
+    return response
+
+
+@cache_page(
+    60,
+    min_generation_time=0.05,
+    cost_timeouts=[(0.1, 600)],
+    post_process_response_always=_mark_always,
+)
+def home13(request):
+    time.sleep(float(request.GET.get("sleep", 0)))
+    return _view(request)
+
+
+@cache_page(20, adaptive_timeout=(10, 100))
+def home14(request):
+    return _view(request)
+
+
+@cache_page(60, key_prefix=prefixer1, remember_all_urls=True)
+def home15(request):
+    return _view(request)
+
+
+@cache_page(20, adaptive_timeout=(10, 100))
+def static(request):
+    return HttpResponse("Static")
+
+
+@cache_page(20, adaptive_timeout=(10, 100), remember_all_urls=True)
+def static_remembered(request):
+    return HttpResponse("Static")
+
+
+@cache_page(60, dedupe_content=True)
+def static_deduped(request):
+    return HttpResponse("Static")
+
+
+@cache_page(10, dedupe_content=True)
+def static_deduped_briefly(request):
+    return HttpResponse("Static")
+
+
+@cache_page(60, dedupe_content=True)
+def changing_deduped(request):
+    return HttpResponse(request.headers.get("X-Body", "Static"))
+
+
+def _username(request):
+    return request.GET.get("user", "anonymous")
+
+
+@cache_page(60, only_get_keys=[], placeholders={"<!--user-->": _username})
+def personalized(request):
+    return HttpResponse(
+        "<p>Hi <!--user-->!</p><p>%s</p><p>Bye <!--user--></p>"
+        % uuid.uuid4().hex
+    )
+
+
+@cache_page(
+    60,
+    status_timeouts={404: 10, 301: 100},
+    status_max_size=100,
+    remember_all_urls=True,
+)
+def missing(request):
+    if request.GET.get("moved"):
+        return HttpResponsePermanentRedirect("/new/%s" % uuid.uuid4().hex)
+    if request.GET.get("gone"):
+        return HttpResponseGone(uuid.uuid4().hex)
+    if request.GET.get("big"):
+        return HttpResponseNotFound(uuid.uuid4().hex * 10)
+    return HttpResponseNotFound(uuid.uuid4().hex)
+
+
+def _vary_view(request):
+    response = HttpResponse(uuid.uuid4().hex)
+    response["Vary"] = "Accept-Language, Accept-Encoding"
+    return response
+
+
+varies = cache_page(60)(_vary_view)
+varies_normalized = cache_page(
+    60,
+    vary_normalizers={
+        "Accept-Language": vary.accept_language(["en", "sv"], default="en"),
+        "Accept-Encoding": vary.accept_encoding(),
+    },
+)(_vary_view)
+
+
+@cache_page(60, cache="pages_backend", remember_all_urls=True)
+def home_pages(request):
+    return _view(request)